@@ -1,22 +1,46 @@
 from flask_restful import Resource, Api
-from flask import request
+from flask import request, session, Response
 from app import app
-from models import db, Service, ServiceRequest, Review
+from sqlalchemy import insert
+from sqlalchemy.orm import joinedload, aliased
+from models import db, User, Service, ServiceRequest, ServiceProfessional, Review, Customer
+from matching import find_candidates
+from catalog import get_catalog
+from search import index_rows
+from ratings import record_reviews
+from rollups import rollup_new_requests, build_summary
+from feed import record_new_requests
+from transitions import CONFLICTS, NOT_FOUND, transition_request
+from statuses import parse_status
+from export import parse_date
+from jobs import enqueue
+from notifications import notify_request_accepted, notify_request_closed, notify_review_submitted
+from importer import IMPORT_KINDS, import_users
+from pagination import get_per_page, keyset_paginate
+from projection import parse_fields, rows_as_dicts, json_response
+from conditional import conditional_response
 
 api = Api(app)
 
-# Endpoint to get all available services
+# Endpoint to get all available services (?fields=id,name,description,price)
 class GetServices(Resource):
     def get(self):
-        services = Service.query.all()
-        return {
-            'services': [{
-                'id': service.id,
-                'name': service.name,
-                'description': service.description,
-                'price': service.price
-            } for service in services]
-        }
+        catalog = get_catalog()
+        if request.args.get('fields'):
+            try:
+                fields = parse_fields(request.args['fields'], SERVICE_FIELDS, SERVICE_FIELDS)
+            except ValueError as e:
+                return {'message': str(e)}, 400
+            response = json_response({'services': [{name: service[name] for name in fields}
+                                                   for service in catalog['services']]})
+            response.set_etag(catalog['etag'] + '-' + '.'.join(fields))
+        else:
+            # Served from the catalog cache with its pre-serialized body
+            response = Response(catalog['body'], mimetype='application/json')
+            response.set_etag(catalog['etag'])
+        return response.make_conditional(request)
+
+SERVICE_FIELDS = ['id', 'name', 'description', 'price']
 
 # Endpoint to create a service request (Customer)
 class CreateServiceRequest(Resource):
@@ -26,43 +50,361 @@ class CreateServiceRequest(Resource):
         service_request = ServiceRequest(
             service_id=data['service_id'],
             customer_id=data['customer_id'],
-            details=data['details'],
-            status='pending'  # Initial status
+            description=data.get('details'),
+            status='requested'  # Initial status
         )
         db.session.add(service_request)
         db.session.commit()
-        return {'message': 'Service request created successfully', 'id': service_request.id}, 201
 
-# Endpoint to view service requests (Service Professional)
-class ViewServiceRequests(Resource):
-    def get(self):
-        # This would be filtered by service professional or status as required
-        requests = ServiceRequest.query.all()  # For simplicity, all requests
+        # Suggest professionals who can take the job
+        candidates = find_candidates(service_request.service_id, service_request.customer_pincode)
+        return {
+            'message': 'Service request created successfully',
+            'id': service_request.id,
+            'candidates': [serialize_candidate(candidate) for candidate in candidates]
+        }, 201
+
+# Endpoint to list the best matching professionals for a service request (Dispatcher)
+class ServiceRequestCandidates(Resource):
+    def get(self, request_id):
+        service_request = ServiceRequest.query.options(
+            joinedload(ServiceRequest.customer_ref)
+        ).get_or_404(request_id)
+        limit = request.args.get('limit', 10, type=int)
+        candidates = find_candidates(service_request.service_id, service_request.customer_pincode, max(1, min(limit, 100)))
         return {
-            'requests': [{
-                'id': request.id,
-                'service_name': request.service.name,
-                'customer_name': request.customer.name,
-                'status': request.status
-            } for request in requests]
+            'request_id': service_request.id,
+            'candidates': [serialize_candidate(candidate) for candidate in candidates]
         }
 
+def serialize_candidate(candidate):
+    return {
+        'professional_id': candidate.id,
+        'pin_code': candidate.pin_code,
+        'rating': candidate.rating,
+        'experience': candidate.experience
+    }
+
+# Endpoint to view service requests (Service Professional), newest first, a page at a time:
+# ?fields=id,status&status=requested&service_id=1&professional_id=2&per_page=50&after=<next_cursor>
+class ViewServiceRequests(Resource):
+    def get(self):
+        try:
+            fields = parse_fields(request.args.get('fields'), list(REQUEST_FIELDS), REQUEST_DEFAULT_FIELDS)
+            filters = [ServiceRequest.status == parse_status(request.args['status'])] if request.args.get('status') else []
+            for name, column in (('service_id', ServiceRequest.service_id),
+                                 ('professional_id', ServiceRequest.professional_id)):
+                value = request.args.get(name)
+                if value:
+                    if not value.isdigit():
+                        raise ValueError(f"{name} must be an id")
+                    filters.append(column == int(value))
+        except ValueError as e:
+            return {'message': str(e)}, 400
+
+        page = keyset_paginate(
+            request_listing(fields).filter(*filters), REQUEST_PAGE_KEY,
+            cursor=request.args.get('after'), per_page=get_per_page(request.args.get('per_page')), descending=True
+        )
+        return json_response({'requests': rows_as_dicts(page, fields), 'next_cursor': page.next_cursor})
+
+customer_user = aliased(User, name='customer_user')
+professional_user = aliased(User, name='professional_user')
+
+# Field name -> (column, joins it needs)
+REQUEST_FIELDS = {
+    'id': (ServiceRequest.id, ()),
+    'service_id': (ServiceRequest.service_id, ()),
+    'service_name': (Service.name, ('service',)),
+    'customer_id': (ServiceRequest.customer_id, ()),
+    'customer_name': (customer_user.username, ('customer',)),
+    'professional_id': (ServiceRequest.professional_id, ()),
+    'professional_name': (professional_user.username, ('professional',)),
+    'status': (ServiceRequest.status, ()),
+    'description': (ServiceRequest.description, ()),
+    'date_of_request': (ServiceRequest.date_of_request, ()),
+    'date_of_completion': (ServiceRequest.date_of_completion, ()),
+    'version': (ServiceRequest.version, ()),
+}
+REQUEST_DEFAULT_FIELDS = ['id', 'service_name', 'customer_name', 'status']
+REQUEST_JOINS = {
+    'service': [(Service, Service.id == ServiceRequest.service_id)],
+    'customer': [(Customer, Customer.id == ServiceRequest.customer_id),
+                 (customer_user, customer_user.id == Customer.user_id)],
+    'professional': [(ServiceProfessional, ServiceProfessional.id == ServiceRequest.professional_id),
+                     (professional_user, professional_user.id == ServiceProfessional.user_id)],
+}
+# Pages are keyed on (date_of_request, id), as the admin dashboard's requests table
+REQUEST_PAGE_KEY = [ServiceRequest.date_of_request, ServiceRequest.id]
+
+def request_listing(fields):
+    # Only the selected columns, then the page key columns not already among them
+    columns = [REQUEST_FIELDS[name][0].label(name) for name in fields]
+    columns += [column for column in REQUEST_PAGE_KEY if column.key not in fields]
+    query = db.session.query(*columns).select_from(ServiceRequest)
+    joins = {join for name in fields for join in REQUEST_FIELDS[name][1]}
+    for join in REQUEST_JOINS:
+        if join in joins:
+            for target, onclause in REQUEST_JOINS[join]:
+                query = query.outerjoin(target, onclause)
+    return query
+
+# Endpoint to view one service request, e.g. GET /api/service_request/7?fields=id,status,version;
+# answers 304 to If-None-Match while the request and its service are unchanged
+class ServiceRequestDetail(Resource):
+    def get(self, request_id):
+        try:
+            fields = parse_fields(request.args.get('fields'), list(REQUEST_FIELDS), REQUEST_DEFAULT_FIELDS)
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        # User names never change, so the request and its service are all the body depends on
+        versions = db.session.query(ServiceRequest.version, ServiceRequest.updated_at, Service.updated_at) \
+            .join(Service, Service.id == ServiceRequest.service_id) \
+            .filter(ServiceRequest.id == request_id).first()
+        if versions is None:
+            return {'message': NOT_FOUND}, 404
+
+        def build():
+            row = request_listing(fields).filter(ServiceRequest.id == request_id).first()
+            return json_response(rows_as_dicts([row], fields)[0])
+
+        return conditional_response(versions, build)
+
 # Endpoint for customers to submit a review for a service
 class SubmitReview(Resource):
     def post(self):
-        data = request.get_json()  # Expecting data like { "service_id": 1, "customer_id": 1, "rating": 5, "comments": "Great service!" }
+        data = request.get_json()  # Expecting data like { "service_request_id": 1, "customer_id": 1, "rating": 5, "comments": "Great service!" }
         review = Review(
-            service_id=data['service_id'],
+            service_request_id=data['service_request_id'],
             customer_id=data['customer_id'],
             rating=data['rating'],
-            comments=data.get('comments', '')
+            remarks=data.get('comments', '')
         )
         db.session.add(review)
+        db.session.flush()  # Assigns review.id
+        enqueue(notify_review_submitted, review_id=review.id)
         db.session.commit()
         return {'message': 'Review submitted successfully', 'review_id': review.id}, 201
 
+# Endpoint for the admin summary, read from the daily rollups (?from=YYYY-MM-DD&to=YYYY-MM-DD)
+class AdminSummary(Resource):
+    def get(self):
+        if session.get('role') != 'admin':
+            return {'message': 'Unauthorized access'}, 403
+        try:
+            date_from = parse_date(request.args.get('from'))
+            date_to = parse_date(request.args.get('to'))
+        except ValueError:
+            return {'message': 'Dates must be in YYYY-MM-DD format'}, 400
+        return build_summary(date_from and date_from.date(), date_to and date_to.date())
+
+# ----------------------------------------------
+# Batch endpoints (Partner integrations)
+# ----------------------------------------------
+# Each accepts a JSON array, validates every item with set-based lookups,
+# inserts the valid ones in one transaction with a single bulk INSERT and
+# returns a result per item, in the order the items were sent.
+
+def read_batch():
+    # Returns (items, None) or (None, error response)
+    items = request.get_json(silent=True)
+    if not isinstance(items, list) or not items:
+        return None, ({'message': 'Expected a non-empty JSON array'}, 400)
+    max_items = app.config.get('API_BATCH_MAX_ITEMS', 1000)
+    if len(items) > max_items:
+        return None, ({'message': f'At most {max_items} items per batch'}, 413)
+    return items, None
+
+def is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+def existing_ids(column, ids):
+    # One IN query for all referenced ids
+    if not ids:
+        return set()
+    return {row[0] for row in db.session.query(column).filter(column.in_(ids))}
+
+def bulk_insert(model, rows):
+    # One multi-row INSERT; ids come back in the order of rows
+    if not rows:
+        return []
+    result = db.session.execute(insert(model).returning(model.id, sort_by_parameter_order=True), rows)
+    return list(result.scalars())
+
+def batch_response(results, created):
+    failed = len(results) - created
+    return {'created': created, 'failed': failed, 'results': results}, 201 if created else 400
+
+# Endpoint to create many service requests at once, e.g. [{ "service_id": 1, "customer_id": 1, "details": "..." }, ...]
+class CreateServiceRequestBatch(Resource):
+    def post(self):
+        items, error = read_batch()
+        if error:
+            return error
+
+        service_ids = existing_ids(Service.id, {item.get('service_id') for item in items
+                                                if isinstance(item, dict) and is_id(item.get('service_id'))})
+        customer_ids = existing_ids(Customer.id, {item.get('customer_id') for item in items
+                                                  if isinstance(item, dict) and is_id(item.get('customer_id'))})
+
+        results = []
+        rows = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                results.append({'index': index, 'errors': ['Item must be an object']})
+                continue
+            errors = []
+            if not is_id(item.get('service_id')) or item['service_id'] not in service_ids:
+                errors.append('Unknown service_id')
+            if not is_id(item.get('customer_id')) or item['customer_id'] not in customer_ids:
+                errors.append('Unknown customer_id')
+            details = item.get('details')
+            if details is not None and (not isinstance(details, str) or len(details) > 255):
+                errors.append('details must be a string of at most 255 characters')
+            if errors:
+                results.append({'index': index, 'errors': errors})
+                continue
+            results.append({'index': index})
+            rows.append({
+                'service_id': item['service_id'],
+                'customer_id': item['customer_id'],
+                'description': details,
+                'status': 'requested'  # Initial status
+            })
+
+        ids = bulk_insert(ServiceRequest, rows)
+        # Bulk inserts skip the flush hooks, so index and roll up the new rows explicitly
+        index_rows(ServiceRequest, ids)
+        rollup_new_requests(db.session, ids)
+        record_new_requests(db.session, ids)
+        db.session.commit()
+
+        new_ids = iter(ids)
+        for result in results:
+            if 'errors' not in result:
+                result['id'] = next(new_ids)
+        return batch_response(results, len(ids))
+
+# Endpoint to submit many reviews at once, e.g. [{ "service_request_id": 1, "customer_id": 1, "rating": 5, "comments": "..." }, ...]
+class SubmitReviewBatch(Resource):
+    def post(self):
+        items, error = read_batch()
+        if error:
+            return error
+
+        # Owner of every referenced service request, so each review can be checked against it
+        request_ids = {item.get('service_request_id') for item in items
+                       if isinstance(item, dict) and is_id(item.get('service_request_id'))}
+        request_customers = dict(
+            db.session.query(ServiceRequest.id, ServiceRequest.customer_id)
+            .filter(ServiceRequest.id.in_(request_ids)).all()
+        ) if request_ids else {}
+
+        results = []
+        rows = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                results.append({'index': index, 'errors': ['Item must be an object']})
+                continue
+            errors = []
+            service_request_id = item.get('service_request_id')
+            if not is_id(service_request_id) or service_request_id not in request_customers:
+                errors.append('Unknown service_request_id')
+            elif request_customers[service_request_id] != item.get('customer_id'):
+                errors.append('customer_id does not match the service request')
+            rating = item.get('rating')
+            if not isinstance(rating, int) or isinstance(rating, bool) or not 1 <= rating <= 5:
+                errors.append('rating must be an integer from 1 to 5')
+            comments = item.get('comments', '')
+            if not isinstance(comments, str) or len(comments) > 255:
+                errors.append('comments must be a string of at most 255 characters')
+            if errors:
+                results.append({'index': index, 'errors': errors})
+                continue
+            results.append({'index': index})
+            rows.append({
+                'service_request_id': service_request_id,
+                'customer_id': item['customer_id'],
+                'rating': rating,
+                'remarks': comments
+            })
+
+        ids = bulk_insert(Review, rows)
+        # Bulk inserts skip the flush hooks, so update the rating aggregates explicitly
+        record_reviews(db.session, added=[(row['service_request_id'], row['rating']) for row in rows])
+        for review_id in ids:
+            enqueue(notify_review_submitted, review_id=review_id)
+        db.session.commit()
+
+        new_ids = iter(ids)
+        for result in results:
+            if 'errors' not in result:
+                result['review_id'] = next(new_ids)
+        return batch_response(results, len(ids))
+
+# Endpoint for admins to import customers or professionals from a CSV upload (form field "file"),
+# e.g. curl -F file=@professionals.csv -F default_password=... /api/import/professional
+class ImportUsers(Resource):
+    def post(self, kind):
+        if session.get('role') != 'admin':
+            return {'message': 'Unauthorized access'}, 403
+        if kind not in IMPORT_KINDS:
+            return {'message': f"kind must be one of {', '.join(sorted(IMPORT_KINDS))}"}, 404
+        # Before the form is parsed; Request.max_content_length cannot be set before Flask 3.1
+        if request.content_length is None:
+            return {'message': 'Content-Length is required'}, 411
+        if request.content_length > app.config.get('IMPORT_MAX_BYTES'):
+            return {'message': f"Upload at most {app.config.get('IMPORT_MAX_BYTES') // (1024 * 1024)} MB"}, 413
+        upload = request.files.get('file')
+        if not upload:
+            return {'message': 'Upload the CSV as the "file" form field'}, 400
+        try:
+            report = import_users(kind, upload.stream, request.form.get('default_password'),
+                                  notify=request.form.get('notify') == 'true')
+        except (ValueError, UnicodeDecodeError) as e:
+            return {'message': str(e)}, 400
+        return report, 201 if report['imported'] else 400
+
+# Endpoint to accept, complete or close a service request, e.g. POST /api/service_request/7/accept
+# with an optional { "version": 3 }; 409 if another transition got there first (Professional / Admin)
+class ServiceRequestTransition(Resource):
+    def post(self, request_id, action):
+        role = 'admin' if action == 'close' else 'professional'
+        if action not in CONFLICTS:
+            return {'message': f"action must be one of {', '.join(sorted(CONFLICTS))}"}, 404
+        if session.get('role') != role:
+            return {'message': 'Unauthorized access'}, 403
+        professional_id = None
+        if role == 'professional':
+            professional_id = db.session.query(ServiceProfessional.id) \
+                .filter(ServiceProfessional.user_id == session.get('user_id')).scalar()
+            if professional_id is None:
+                return {'message': 'Professional not found'}, 404
+        version = (request.get_json(silent=True) or {}).get('version')
+        if version is not None and (not isinstance(version, int) or isinstance(version, bool)):
+            return {'message': 'version must be an integer'}, 400
+
+        values, conflict = transition_request(db.session, request_id, action, professional_id, version)
+        if values is None:
+            db.session.rollback()
+            return {'message': conflict}, 404 if conflict == NOT_FOUND else 409
+        if action == 'accept':
+            enqueue(notify_request_accepted, request_id=request_id)
+        elif action == 'close':
+            enqueue(notify_request_closed, request_id=request_id)
+        db.session.commit()
+        return {'id': request_id, 'status': values['status'], 'professional_id': values['professional_id'],
+                'version': values['version']}
+
 # Registering resources with API
 api.add_resource(GetServices, '/api/services')
 api.add_resource(CreateServiceRequest, '/api/service_request')
+api.add_resource(ServiceRequestDetail, '/api/service_request/<int:request_id>')
+api.add_resource(ServiceRequestCandidates, '/api/service_request/<int:request_id>/candidates')
+api.add_resource(ServiceRequestTransition, '/api/service_request/<int:request_id>/<string:action>')
 api.add_resource(ViewServiceRequests, '/api/service_requests')
 api.add_resource(SubmitReview, '/api/reviews')
+api.add_resource(AdminSummary, '/api/summary')
+api.add_resource(CreateServiceRequestBatch, '/api/service_requests/batch')
+api.add_resource(SubmitReviewBatch, '/api/reviews/batch')
+api.add_resource(ImportUsers, '/api/import/<string:kind>')
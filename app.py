@@ -1,32 +1,59 @@
-from flask import Flask, render_template
+import click
+from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate  # Import Flask-Migrate
- 
-
-app = Flask(__name__)
-
+from replicas import RoutingSession, replica_binds
 
 
+app = Flask(__name__)
 
 import config
 
 # Configure the app from config
-app.config.from_object(config.Config) 
+app.config.from_object(config.Config)
+app.config['SQLALCHEMY_BINDS'] = dict(app.config.get('SQLALCHEMY_BINDS') or {}, **replica_binds(app.config))
 
 # Initialize SQLAlchemy (don't pass the app here, we'll do it in models.py)
-db = SQLAlchemy(app)
-
-# Initialize Flask-Migrate
-migrate = Migrate(app, db)
-
-import models
-
-import api
-
-import routes
-
-
-
-
-if __name__ == '__main__ ':
-    app.run(debug=True) 
\ No newline at end of file
+# Reads may be routed to replicas, see replicas.py
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+
+
+# ----------------------------------------------
+# Application factory
+# ----------------------------------------------
+# Importing this module only builds the Flask app and the SQLAlchemy
+# extension; it touches no database and registers no routes. create_app()
+# imports the modules that register models, routes, API resources, hooks and
+# CLI commands on `app`, so a server or CLI calls it once at startup (wsgi.py
+# does). Schema creation and the admin account are explicit steps
+# (`flask init-db`, `flask create-admin`), never a side effect of starting a
+# worker.
+
+# Modules that register something on `app` when imported, in import order
+APP_MODULES = ['models', 'api', 'routes', 'metrics', 'search', 'catalog', 'fragments', 'matching', 'ratings',
+               'rollups', 'feed', 'transitions', 'archive', 'jobs', 'notifications', 'resumes', 'importer']
+
+registered = False
+
+
+def create_app():
+    global registered
+    if not registered:
+        for name in APP_MODULES:
+            __import__(name)
+        if click.get_current_context(silent=True) is not None:
+            init_migrate()
+        registered = True
+    return app
+
+
+def init_migrate():
+    # Only `flask db ...` needs Flask-Migrate, and importing it pulls in all of Alembic
+    if 'migrate' not in app.extensions:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+
+if __name__ == '__main__':
+    # This file runs as __main__, a second copy of the module; serve the `app` module's app, which the others register on
+    import app as application
+    application.create_app().run(debug=True)
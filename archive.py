@@ -0,0 +1,136 @@
+import time
+import click
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, delete, union_all, tuple_
+from app import app, db
+from models import ServiceRequest, Review, ServiceRequestArchive, ReviewArchive
+from pagination import encode_cursor, decode_cursor
+from search import fts_available, remove
+from jobs import job, enqueue
+
+# ----------------------------------------------
+# Archive of closed service requests
+# ----------------------------------------------
+# Closed requests are most of ServiceRequest, yet only history reads them.
+# Those completed more than ARCHIVE_AFTER_DAYS ago move, with their reviews,
+# to ServiceRequestArchive and ReviewArchive, ARCHIVE_BATCH_ROWS requests per
+# transaction, so the hot tables and their indexes hold the work in progress
+# and recent history. A pass walks the old closed requests in
+# (date_of_request, id) order and may stop after any batch: moved rows are
+# gone from the hot table, and the cursor of the last batch lets the next
+# run carry on. `flask archive-requests` runs a pass, or queues it as the
+# archive_closed_requests job, which queues its own continuation every
+# ARCHIVE_PASS_BATCHES batches; schedule it with cron.
+#
+# Rollups and rating summaries are left as they are (archived requests are
+# still history they count); the search index drops archived requests.
+#
+# history(build) is the read side: build(requests, reviews) writes a query
+# against one pair of tables, and history() returns the UNION ALL of it over
+# the hot and the archive pair, each branch using its own indexes. SQLite
+# only orders a UNION by labelled columns, so label what it is ordered by.
+# history_statements(build) gives the two queries apart, for readers that
+# stream one after the other instead of sorting their union.
+
+ARCHIVE_PAIRS = [(ServiceRequest, Review), (ServiceRequestArchive, ReviewArchive)]
+REQUEST_COLUMNS = ['id', 'service_id', 'customer_id', 'professional_id', 'date_of_request', 'date_of_completion',
+                   'status', 'description', 'version']
+REVIEW_COLUMNS = ['service_request_id', 'customer_id', 'rating', 'remarks']
+CURSOR_COLUMNS = [ServiceRequest.date_of_request, ServiceRequest.id]
+
+
+def history_statements(build):
+    # build(requests, reviews) over the hot tables, then over the archive tables
+    return [build(requests, reviews) for requests, reviews in ARCHIVE_PAIRS]
+
+
+def history(build):
+    # UNION ALL of build(requests, reviews) over the hot and the archive tables
+    return union_all(*history_statements(build))
+
+
+def archive_cutoff(days=None):
+    return datetime.utcnow() - timedelta(days=app.config.get('ARCHIVE_AFTER_DAYS', 180) if days is None else days)
+
+
+def move_late_reviews(session):
+    # Reviews written for a request after it was archived
+    late = select(Review.id).where(Review.service_request_id.in_(select(ServiceRequestArchive.id)))
+    session.execute(insert(ReviewArchive).from_select(
+        REVIEW_COLUMNS, select(*[getattr(Review, name) for name in REVIEW_COLUMNS]).where(Review.id.in_(late))
+    ))
+    return session.execute(delete(Review).where(Review.id.in_(late))
+                           .execution_options(synchronize_session=False)).rowcount
+
+
+def archive_batch(cutoff, after=None, limit=500):
+    # Move one batch; returns (requests moved, cursor of the last request looked at, True if the pass is done)
+    session = db.session()
+    statement = select(ServiceRequest.id, ServiceRequest.date_of_request, ServiceRequest.date_of_completion).where(
+        ServiceRequest.status == 'closed', ServiceRequest.date_of_request < cutoff
+    )
+    if after is not None:
+        statement = statement.where(tuple_(*CURSOR_COLUMNS) > tuple_(*after))
+    rows = session.connection().execute(statement.order_by(*CURSOR_COLUMNS).limit(limit)).all()
+    if not rows:
+        return 0, after, True
+
+    ids = [row.id for row in rows if (row.date_of_completion or row.date_of_request) < cutoff]
+    if ids:
+        session.execute(insert(ServiceRequestArchive).from_select(
+            REQUEST_COLUMNS, select(*[getattr(ServiceRequest, name) for name in REQUEST_COLUMNS])
+            .where(ServiceRequest.id.in_(ids))
+        ))
+        session.execute(insert(ReviewArchive).from_select(
+            REVIEW_COLUMNS, select(*[getattr(Review, name) for name in REVIEW_COLUMNS])
+            .where(Review.service_request_id.in_(ids))
+        ))
+        session.execute(delete(Review).where(Review.service_request_id.in_(ids))
+                        .execution_options(synchronize_session=False))
+        session.execute(delete(ServiceRequest).where(ServiceRequest.id.in_(ids))
+                        .execution_options(synchronize_session=False))
+        if fts_available(session.connection()):
+            remove(session.connection(), ServiceRequest, ids)
+    session.commit()
+    last = rows[-1]
+    return len(ids), [last.date_of_request, last.id], len(rows) < limit
+
+
+def archive_pass(cutoff, cursor=None, max_batches=None):
+    # Run batches from cursor; returns (requests moved, cursor to resume from or None when done)
+    limit = app.config.get('ARCHIVE_BATCH_ROWS', 500)
+    after = decode_cursor(cursor, CURSOR_COLUMNS)
+    if after is None:
+        move_late_reviews(db.session())
+        db.session.commit()
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        count, after, done = archive_batch(cutoff, after, limit)
+        moved += count
+        batches += 1
+        if done:
+            return moved, None
+    return moved, encode_cursor(after)
+
+
+@job('archive_closed_requests', concurrency=1)
+def archive_closed_requests(cutoff, cursor=None):
+    moved, cursor = archive_pass(datetime.fromisoformat(cutoff), cursor, app.config.get('ARCHIVE_PASS_BATCHES', 20))
+    app.logger.info(f"Archived {moved} closed request(s)")
+    if cursor:
+        enqueue(archive_closed_requests, cutoff=cutoff, cursor=cursor)
+
+
+@app.cli.command('archive-requests')
+@click.option('--older-than-days', type=int, default=None, help='Defaults to ARCHIVE_AFTER_DAYS.')
+@click.option('--background', is_flag=True, help='Queue the pass for `flask jobs-worker` instead of running it here.')
+def archive_requests_command(older_than_days, background):
+    """Move old closed requests and their reviews to the archive tables."""
+    cutoff = archive_cutoff(older_than_days)
+    if background:
+        enqueue(archive_closed_requests, cutoff=cutoff.isoformat())
+        print(f"Queued archiving of requests closed before {cutoff:%Y-%m-%d}.")
+        return
+    started = time.perf_counter()
+    moved, _ = archive_pass(cutoff)
+    print(f"Archived {moved} closed request(s) in {time.perf_counter() - started:.1f}s.")
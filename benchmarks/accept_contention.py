@@ -0,0 +1,179 @@
+"""
+Concurrent accept benchmark.
+
+Seeds the synthetic dataset into a scratch SQLite database, starts two
+server processes on it (as two workers would run) and opens --rounds new
+requests. For each request, --acceptors logged-in professionals, spread over
+both servers, POST /api/service_request/<id>/accept at the same moment.
+Checks that exactly one of them wins (200) and the rest get a conflict (409),
+that the request ends up with the winner, version 2 and one 'taken' feed
+event, and that the daily rollups still match a GROUP BY over the requests.
+Reports attempts per second and the latency of winners and losers.
+
+Usage:
+    python benchmarks/accept_contention.py [--preset small|medium|large] [--acceptors 50] [--rounds 20]
+                                           [--json results.json]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--preset', choices=['small', 'medium', 'large'], default='small')
+    parser.add_argument('--acceptors', type=int, default=50)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    # Configure the app before it is imported
+    scratch = tempfile.mkdtemp()
+    database_uri = 'sqlite:///' + os.path.join(scratch, 'accept_contention.db')
+    os.environ['SQLALCHEMY_DATABASE_URI'] = database_uri
+    os.environ['JOB_QUEUE_PATH'] = os.path.join(scratch, 'jobs.db')
+    os.environ['JINJA_BYTECODE_CACHE_PATH'] = os.path.join(scratch, 'jinja_bytecode')
+    os.environ.setdefault('SECRET_KEY', 'accept-contention')
+    benchmarks = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:0] = [os.path.dirname(benchmarks), benchmarks]
+
+    from sqlalchemy import func
+    import synthetic
+    from synthetic import app, db
+    from load_test import Client, serve
+    from models import User, Customer, Service, ServiceProfessional, ServiceRequest, DailyRequestRollup, RequestEvent
+    from rollups import day_of
+
+    print(f"Seeding the '{args.preset}' dataset ...")
+    synthetic.seed_dataset(seed=args.seed, **synthetic.PRESETS[args.preset])
+
+    with app.app_context():
+        acceptors = db.session.query(User.email, ServiceProfessional.id) \
+            .join(User, User.id == ServiceProfessional.user_id).order_by(ServiceProfessional.id) \
+            .limit(args.acceptors).all()
+        customer_id = db.session.query(Customer.id).order_by(Customer.id).first()[0]
+        service_id = db.session.query(Service.id).order_by(Service.id).first()[0]
+        requests = [ServiceRequest(service_id=service_id, customer_id=customer_id, status='requested',
+                                   description='Contention check') for _ in range(args.rounds)]
+        db.session.add_all(requests)
+        db.session.commit()
+        request_ids = [request.id for request in requests]
+
+    servers = []
+    context = multiprocessing.get_context('fork')
+    for _ in range(2):
+        port_queue = context.Queue()
+        server = context.Process(target=serve, args=(database_uri, port_queue))
+        server.start()
+        servers.append((server, port_queue.get(timeout=60)))
+    host = '127.0.0.1'
+
+    outcomes = {request_id: [] for request_id in request_ids}  # request id -> [(professional id, status, ms)]
+    errors = []
+    try:
+        clients = []
+        for n, (email, professional_id) in enumerate(acceptors):
+            client = Client(host, servers[n % 2][1])
+            client.login('professional', email, synthetic.PASSWORD)
+            clients.append((client, professional_id))
+        barrier = threading.Barrier(len(clients))
+        lock = threading.Lock()
+
+        def acceptor(client, professional_id):
+            for request_id in request_ids:
+                barrier.wait()
+                started = time.perf_counter()
+                try:
+                    response = client.request('POST', f'/api/service_request/{request_id}/accept', {'json': {}},
+                                              cookie=client.cookies['professional'])
+                    status = response.status
+                except Exception as e:
+                    status = repr(e)
+                with lock:
+                    outcomes[request_id].append((professional_id, status, (time.perf_counter() - started) * 1000))
+
+        threads = [threading.Thread(target=acceptor, args=client) for client in clients]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        for server, _ in servers:
+            try:
+                os.killpg(server.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+            server.join()
+
+    # Exactly one winner per request, and the database agrees with it
+    with app.app_context():
+        stored = {row.id: row for row in db.session.query(
+            ServiceRequest.id, ServiceRequest.professional_id, ServiceRequest.status, ServiceRequest.version
+        ).filter(ServiceRequest.id.in_(request_ids))}
+        taken = dict(db.session.query(RequestEvent.request_id, func.count()).filter(
+            RequestEvent.request_id.in_(request_ids), RequestEvent.kind == 'taken'
+        ).group_by(RequestEvent.request_id).all())
+        for request_id, results in outcomes.items():
+            winners = [professional_id for professional_id, status, _ in results if status == 200]
+            others = {status for _, status, _ in results if status != 200}
+            row = stored[request_id]
+            if len(winners) != 1 or others - {409}:
+                errors.append(f"request {request_id}: {len(winners)} winner(s), other results {sorted(map(str, others))}")
+            elif (row.professional_id, row.status, row.version) != (winners[0], 'accepted', 2):
+                errors.append(f"request {request_id}: stored {tuple(row)}, winner {winners[0]}")
+            if taken.get(request_id) != 1:
+                errors.append(f"request {request_id}: {taken.get(request_id, 0)} 'taken' event(s)")
+
+        day = day_of(ServiceRequest.date_of_request)
+        counted = {tuple(row[:3]): row[3] for row in db.session.query(
+            day, ServiceRequest.service_id, ServiceRequest.status, func.count()
+        ).group_by(day, ServiceRequest.service_id, ServiceRequest.status)}
+        rolled = {(str(row[0]), row[1], row[2]): row[3] for row in db.session.query(
+            DailyRequestRollup.day, DailyRequestRollup.service_id, DailyRequestRollup.status,
+            DailyRequestRollup.request_count
+        ).filter(DailyRequestRollup.request_count != 0)}
+        if counted != rolled:
+            errors.append(f"rollups differ from the requests in {len(set(counted.items()) ^ set(rolled.items()))} row(s)")
+
+    attempts = [result for results in outcomes.values() for result in results]
+    winner_ms = [ms for _, status, ms in attempts if status == 200]
+    loser_ms = [ms for _, status, ms in attempts if status == 409]
+    print(f"\n{len(acceptors)} acceptors on 2 workers, {len(request_ids)} requests, {len(attempts)} attempts "
+          f"in {elapsed:.2f} s ({len(attempts) / elapsed:.0f} attempts/s)")
+    print(f"{'result':<10}{'count':>7}{'p50 ms':>9}{'p95 ms':>9}")
+    for name, values in (('won', winner_ms), ('conflict', loser_ms)):
+        if values:
+            print(f"{name:<10}{len(values):>7}{statistics.median(values):>9.1f}{percentile(values, 0.95):>9.1f}")
+    for error in errors:
+        print(f"FAIL {error}")
+    if not errors:
+        print("Every request had exactly one winner")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'preset': args.preset, 'acceptors': len(acceptors), 'rounds': len(request_ids),
+                       'attempts_per_second': round(len(attempts) / elapsed, 1),
+                       'won_p50_ms': round(statistics.median(winner_ms), 2) if winner_ms else None,
+                       'conflict_p50_ms': round(statistics.median(loser_ms), 2) if loser_ms else None,
+                       'errors': errors}, f, indent=2)
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+API listing serialization benchmark.
+
+Seeds a scratch SQLite database with the synthetic dataset and times building
+the /api/service_requests body two ways, for pages of several sizes:
+  - orm:       ORM objects with joinedload, a dict per object walked through
+               relationships, encoded with the json module (the endpoint
+               before fields and pagination)
+  - projected: only the selected columns, rows zipped into dicts and
+               encoded with orjson (api.request_listing)
+with the default fields and with ?fields=id,status. Also reports the
+end-to-end median latency of GET /api/service_requests?per_page=100.
+
+Usage:
+    python benchmarks/api_listing.py [--preset small|medium|large] [--repeat 20] [--json results.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--preset', choices=['small', 'medium', 'large'], default='small')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    # Configure the app before it is imported
+    scratch = tempfile.mkdtemp()
+    os.environ['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(scratch, 'api_listing.db')
+    os.environ['JOB_QUEUE_PATH'] = os.path.join(scratch, 'jobs.db')
+    os.environ['JINJA_BYTECODE_CACHE_PATH'] = os.path.join(scratch, 'jinja_bytecode')
+    os.environ.setdefault('SECRET_KEY', 'api-listing')
+    benchmarks = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:0] = [os.path.dirname(benchmarks), benchmarks]
+
+    import orjson
+    from sqlalchemy.orm import joinedload
+    import synthetic
+    from synthetic import app, db
+    from models import Customer, ServiceRequest
+    from api import request_listing, REQUEST_DEFAULT_FIELDS, REQUEST_PAGE_KEY
+    from projection import rows_as_dicts
+
+    print(f"Seeding the '{args.preset}' dataset ...")
+    synthetic.seed_dataset(**synthetic.PRESETS[args.preset])
+
+    def orm_body(limit, fields):
+        requests = ServiceRequest.query.options(
+            joinedload(ServiceRequest.service_ref),
+            joinedload(ServiceRequest.customer_ref).joinedload(Customer.user_ref)
+        ).order_by(ServiceRequest.date_of_request.desc(), ServiceRequest.id.desc()).limit(limit).all()
+        values = {'id': lambda r: r.id, 'service_name': lambda r: r.service_ref.name,
+                  'customer_name': lambda r: r.customer_name, 'status': lambda r: r.status}
+        return json.dumps({'requests': [{name: values[name](r) for name in fields} for r in requests]})
+
+    def projected_body(limit, fields):
+        order = [column.desc() for column in REQUEST_PAGE_KEY]
+        rows = request_listing(fields).order_by(*order).limit(limit).all()
+        return orjson.dumps({'requests': rows_as_dicts(rows, fields)})
+
+    def timed(build, limit, fields):
+        times = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            build(limit, fields)
+            times.append((time.perf_counter() - started) * 1000)
+            db.session.remove()  # Each run starts with an empty identity map, like a request
+        return statistics.median(times)
+
+    with app.app_context():
+        total = db.session.query(ServiceRequest).count()
+        sizes = [100, 1000, total]
+        results = []
+        print(f"\n{'fields':<38}{'rows':>8}{'orm ms':>10}{'projected ms':>14}{'speedup':>9}")
+        for fields in (REQUEST_DEFAULT_FIELDS, ['id', 'status']):
+            for limit in sizes:
+                # Same rows either way
+                assert json.loads(orm_body(limit, fields)) == orjson.loads(projected_body(limit, fields))
+                orm_ms = timed(orm_body, limit, fields)
+                projected_ms = timed(projected_body, limit, fields)
+                results.append({'fields': fields, 'rows': limit, 'orm_ms': round(orm_ms, 2),
+                                'projected_ms': round(projected_ms, 2)})
+                print(f"{','.join(fields):<38}{limit:>8}{orm_ms:>10.2f}{projected_ms:>14.2f}"
+                      f"{orm_ms / projected_ms:>8.1f}x")
+
+    client = app.test_client()
+    times = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        response = client.get('/api/service_requests?per_page=100')
+        times.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200
+    endpoint_ms = statistics.median(times)
+    print(f"\nGET /api/service_requests?per_page=100: {endpoint_ms:.2f} ms median")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'preset': args.preset, 'repeat': args.repeat, 'results': results,
+                       'endpoint_ms': round(endpoint_ms, 2)}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+Closed request archive benchmark.
+
+Seeds a scratch SQLite database with the synthetic dataset, then archives the
+requests closed more than --older-than-days ago with `archive_pass`. Reports
+  - archive throughput (requests moved per second, batches of
+    ARCHIVE_BATCH_ROWS)
+  - the pages taken by service_request, review and their indexes, before
+    and after (SQLite's dbstat)
+  - the median latency of the active-work queries (open requests of every
+    status, a professional's new requests, the newest requests) before and
+    after
+and checks that the history reads (export, customer and professional
+dashboards) return the same rows after archiving as before.
+
+Usage:
+    python benchmarks/archive.py [--preset small|medium|large] [--older-than-days 90] [--repeat 50]
+                                 [--json results.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--preset', choices=['small', 'medium', 'large'], default='small')
+    parser.add_argument('--older-than-days', type=int, default=90)
+    parser.add_argument('--repeat', type=int, default=50, help='runs timed per query')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    # Configure the app before it is imported
+    scratch = tempfile.mkdtemp()
+    os.environ['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(scratch, 'archive.db')
+    os.environ['JOB_QUEUE_PATH'] = os.path.join(scratch, 'jobs.db')
+    os.environ['JINJA_BYTECODE_CACHE_PATH'] = os.path.join(scratch, 'jinja_bytecode')
+    os.environ.setdefault('SECRET_KEY', 'archive')
+    benchmarks = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:0] = [os.path.dirname(benchmarks), benchmarks]
+
+    from sqlalchemy import func, select, text
+    import synthetic
+    from synthetic import app, db
+    from models import Customer, ServiceProfessional, ServiceRequest, ServiceRequestArchive
+    from archive import archive_pass, archive_cutoff
+    from export import export_statements, stream_rows
+    from statuses import STATUS_CODES
+    import fragments
+
+    print(f"Seeding the '{args.preset}' dataset ...")
+    synthetic.seed_dataset(**synthetic.PRESETS[args.preset])
+
+    with app.app_context():
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+        professional_id = db.session.query(ServiceRequest.professional_id) \
+            .filter(ServiceRequest.professional_id.isnot(None), ServiceRequest.status == 'closed') \
+            .group_by(ServiceRequest.professional_id).order_by(func.count().desc()).first()[0]
+        # The dashboards' sessions hold user ids
+        professional_user_id = db.session.query(ServiceProfessional.user_id) \
+            .filter(ServiceProfessional.id == professional_id).scalar()
+        customer_user_id = db.session.query(Customer.user_id) \
+            .join(ServiceRequest, ServiceRequest.customer_id == Customer.id) \
+            .group_by(Customer.id).order_by(func.count().desc()).first()[0]
+
+    # Queries over work in progress, which should not care how much history there is
+    active_queries = [
+        (f'open {name}', lambda name=name: select(func.count()).select_from(ServiceRequest)
+         .where(ServiceRequest.status == name))
+        for name in STATUS_CODES if name != 'closed'
+    ] + [
+        ('new for professional', lambda: select(ServiceRequest.id)
+         .where(ServiceRequest.professional_id == professional_id, ServiceRequest.status == 'requested')
+         .order_by(ServiceRequest.date_of_request)),
+        ('newest 50', lambda: select(ServiceRequest.id)
+         .order_by(ServiceRequest.date_of_request.desc(), ServiceRequest.id.desc()).limit(50)),
+    ]
+
+    def time_queries():
+        results = {}
+        with app.app_context():
+            for name, build in active_queries:
+                times = []
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    db.session.execute(build()).all()
+                    times.append((time.perf_counter() - started) * 1000)
+                results[name] = statistics.median(times)
+        return results
+
+    def table_pages():
+        # Pages of the hot tables and of each of their indexes
+        with app.app_context():
+            rows = db.session.execute(text(
+                "SELECT s.name, m.tbl_name, sum(s.pgsize) / 4096 FROM dbstat s "
+                "JOIN sqlite_schema m ON m.name = s.name "
+                "WHERE m.tbl_name IN ('service_request', 'review') GROUP BY s.name"
+            )).all()
+        return {name: pages for name, _, pages in rows}
+
+    def history():
+        # What the history reads return
+        client = app.test_client()
+        pages = []
+        for role, user_id, path in (('customer', customer_user_id, '/customer_dashboard'),
+                                    ('professional', professional_user_id, '/professional_dashboard')):
+            with client.session_transaction() as session:
+                session['role'] = role
+                session['user_id'] = user_id
+            fragments.clear_fragments()
+            response = client.get(path)
+            assert response.status_code == 200, (path, response.status_code)
+            pages.append(response.get_data(as_text=True))
+        with app.app_context():
+            # Archived rows move from the hot part of the export to the archive part
+            exported = sorted(tuple(row) for row in stream_rows(export_statements()))
+        return exported, pages
+
+    before_ms, before_pages, before_history = time_queries(), table_pages(), history()
+
+    with app.app_context():
+        hot_before = db.session.query(ServiceRequest).count()
+        started = time.perf_counter()
+        moved, _ = archive_pass(archive_cutoff(args.older_than_days))
+        elapsed = time.perf_counter() - started
+        archived = db.session.query(ServiceRequestArchive).count()
+        db.session.execute(text('VACUUM'))
+        db.session.execute(text('ANALYZE'))
+
+    after_ms, after_pages, after_history = time_queries(), table_pages(), history()
+
+    print(f"\nArchived {moved} of {hot_before} requests (closed over {args.older_than_days} days ago) "
+          f"in {elapsed:.2f} s ({moved / elapsed if elapsed else 0:.0f} requests/s)")
+    print(f"\n{'table or index':<44}{'pages before':>14}{'after':>8}")
+    for name in sorted(before_pages):
+        print(f"{name:<44}{before_pages[name]:>14}{after_pages.get(name, 0):>8}")
+    print(f"\n{'active query':<24}{'ms before':>11}{'after':>9}{'speedup':>9}")
+    for name, _ in active_queries:
+        print(f"{name:<24}{before_ms[name]:>11.3f}{after_ms[name]:>9.3f}{before_ms[name] / after_ms[name]:>8.1f}x")
+
+    errors = []
+    if archived != moved:
+        errors.append(f"{moved} requests moved but {archived} in the archive")
+    if before_history[0] != after_history[0]:
+        errors.append("the export changed")
+    if before_history[1] != after_history[1]:
+        errors.append("a dashboard's history changed")
+    for error in errors:
+        print(f"FAIL {error}")
+    if not errors:
+        print("\nExport and dashboards show the same history after archiving")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'preset': args.preset, 'older_than_days': args.older_than_days, 'moved': moved,
+                       'requests_per_second': round(moved / elapsed, 1) if elapsed else None,
+                       'pages_before': before_pages, 'pages_after': after_pages,
+                       'active_ms_before': {name: round(ms, 3) for name, ms in before_ms.items()},
+                       'active_ms_after': {name: round(ms, 3) for name, ms in after_ms.items()},
+                       'errors': errors}, f, indent=2)
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
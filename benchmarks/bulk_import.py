@@ -0,0 +1,124 @@
+"""
+Bulk import benchmark.
+
+Writes a CSV of synthetic professionals (or customers) to a scratch directory,
+with a share of rows that must be rejected (duplicates within the file,
+usernames already registered, unknown services, bad experience values), then
+imports it into a scratch SQLite database with importer.import_users and
+reports rows/sec and the rejected rows by reason.
+
+Usage:
+    python benchmarks/bulk_import.py [--rows 100000] [--kind professional|customer] [--bad-ratio 0.02]
+                                     [--own-passwords 0] [--chunk-rows 1000]
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVICE_NAMES = ['Cleaning', 'Plumbing', 'Electrical', 'Painting', 'Carpentry', 'Gardening']
+EXISTING_USERS = 100  # Registered before the import; some CSV rows reuse their usernames
+
+
+def write_csv(path, kind, rows, bad_ratio, own_passwords, rng):
+    columns = ['username', 'email', 'phone_number', 'address', 'pin_code']
+    if kind == 'professional':
+        columns += ['service_type', 'experience', 'description']
+    if own_passwords:
+        columns.append('password')
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, columns)
+        writer.writeheader()
+        for i in range(rows):
+            row = {'username': f'{kind}{i}', 'email': f'{kind}{i}@example.com', 'phone_number': f'7{i:09d}',
+                   'address': f'{i} Station Road', 'pin_code': f'{rng.randint(110000, 130999)}'}
+            if kind == 'professional':
+                row.update(service_type=rng.choice(SERVICE_NAMES).lower(), experience=rng.randint(0, 25),
+                           description='Imported professional')
+            if own_passwords and i < own_passwords:
+                row['password'] = f'secret{i}'
+            if rng.random() < bad_ratio:
+                problem = rng.randrange(4 if kind == 'professional' else 2)
+                if problem == 0 and i:
+                    row['email'] = f'{kind}{i - 1}@example.com'  # Duplicate of the previous row
+                elif problem == 1:
+                    row['username'] = f'existing{rng.randrange(EXISTING_USERS)}'
+                elif problem == 2:
+                    row['service_type'] = 'Unknown service'
+                else:
+                    row['experience'] = 'ten'
+            writer.writerow(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--kind', choices=['professional', 'customer'], default='professional')
+    parser.add_argument('--bad-ratio', type=float, default=0.02, help='share of rows that should be rejected')
+    parser.add_argument('--own-passwords', type=int, default=0,
+                        help='rows that carry their own password (each costs a full hash)')
+    parser.add_argument('--chunk-rows', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    # Configure the app before it is imported
+    scratch = tempfile.mkdtemp()
+    os.environ['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(scratch, 'bulk_import.db')
+    os.environ['JOB_QUEUE_PATH'] = os.path.join(scratch, 'jobs.db')
+    os.environ.setdefault('SECRET_KEY', 'bulk-import')
+    sys.path.insert(0, ROOT)
+
+    from app import create_app, db
+    from models import User, Service, Customer, ServiceProfessional
+    from passwords import hash_password
+    from importer import import_users
+    import search
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        search.init_search_index()
+        for name in SERVICE_NAMES:
+            db.session.add(Service(name=name, price=500.0, description=name))
+        password_hash = hash_password('password')
+        for i in range(EXISTING_USERS):
+            db.session.add(User(username=f'existing{i}', password_hash=password_hash,
+                                email=f'existing{i}@example.com', role='customer'))
+        db.session.commit()
+
+        path = os.path.join(scratch, f'{args.kind}s.csv')
+        write_csv(path, args.kind, args.rows, args.bad_ratio, args.own_passwords, random.Random(args.seed))
+        print(f"Importing {args.rows} {args.kind} rows ({os.path.getsize(path) / 1e6:.1f} MB) "
+              f"in chunks of {args.chunk_rows} ...")
+
+        started = time.perf_counter()
+        with open(path, newline='') as f:
+            report = import_users(args.kind, f, default_password='welcome', chunk_rows=args.chunk_rows)
+        seconds = time.perf_counter() - started
+
+        model = Customer if args.kind == 'customer' else ServiceProfessional
+        stored = db.session.query(model).count()
+
+    reasons = Counter(error.split(" '")[0] for row in report['errors'] for error in row['errors'])
+    print(f"Imported {report['imported']} and rejected {report['failed']} rows in {seconds:.1f}s "
+          f"({args.rows / seconds:.0f} rows/s); {stored} {args.kind} rows stored")
+    for reason, count in reasons.most_common():
+        print(f"  {count:>6}  {reason}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'rows': args.rows, 'kind': args.kind, 'chunk_rows': args.chunk_rows,
+                       'seconds': round(seconds, 2), 'rows_per_second': round(args.rows / seconds),
+                       'imported': report['imported'], 'rejected': report['failed'],
+                       'reasons': dict(reasons)}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
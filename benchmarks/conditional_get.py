@@ -0,0 +1,153 @@
+"""
+Conditional GET benchmark.
+
+Seeds a scratch SQLite database with the synthetic dataset and, for
+view_service, view_professional, view_request and GET
+/api/service_request/<id>, reports the median latency and SQL statements of
+  - a full GET (versions looked up, page queried and rendered)
+  - a revalidation with the ETag it returned (If-None-Match), which must be
+    answered 304 after the version lookup alone
+and checks no Last-Modified is sent, so If-Modified-Since alone gets the
+full page (whole-second dates would miss same-second writes). Then edits the
+service, accepts the request and reviews it, and checks each write makes
+the pages that show it answer 200 with a new ETag.
+
+Usage:
+    python benchmarks/conditional_get.py [--preset small|medium|large] [--views 200] [--json results.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--preset', choices=['small', 'medium', 'large'], default='small')
+    parser.add_argument('--views', type=int, default=200, help='requests timed per page and kind')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    # Configure the app before it is imported
+    scratch = tempfile.mkdtemp()
+    os.environ['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(scratch, 'conditional_get.db')
+    os.environ['JOB_QUEUE_PATH'] = os.path.join(scratch, 'jobs.db')
+    os.environ['JINJA_BYTECODE_CACHE_PATH'] = os.path.join(scratch, 'jinja_bytecode')
+    os.environ.setdefault('SECRET_KEY', 'conditional-get')
+    benchmarks = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:0] = [os.path.dirname(benchmarks), benchmarks]
+
+    from sqlalchemy import event
+    import synthetic
+    from synthetic import app, db
+    from models import Service, ServiceProfessional, ServiceRequest
+    from transitions import transition_request
+
+    print(f"Seeding the '{args.preset}' dataset ...")
+    synthetic.seed_dataset(**synthetic.PRESETS[args.preset])
+
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', lambda *a: statements.append(1))
+        # An open request, and a professional of its service to take it
+        open_request = db.session.query(ServiceRequest.id, ServiceRequest.service_id, ServiceRequest.customer_id) \
+            .filter(ServiceRequest.status == 'requested', ServiceRequest.professional_id.is_(None)) \
+            .order_by(ServiceRequest.id).first()
+        professional_id = db.session.query(ServiceProfessional.id) \
+            .filter(ServiceProfessional.service_id == open_request.service_id) \
+            .order_by(ServiceProfessional.id).first()[0]
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['role'] = 'admin'
+        session['user_id'] = 1
+
+    pages = [
+        ('view_service', f'/view_service/{open_request.service_id}'),
+        ('view_professional', f'/view_professional/{professional_id}'),
+        ('view_request', f'/view_request/{open_request.id}'),
+        ('api service_request', f'/api/service_request/{open_request.id}'),
+    ]
+
+    def get(path, headers=None):
+        statements.clear()
+        started = time.perf_counter()
+        response = client.get(path, headers=headers or {})
+        return (time.perf_counter() - started) * 1000, len(statements), response
+
+    def measure(path, headers=None, status=200):
+        times, counts = [], []
+        for _ in range(args.views):
+            elapsed, count, response = get(path, headers)
+            assert response.status_code == status, (path, response.status_code, status)
+            times.append(elapsed)
+            counts.append(count)
+        return statistics.median(times), max(counts)
+
+    errors = []
+    results = {}
+    etags = {}
+    print(f"\n{'page':<22}{'full ms':>9}{'SQL':>5}{'304 ms':>9}{'SQL':>5}{'speedup':>9}")
+    for name, path in pages:
+        response = get(path)[2]
+        etags[name] = response.headers['ETag']
+        full_ms, full_sql = measure(path)
+        revalidate_ms, revalidate_sql = measure(path, {'If-None-Match': etags[name]}, status=304)
+        if 'Last-Modified' in response.headers:
+            errors.append(f"{name}: sent Last-Modified")
+        since = get(path, {'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'})[2].status_code
+        if since != 200:
+            errors.append(f"{name}: If-Modified-Since alone answered {since}")
+        results[name] = {'full_ms': round(full_ms, 3), 'full_sql': full_sql,
+                         'revalidate_ms': round(revalidate_ms, 3), 'revalidate_sql': revalidate_sql}
+        print(f"{name:<22}{full_ms:>9.2f}{full_sql:>5}{revalidate_ms:>9.2f}{revalidate_sql:>5}"
+              f"{full_ms / revalidate_ms:>8.1f}x")
+
+    # Each write must change the ETag of every page that shows what it wrote
+    def check(write, changed):
+        write()
+        for name, path in pages:
+            response = get(path, {'If-None-Match': etags[name]})[2]
+            expected = 200 if name in changed else 304
+            if response.status_code != expected:
+                errors.append(f"{write.__name__}: {name} answered {response.status_code}, expected {expected}")
+            etags[name] = response.headers['ETag']
+
+    def edit_service():
+        with app.app_context():
+            service = db.session.get(Service, open_request.service_id)
+            service.price += 50
+            db.session.commit()
+
+    def accept_request():
+        with app.app_context():
+            values, conflict = transition_request(db.session, open_request.id, 'accept', professional_id)
+            assert values, conflict
+            db.session.commit()
+
+    def review_request():
+        response = client.post('/api/reviews', json={'service_request_id': open_request.id,
+                                                     'customer_id': open_request.customer_id, 'rating': 4})
+        assert response.status_code == 201, response.status_code
+
+    check(edit_service, {'view_service', 'view_request', 'api service_request'})
+    check(accept_request, {'view_request', 'api service_request'})
+    check(review_request, {'view_service', 'view_professional'})
+
+    for error in errors:
+        print(f"FAIL {error}")
+    if not errors:
+        print("\nRevalidations answered 304 until a write changed the page, then 200")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'preset': args.preset, 'views': args.views, 'pages': results, 'errors': errors}, f, indent=2)
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
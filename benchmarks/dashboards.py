@@ -0,0 +1,149 @@
+"""
+Dashboard fragment cache benchmark.
+
+Seeds a scratch SQLite database with the synthetic dataset and, for the admin,
+customer and professional dashboards, reports the median latency and SQL
+statements of
+  - a cold view (every fragment rebuilt: queries plus rendering)
+  - a warm view (fragments reused)
+  - the first view after a write to a table the dashboard shows, which must
+    rebuild the affected fragments and show the change
+Then times compiling every template with an empty and with a filled Jinja
+bytecode cache, which is what a new worker pays on its first renders.
+
+Usage:
+    python benchmarks/dashboards.py [--preset small|medium|large] [--views 50] [--json results.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--preset', choices=['small', 'medium', 'large'], default='small')
+    parser.add_argument('--views', type=int, default=50, help='views timed per dashboard and state')
+    parser.add_argument('--per-page', type=int, default=50)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    # Configure the app before it is imported
+    scratch = tempfile.mkdtemp()
+    os.environ['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(scratch, 'dashboards.db')
+    os.environ['JOB_QUEUE_PATH'] = os.path.join(scratch, 'jobs.db')
+    os.environ['JINJA_BYTECODE_CACHE_PATH'] = os.path.join(scratch, 'jinja_bytecode')
+    os.environ.setdefault('SECRET_KEY', 'dashboards')
+    benchmarks = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:0] = [os.path.dirname(benchmarks), benchmarks]
+
+    from jinja2 import Environment
+    from sqlalchemy import event, func
+    import synthetic
+    from synthetic import app, db
+    from models import Customer, ServiceProfessional, ServiceRequest
+    import fragments
+
+    print(f"Seeding the '{args.preset}' dataset ...")
+    synthetic.seed_dataset(**synthetic.PRESETS[args.preset])
+
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', lambda *a: statements.append(1))
+        # The busiest customer and professional, so their tables are the largest.
+        # Sessions hold user ids
+        customer_user_id = db.session.query(Customer.user_id) \
+            .join(ServiceRequest, ServiceRequest.customer_id == Customer.id) \
+            .group_by(Customer.id).order_by(func.count().desc()).first()[0]
+        professional_user_id = db.session.query(ServiceProfessional.user_id) \
+            .join(ServiceRequest, ServiceRequest.professional_id == ServiceProfessional.id) \
+            .filter(ServiceRequest.status == 'accepted') \
+            .group_by(ServiceProfessional.id).order_by(func.count().desc()).first()[0]
+        open_request_id = db.session.query(ServiceRequest.id).filter(ServiceRequest.status != 'closed') \
+            .order_by(ServiceRequest.date_of_request.desc()).first()[0]
+
+    def client_as(role, user_id=1):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['role'] = role
+            session['user_id'] = user_id
+        return client
+
+    def view(client, path):
+        statements.clear()
+        started = time.perf_counter()
+        response = client.get(path)
+        elapsed = (time.perf_counter() - started) * 1000
+        assert response.status_code == 200, (path, response.status_code)
+        return elapsed, len(statements), response.get_data(as_text=True)
+
+    def measure(client, path, before=None):
+        # Median latency and statements over --views views, each after before()
+        times, counts = [], []
+        for _ in range(args.views):
+            if before:
+                before()
+            elapsed, count, _ = view(client, path)
+            times.append(elapsed)
+            counts.append(count)
+        return statistics.median(times), max(counts)
+
+    dashboards = [
+        ('admin (requests tab)', client_as('admin'), f'/admin_dashboard?tab=requests&per_page={args.per_page}'),
+        ('customer', client_as('customer', customer_user_id), '/customer_dashboard'),
+        ('professional', client_as('professional', professional_user_id), '/professional_dashboard'),
+    ]
+    results = {}
+    print(f"\n{'dashboard':<22}{'cold ms':>10}{'SQL':>6}{'warm ms':>10}{'SQL':>6}{'speedup':>9}")
+    for name, client, path in dashboards:
+        cold_ms, cold_sql = measure(client, path, before=fragments.clear_fragments)
+        view(client, path)
+        warm_ms, warm_sql = measure(client, path)
+        results[name] = {'cold_ms': round(cold_ms, 2), 'cold_sql': cold_sql,
+                         'warm_ms': round(warm_ms, 2), 'warm_sql': warm_sql}
+        print(f"{name:<22}{cold_ms:>10.2f}{cold_sql:>6}{warm_ms:>10.2f}{warm_sql:>6}{cold_ms / warm_ms:>8.1f}x")
+
+    # A write through the app must show up on the next view
+    admin = client_as('admin')
+    path = f'/admin_dashboard?tab=requests&per_page={args.per_page}'
+    view(admin, path)
+    marker = f'action="/close_request/{open_request_id}"'
+    before_write = marker in view(admin, path)[2]
+    admin.post(f'/close_request/{open_request_id}')
+    _, rebuilt_sql, body = view(admin, path)
+    invalidated = marker not in body if before_write else None
+    print(f"\nAfter closing request {open_request_id}: next admin view ran {rebuilt_sql} statements, "
+          f"change {'shown' if invalidated else 'NOT shown' if invalidated is False else 'not on this page'}")
+
+    # Template compilation: what each new worker pays without and with the bytecode cache
+    names = [name for name in app.jinja_loader.list_templates() if name.endswith('.html')]
+
+    def compile_all(bytecode_cache):
+        environment = Environment(loader=app.jinja_loader, bytecode_cache=bytecode_cache)
+        started = time.perf_counter()
+        for name in names:
+            environment.get_template(name)
+        return (time.perf_counter() - started) * 1000
+
+    bytecode_cache = fragments.TemplateBytecodeCache(os.path.join(scratch, 'compile_check'))
+    cold_compile = statistics.median(compile_all(None) for _ in range(5))
+    compile_all(bytecode_cache)  # Fill the cache
+    warm_compile = statistics.median(compile_all(bytecode_cache) for _ in range(5))
+    print(f"\nLoading {len(names)} templates in a new worker: {cold_compile:.1f} ms compiled, "
+          f"{warm_compile:.1f} ms from the bytecode cache")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'preset': args.preset, 'views': args.views, 'dashboards': results,
+                       'write_invalidates': invalidated, 'statements_after_write': rebuilt_sql,
+                       'templates': len(names), 'compile_ms': round(cold_compile, 2),
+                       'bytecode_cache_ms': round(warm_compile, 2)}, f, indent=2)
+    if invalidated is False:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
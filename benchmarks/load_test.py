@@ -0,0 +1,312 @@
+"""
+Load test.
+
+Seeds a synthetic dataset (see synthetic.py) into a scratch SQLite database,
+serves the app from a separate process with Werkzeug's threaded server, and
+drives a weighted mix of routes.py and api.py endpoints from concurrent
+keep-alive HTTP clients. Reports throughput and p50/p95/p99 latency per
+endpoint, can write the results as JSON, and can compare them with a previous
+run's JSON to flag regressions.
+
+Usage:
+    python benchmarks/load_test.py [--preset small|medium|large] [--duration 30] [--concurrency 16]
+                                   [--output results.json] [--compare baseline.json] [--max-regression 0.2]
+    python benchmarks/load_test.py --database /tmp/large.db --preset large      # seed once ...
+    python benchmarks/load_test.py --database /tmp/large.db --skip-seed         # ... and reuse it
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --database ...   # against a running server
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import platform
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (name, weight, session role, method, path or function(rng, ids) -> path, body or None)
+SCENARIOS = [
+    ('api services', 15, None, 'GET', '/api/services', None),
+    ('services', 10, 'customer', 'GET', '/services', None),
+    ('customer_dashboard', 10, 'customer', 'GET', '/customer_dashboard', None),
+    ('professional_dashboard', 10, 'professional', 'GET', '/professional_dashboard', None),
+    ('admin_dashboard', 8, 'admin', 'GET', lambda rng, ids: f"/admin_dashboard?tab=requests&request_status={rng.choice(['requested', 'closed', ''])}", None),
+    ('admin_search', 5, 'admin', 'POST', '/admin/search',
+     lambda rng, ids: {'search_type': 'professionals', 'search_text': rng.choice(['Cleaning', 'Plumbing', 'Market'])}),
+    ('view_professional', 8, 'admin', 'GET', lambda rng, ids: f"/view_professional/{rng.choice(ids['professionals'])}", None),
+    ('view_request', 8, 'admin', 'GET', lambda rng, ids: f"/view_request/{rng.choice(ids['requests'])}", None),
+    ('api candidates', 10, None, 'GET', lambda rng, ids: f"/api/service_request/{rng.choice(ids['requests'])}/candidates", None),
+    ('api summary', 3, 'admin', 'GET', '/api/summary', None),
+    ('api create request', 5, None, 'POST', '/api/service_request',
+     lambda rng, ids: {'json': {'service_id': rng.choice(ids['services']), 'customer_id': rng.choice(ids['customers']),
+                                'details': 'Load test'}}),
+    ('api service_requests', 5, None, 'GET',
+     lambda rng, ids: f"/api/service_requests?per_page=100&status={rng.choice(['requested', 'closed', ''])}", None),
+]
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+def serve(database_uri, port_queue):
+    # Runs in a forked process: a fresh connection pool, then Werkzeug's threaded server
+    from werkzeug.serving import make_server, WSGIRequestHandler
+    from app import create_app, db
+
+    app = create_app()
+    os.setpgid(0, 0)  # Its own process group, so stopping it also stops the hashing pool's workers
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=KeepAliveHandler)
+    port_queue.put(server.server_port)
+    server.serve_forever()
+
+
+class Client:
+    # One keep-alive connection with the session cookies of each role
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.connection = http.client.HTTPConnection(host, port, timeout=60)
+        self.cookies = {}
+
+    def request(self, method, path, body=None, cookie=None):
+        headers = {}
+        if cookie:
+            headers['Cookie'] = cookie
+        data = None
+        if isinstance(body, dict) and 'json' in body:
+            data = json.dumps(body['json'])
+            headers['Content-Type'] = 'application/json'
+        elif body is not None:
+            data = urlencode(body)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        try:
+            self.connection.request(method, path, body=data, headers=headers)
+            response = self.connection.getresponse()
+            response.read()
+        except (http.client.HTTPException, OSError):
+            # Reconnect once; the server may have closed an idle connection
+            self.connection.close()
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            self.connection.request(method, path, body=data, headers=headers)
+            response = self.connection.getresponse()
+            response.read()
+        return response
+
+    def login(self, role, email, password):
+        response = self.request('POST', '/login', {'email': email, 'password': password})
+        cookie = response.getheader('Set-Cookie', '').split(';', 1)[0]
+        if response.status != 302 or not cookie:
+            raise RuntimeError(f'Login as {email} failed with {response.status}')
+        self.cookies[role] = cookie
+
+
+def run_load(host, port, ids, duration, concurrency, warmup, seed, password):
+    names = [scenario[0] for scenario in SCENARIOS]
+    weights = [scenario[1] for scenario in SCENARIOS]
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    measuring = threading.Event()
+    stop = threading.Event()
+    login_errors = []
+
+    def worker(n):
+        rng = random.Random(seed + n)
+        client = Client(host, port)
+        try:
+            client.login('admin', 'admin@example.com', 'admin')
+            client.login('customer', rng.choice(ids['customer_emails']), password)
+            client.login('professional', rng.choice(ids['professional_emails']), password)
+        except (RuntimeError, http.client.HTTPException, OSError) as e:
+            login_errors.append(str(e))
+            stop.set()
+            return
+        while not stop.is_set():
+            index = rng.choices(range(len(SCENARIOS)), weights)[0]
+            name, weight, role, method, path, body = SCENARIOS[index]
+            path = path(rng, ids) if callable(path) else path
+            body = body(rng, ids) if callable(body) else body
+            started = time.perf_counter()
+            try:
+                status = client.request(method, path, body, client.cookies.get(role)).status
+            except (http.client.HTTPException, OSError):
+                status = 599
+            elapsed = time.perf_counter() - started
+            if measuring.is_set():
+                latencies[name].append(elapsed)
+                if status >= 400:
+                    errors[name] += 1
+
+    threads = [threading.Thread(target=worker, args=(n,), daemon=True) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    time.sleep(warmup)
+    measuring.set()
+    started = time.perf_counter()
+    time.sleep(duration)
+    measuring.clear()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for thread in threads:
+        thread.join(60)
+    if login_errors:
+        raise RuntimeError(login_errors[0])
+
+    results = {}
+    for name in names:
+        values = latencies[name]
+        results[name] = {
+            'requests': len(values),
+            'errors': errors[name],
+            'rps': round(len(values) / elapsed, 2),
+            'p50_ms': round(percentile(values, 0.50), 2),
+            'p95_ms': round(percentile(values, 0.95), 2),
+            'p99_ms': round(percentile(values, 0.99), 2),
+        }
+    total = sum(len(values) for values in latencies.values())
+    return results, round(total / elapsed, 2)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, max_regression):
+    # Endpoints whose p95 grew by more than max_regression (a fraction) over the baseline run
+    regressions = []
+    for name, current in results['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(name)
+        if not previous or not previous['p95_ms'] or not current['requests']:
+            continue
+        change = current['p95_ms'] / previous['p95_ms'] - 1
+        print(f"{name:<24} p95 {previous['p95_ms']:>9.2f} -> {current['p95_ms']:>9.2f} ms  {change:+.0%}")
+        if change > max_regression:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--preset', choices=['small', 'medium', 'large'], default='small')
+    parser.add_argument('--customers', type=int, help='override the preset')
+    parser.add_argument('--professionals', type=int, help='override the preset')
+    parser.add_argument('--requests', type=int, help='override the preset')
+    parser.add_argument('--seed', type=int, default=42, help='random seed for the data and the request mix')
+    parser.add_argument('--database', help='SQLite file to seed or reuse (default: a scratch file)')
+    parser.add_argument('--skip-seed', action='store_true', help='reuse the data already in --database')
+    parser.add_argument('--url', help='test an already running server instead of starting one')
+    parser.add_argument('--duration', type=float, default=30.0, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=5.0, help='unmeasured seconds before measuring')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent clients')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON results of a previous run to compare with')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='allowed p95 growth over --compare (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    # Configure the app before it is imported
+    scratch = tempfile.mkdtemp()
+    database = args.database or os.path.join(scratch, 'load_test.db')
+    database_uri = 'sqlite:///' + os.path.abspath(database)
+    os.environ['SQLALCHEMY_DATABASE_URI'] = database_uri
+    os.environ.setdefault('JOB_QUEUE_PATH', os.path.join(scratch, 'jobs.db'))
+    os.environ.setdefault('JINJA_BYTECODE_CACHE_PATH', os.path.join(scratch, 'jinja_bytecode'))
+    os.environ.setdefault('SECRET_KEY', 'load-test')
+    sys.path.insert(0, ROOT)
+
+    import synthetic
+
+    dataset = dict(synthetic.PRESETS[args.preset])
+    for key in ('customers', 'professionals', 'requests'):
+        if getattr(args, key) is not None:
+            dataset[key] = getattr(args, key)
+
+    seed_timings = {}
+    if not args.skip_seed:
+        print(f"Seeding {dataset['customers']} customers, {dataset['professionals']} professionals, "
+              f"{dataset['requests']} requests ...")
+        seed_timings = synthetic.seed_dataset(seed=args.seed, **dataset)
+        print('Seeded in ' + ', '.join(f'{step} {seconds:.1f}s' for step, seconds in seed_timings.items()))
+    ids = synthetic.sample_ids()
+
+    server = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        port_queue = multiprocessing.get_context('fork').Queue()
+        # Not a daemon: the server starts its own password hashing pool
+        server = multiprocessing.get_context('fork').Process(target=serve, args=(database_uri, port_queue))
+        server.start()
+        host, port = '127.0.0.1', port_queue.get(timeout=60)
+
+    try:
+        print(f"Running {args.concurrency} clients for {args.warmup:.0f}s warmup + {args.duration:.0f}s against {host}:{port}")
+        endpoints, throughput = run_load(host, port, ids, args.duration, args.concurrency, args.warmup,
+                                         args.seed, synthetic.PASSWORD)
+    finally:
+        if server is not None:
+            try:
+                os.killpg(server.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+            server.join()
+
+    print(f"\n{'endpoint':<24} {'requests':>8} {'errors':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, result in endpoints.items():
+        print(f"{name:<24} {result['requests']:>8} {result['errors']:>6} {result['rps']:>8.2f} "
+              f"{result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f}")
+    print(f"\nThroughput: {throughput} requests/s")
+
+    results = {
+        'revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'dataset': dict(dataset, seed=args.seed, reused=args.skip_seed),
+        'seed_seconds': {step: round(seconds, 2) for step, seconds in seed_timings.items()},
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+        'throughput_rps': throughput,
+        'endpoints': endpoints,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.compare} ({baseline.get('revision')}):")
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print(f"\n{len(regressions)} endpoint(s) regressed by more than {args.max_regression:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
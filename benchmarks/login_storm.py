@@ -0,0 +1,123 @@
+"""
+Login storm benchmark.
+
+Seeds users in a scratch SQLite database, then runs concurrent logins against
+/login while a probe thread requests an unrelated route, and reports logins/sec
+and the probe's latency percentiles. Compare the hashing pool with inline
+hashing by running it with --hash-workers 0 and --hash-workers N.
+
+Usage:
+    python benchmarks/login_storm.py [--users 32] [--concurrency 16] [--duration 10] [--hash-workers 4]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=32)
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent login threads')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds to run the storm')
+    parser.add_argument('--hash-workers', type=int, default=os.cpu_count() or 2,
+                        help='PASSWORD_HASH_WORKERS for this run (0 = inline hashing)')
+    parser.add_argument('--probe', default='/services', help='unrelated route to measure during the storm')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    # Configure the app before it is imported
+    scratch = tempfile.mkdtemp()
+    os.environ['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(scratch, 'login_storm.db')
+    os.environ['JOB_QUEUE_PATH'] = os.path.join(scratch, 'jobs.db')
+    os.environ['PASSWORD_HASH_WORKERS'] = str(args.hash_workers)
+    os.environ.setdefault('SECRET_KEY', 'login-storm')
+    sys.path.insert(0, ROOT)
+
+    from app import create_app, db
+    from models import User, Customer
+    from passwords import hash_password
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        for i in range(args.users):
+            user = User(username=f'storm{i}', password_hash=hash_password('password'),
+                        email=f'storm{i}@example.com', role='customer')
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(Customer(user_id=user.id))
+        db.session.commit()
+
+    stop = threading.Event()
+    login_latencies = []
+    probe_latencies = []
+    errors = []
+
+    def login_loop(n):
+        client = app.test_client()
+        i = n
+        while not stop.is_set():
+            started = time.perf_counter()
+            response = client.post('/login', data={'email': f'storm{i % args.users}@example.com', 'password': 'password'})
+            login_latencies.append(time.perf_counter() - started)
+            if response.status_code != 302 or 'customer_dashboard' not in response.headers.get('Location', ''):
+                errors.append(response.status_code)
+            i += args.concurrency
+
+    def probe_loop():
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['role'] = 'customer'
+            sess['user_id'] = 1
+        while not stop.is_set():
+            started = time.perf_counter()
+            client.get(args.probe)
+            probe_latencies.append(time.perf_counter() - started)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=login_loop, args=(n,)) for n in range(args.concurrency)]
+    threads.append(threading.Thread(target=probe_loop))
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    results = {
+        'hash_workers': args.hash_workers,
+        'concurrency': args.concurrency,
+        'logins': len(login_latencies),
+        'login_errors': len(errors),
+        'logins_per_second': round(len(login_latencies) / elapsed, 2),
+        'login_p50_ms': round(percentile(login_latencies, 0.50), 2),
+        'login_p99_ms': round(percentile(login_latencies, 0.99), 2),
+        'probe_route': args.probe,
+        'probe_requests': len(probe_latencies),
+        'probe_p50_ms': round(percentile(probe_latencies, 0.50), 2),
+        'probe_p99_ms': round(percentile(probe_latencies, 0.99), 2),
+    }
+    for key, value in results.items():
+        print(f'{key:<20} {value}')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
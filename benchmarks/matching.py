@@ -0,0 +1,64 @@
+"""
+Candidate matching lookup benchmark.
+
+Loads the in-memory matching index with synthetic professionals and reports
+the latency of find-candidate lookups for random services and pin codes.
+
+Usage:
+    python benchmarks/matching.py [--professionals 100000] [--services 20] [--lookups 10000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Point the app at a scratch database before it is imported
+os.environ['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'matching.db')
+os.environ.setdefault('SECRET_KEY', 'matching-benchmark')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from matching import Candidate, MatchingIndex
+
+
+def random_pin(rng):
+    # Six digit pin codes clustered into a few hundred districts
+    return f'{rng.randint(110, 855)}{rng.randint(0, 999):03d}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--professionals', type=int, default=100000)
+    parser.add_argument('--services', type=int, default=20)
+    parser.add_argument('--lookups', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    index = MatchingIndex()
+    started = time.perf_counter()
+    index.load(
+        Candidate(i, i, rng.randint(1, args.services), random_pin(rng), rng.uniform(0, 5), rng.randint(0, 30),
+                  rng.random() < 0.9, rng.random() < 0.95)
+        for i in range(1, args.professionals + 1)
+    )
+    print(f"Loaded {args.professionals} professionals in {time.perf_counter() - started:.2f}s")
+
+    timings = []
+    for _ in range(args.lookups):
+        service_id = rng.randint(1, args.services)
+        pin_code = random_pin(rng)
+        started = time.perf_counter()
+        index.lookup(service_id, pin_code)
+        timings.append(time.perf_counter() - started)
+
+    timings.sort()
+    def percentile(p):
+        return timings[min(len(timings) - 1, int(len(timings) * p))] * 1000
+    print(f"{args.lookups} lookups: p50 {percentile(0.50):.3f} ms, p95 {percentile(0.95):.3f} ms, "
+          f"p99 {percentile(0.99):.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
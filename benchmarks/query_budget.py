@@ -0,0 +1,158 @@
+"""
+Query budget check (N+1 regression guard).
+
+Seeds a scratch SQLite database at a small and a large size, requests every read
+endpoint with an SQL statement counter attached to the engine, and exits with a
+non-zero status if any endpoint issues more statements on the larger dataset.
+
+Usage:
+    python benchmarks/query_budget.py [--small 5] [--large 50]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+# Point the app at a scratch database before it is imported
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'query_budget.db')
+os.environ['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + DB_PATH
+os.environ['JOB_QUEUE_PATH'] = os.path.join(os.path.dirname(DB_PATH), 'jobs.db')
+os.environ['JINJA_BYTECODE_CACHE_PATH'] = os.path.join(os.path.dirname(DB_PATH), 'jinja_bytecode')
+os.environ.setdefault('SECRET_KEY', 'query-budget')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from app import create_app, db
+from models import User, Customer, ServiceProfessional, Service, ServiceRequest, Review
+import search
+
+app = create_app()
+
+# (name, session role, method, path, form data)
+ENDPOINTS = [
+    ('admin_dashboard (services)', 'admin', 'GET', '/admin_dashboard?tab=services', None),
+    ('admin_dashboard (requests)', 'admin', 'GET', '/admin_dashboard?tab=requests&per_page=100', None),
+    ('admin_search (professionals)', 'admin', 'POST', '/admin/search', {'search_type': 'professionals', 'search_text': 'pro'}),
+    ('admin_search (service_requests)', 'admin', 'POST', '/admin/search', {'search_type': 'service_requests', 'search_text': '1'}),
+    ('view_professional', 'admin', 'GET', '/view_professional/1', None),
+    ('view_request', 'admin', 'GET', '/view_request/1', None),
+    ('view_service', 'admin', 'GET', '/view_service/1', None),
+    ('services', 'customer', 'GET', '/services', None),
+    ('customer_dashboard', 'customer', 'GET', '/customer_dashboard', None),
+    ('professional_dashboard', 'professional', 'GET', '/professional_dashboard', None),
+    ('api services', None, 'GET', '/api/services', None),
+    ('api service_requests', None, 'GET', '/api/service_requests', None),
+]
+
+
+def seed(scale):
+    # Rebuild the schema and seed `scale` customers, professionals and requests.
+    # Customer 1 and professional 1 own every request so their dashboards grow with scale.
+    db.drop_all()
+    db.create_all()
+    search.init_search_index()
+    if search.fts_available():
+        search.rebuild_index()  # Clears documents left over from the previous run
+
+    service = Service(name='Cleaning', price=250.0, description='Home cleaning')
+    db.session.add(service)
+    db.session.flush()
+
+    customers = []
+    professionals = []
+    for i in range(scale):
+        customer_user = User(username=f'customer{i}', password_hash='x', email=f'customer{i}@example.com',
+                             phone_number=f'90000{i:05d}', role='customer')
+        professional_user = User(username=f'professional{i}', password_hash='x', email=f'professional{i}@example.com',
+                                 phone_number=f'80000{i:05d}', role='professional')
+        db.session.add_all([customer_user, professional_user])
+        db.session.flush()
+
+        customer = Customer(user_id=customer_user.id, address=f'{i} Main Street', pin_code='560001')
+        professional = ServiceProfessional(user_id=professional_user.id, service_type=service.name, experience=i % 10,
+                                           service_id=service.id, pin_code='560001', is_approved=True)
+        db.session.add_all([customer, professional])
+        customers.append(customer)
+        professionals.append(professional)
+    db.session.flush()
+
+    for i in range(scale):
+        closed = i % 2 == 1
+        service_request = ServiceRequest(service_id=service.id, customer_id=customers[0].id,
+                                         professional_id=professionals[0].id,
+                                         status='closed' if closed else 'requested')
+        db.session.add(service_request)
+        db.session.flush()
+        if closed:
+            db.session.add(Review(service_request_id=service_request.id, customer_id=customers[0].id,
+                                  rating=5, remarks='Great'))
+    db.session.commit()
+
+
+def session_user(role):
+    # Sessions hold user ids: customer 1 and professional 1 (who owns every request) each have their own user
+    if role == 'professional':
+        return db.session.get(ServiceProfessional, 1).user_id
+    if role == 'customer':
+        return db.session.get(Customer, 1).user_id
+    return 1
+
+
+def count_queries():
+    # Issue every endpoint once and return {name: (status code, statement count)}
+    counts = {}
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        for name, role, method, path, data in ENDPOINTS:
+            client = app.test_client()
+            if role:
+                with client.session_transaction() as sess:
+                    sess['role'] = role
+                    sess['user_id'] = session_user(role)
+            statements.clear()
+            response = client.open(path, method=method, data=data)
+            counts[name] = (response.status_code, len(statements))
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--small', type=int, default=5, help='rows per table for the baseline run')
+    parser.add_argument('--large', type=int, default=50, help='rows per table for the comparison run')
+    args = parser.parse_args()
+
+    with app.app_context():
+        seed(args.small)
+        small = count_queries()
+        seed(args.large)
+        large = count_queries()
+
+    failures = 0
+    print(f"{'endpoint':<36} {'status':>6} {'small':>6} {'large':>6}")
+    for name, _, _, _, _ in ENDPOINTS:
+        status, small_count = small[name]
+        large_status, large_count = large[name]
+        verdict = ''
+        if status >= 500 or large_status >= 500:
+            verdict = 'ERROR'
+            failures += 1
+        elif large_count > small_count:
+            verdict = 'GROWS WITH ROWS'
+            failures += 1
+        print(f"{name:<36} {large_status:>6} {small_count:>6} {large_count:>6}  {verdict}")
+
+    if failures:
+        print(f"\n{failures} endpoint(s) over budget")
+        sys.exit(1)
+    print('\nAll endpoints within budget')
+
+
+if __name__ == '__main__':
+    main()
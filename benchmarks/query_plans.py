@@ -0,0 +1,172 @@
+"""
+Query plan check (full scan regression guard).
+
+Seeds the scratch SQLite database used by query_budget.py, requests every
+endpoint in routes.py and api.py, runs EXPLAIN QUERY PLAN for each statement it
+issued and exits with a non-zero status if any of them scans a whole table
+that grows with usage, unless the scan is bounded (it walks an index in the
+requested order and stops at a LIMIT) or listed in ALLOWED_SCANS. An endpoint
+answering 5xx fails the check too, as its plans cover a code path that never
+finishes, unless it is listed in KNOWN_ERRORS; those still have the plans of
+the queries they ran checked.
+
+Usage:
+    python benchmarks/query_plans.py [--scale 200] [--verbose]
+"""
+import argparse
+import re
+import sys
+
+from sqlalchemy import event
+from query_budget import app, db, seed, session_user, ENDPOINTS
+
+# Tables whose size grows with usage; scanning the service catalog is fine
+WATCHED_TABLES = {'user', 'customer', 'service_professional', 'service_request', 'review',
+                  'rating_summary', 'daily_request_rollup', 'service_request_archive', 'review_archive'}
+
+# (name, session role, method, path, form data or JSON body), in addition to query_budget.ENDPOINTS.
+# Writes come last so the reads see the seeded data.
+EXTRA_ENDPOINTS = [
+    ('admin_dashboard (requested)', 'admin', 'GET', '/admin_dashboard?tab=requests&request_status=requested', None),
+    ('admin_dashboard (professionals)', 'admin', 'GET', '/admin_dashboard?tab=professionals', None),
+    ('admin_search (services)', 'admin', 'POST', '/admin/search', {'search_type': 'services', 'search_text': 'clean'}),
+    ('admin_summary', 'admin', 'GET', '/admin/summary', None),
+    ('admin export', 'admin', 'GET', '/admin/export/service_requests?format=csv&status=closed', None),
+    ('my_requests', 'customer', 'GET', '/my_requests', None),
+    ('view_reviews', 'customer', 'GET', '/reviews/1', None),
+    ('professional_search', 'professional', 'POST', '/professional/search',
+     {'search_type': 'closed_services', 'search_text': 'customer'}),
+    ('professional_profile', 'professional', 'GET', '/professional_profile', None),
+    ('view_requests', 'professional', 'GET', '/requests', None),
+    ('my_jobs', 'professional', 'GET', '/my_jobs', None),
+    ('api summary', 'admin', 'GET', '/api/summary', None),
+    ('api candidates', None, 'GET', '/api/service_request/1/candidates', None),
+    ('api service_requests (status)', None, 'GET', '/api/service_requests?status=requested&fields=id,status', None),
+    ('api service_requests (professional)', None, 'GET',
+     '/api/service_requests?professional_id=1&fields=id,professional_name,date_of_request', None),
+    ('api service_requests (service)', None, 'GET', '/api/service_requests?service_id=1&status=closed', None),
+    ('login', None, 'POST', '/login', {'email': 'customer1@example.com', 'password': 'wrong'}),
+    ('register_customer', None, 'POST', '/register/customer',
+     {'username': 'new', 'email': 'new@example.com', 'password': 'pw', 'confirm_password': 'pw',
+      'phone_number': '7000000000', 'address': '1 Road', 'pin_code': '560001'}),
+    ('service_request', 'customer', 'POST', '/service_request/1', {'description': 'Kitchen'}),
+    ('api service_request', None, 'POST', '/api/service_request',
+     {'json': {'service_id': 1, 'customer_id': 1, 'description': 'Bathroom'}}),
+    ('accept_request', 'professional', 'POST', '/accept_request/2', None),
+    ('complete_request', 'professional', 'POST', '/complete_request/2', None),
+    ('close_request', 'admin', 'POST', '/close_request/4', None),
+    ('submit_review', 'customer', 'POST', '/submit_review/1', {'service_request_id': '4', 'rating': '4', 'comment': 'Fine'}),
+    ('api reviews', None, 'POST', '/api/reviews',
+     {'json': {'service_request_id': 6, 'customer_id': 1, 'rating': 3, 'remarks': 'Ok'}}),
+    ('cancel_request', 'customer', 'POST', '/cancel_request/9', None),
+    ('approve_professional', 'admin', 'POST', '/admin/approve_professional/2', None),
+    ('block user', 'admin', 'POST', '/admin/block/3', None),
+]
+
+# (endpoint, table): why scanning the whole table is intended
+ALLOWED_SCANS = {
+    ('admin export', 'service_request'): 'streams every request in the date range',
+    ('admin_dashboard (services)', 'daily_request_rollup'): 'status counts sum a rollup row per day, service and status',
+    ('admin_dashboard (requests)', 'daily_request_rollup'): 'status counts sum a rollup row per day, service and status',
+    ('admin_dashboard (requested)', 'daily_request_rollup'): 'status counts sum a rollup row per day, service and status',
+    ('admin_dashboard (professionals)', 'daily_request_rollup'): 'status counts sum a rollup row per day, service and status',
+    ('api candidates', 'service_professional'): 'the matching index loads every professional once',
+}
+
+# endpoint: why it answers 5xx (broken independently of its queries)
+KNOWN_ERRORS = {
+    'my_requests': 'customer/my_requests.html does not exist',
+    'view_reviews': 'view_reviews.html does not exist',
+    'my_jobs': 'professional/my_jobs.html does not exist',
+    'block user': "redirects to url_for('dashboard'), which no route defines",
+}
+
+SCAN = re.compile(r'^SCAN (\w+)(?: AS (\w+))?')
+EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+
+
+def capture_statements():
+    # Issue every endpoint once and return {name: (status code, [(statement, parameters)])}
+    captured = {}
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(EXPLAINABLE):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        for name, role, method, path, data in ENDPOINTS + EXTRA_ENDPOINTS:
+            client = app.test_client()
+            if role:
+                with client.session_transaction() as sess:
+                    sess['role'] = role
+                    sess['user_id'] = session_user(role)
+            statements.clear()
+            if data and 'json' in data:
+                response = client.open(path, method=method, json=data['json'])
+            else:
+                response = client.open(path, method=method, data=data)
+            response.close()
+            captured[name] = (response.status_code, list(statements))
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return captured
+
+
+def full_scans(statement, plan):
+    # Tables scanned from start to end; a scan that walks an index in ORDER BY order up to a LIMIT is bounded
+    details = [row[-1] for row in plan]
+    bounded = ' LIMIT ' in statement.upper() and not any('TEMP B-TREE FOR ORDER BY' in d for d in details)
+    tables = set()
+    for detail in details:
+        match = SCAN.match(detail)
+        if match and match.group(1) in WATCHED_TABLES and not bounded:
+            tables.add(match.group(1))
+    return tables
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=int, default=200, help='rows per table')
+    parser.add_argument('--verbose', action='store_true', help='print every plan')
+    args = parser.parse_args()
+
+    app.logger.disabled = True  # Endpoints that fail after their queries would print tracebacks
+
+    failures = 0
+    with app.app_context():
+        seed(args.scale)
+        captured = capture_statements()
+        connection = db.engine.connect()
+        try:
+            for name, (status, statements) in captured.items():
+                problems = []
+                for statement, parameters in statements:
+                    plan = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+                    if args.verbose:
+                        print(f'--- {name}\n{statement}\n' + '\n'.join(f'    {row[-1]}' for row in plan))
+                    for table in sorted(full_scans(statement, plan)):
+                        if (name, table) not in ALLOWED_SCANS:
+                            problems.append(f'FULL SCAN {table}: ' + ' '.join(statement.split())[:160])
+                if status >= 500:
+                    if name in KNOWN_ERRORS:
+                        problems.insert(0, f'KNOWN ERROR {status}: {KNOWN_ERRORS[name]}')
+                    else:
+                        problems.insert(0, f'ERROR {status}')
+                verdict = 'ok' if not problems else problems[0]
+                print(f"{name:<36} {status:>6} {len(statements):>4}  {verdict}")
+                for problem in problems[1:]:
+                    print(f"{'':<48}{problem}")
+                failures += any(not problem.startswith('KNOWN ERROR') for problem in problems)
+        finally:
+            connection.close()
+
+    if failures:
+        print(f"\n{failures} endpoint(s) with errors or full scans")
+        sys.exit(1)
+    print('\nNo unexpected errors or full scans')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Read replica routing check.
+
+Runs the app against two SQLite files, a primary and a "replica" that is a
+copy of it made with SQLite's backup API, seeds a small synthetic dataset and
+checks where each request's statements go:
+  - API reads go to the replica
+  - dashboard tables are built from the primary (they are cached until the
+    next write, see fragments.py) and a repeat view runs no SQL at all
+  - writes go to the primary, and the writer's next reads too (stickiness)
+  - other visitors keep reading the (lagging) replica
+  - once REPLICA_STICKY_SECONDS have passed the writer reads the replica again
+  - work outside a request reads the primary
+Exits with a non-zero status if any check fails.
+
+Usage:
+    python benchmarks/replicas.py [--sticky-seconds 1]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sticky-seconds', type=float, default=1.0)
+    args = parser.parse_args()
+
+    # Configure the app before it is imported
+    scratch = tempfile.mkdtemp()
+    primary_path = os.path.join(scratch, 'primary.db')
+    replica_path = os.path.join(scratch, 'replica.db')
+    os.environ['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + primary_path
+    os.environ['SQLALCHEMY_REPLICA_URIS'] = 'sqlite:///' + replica_path
+    os.environ['REPLICA_STICKY_SECONDS'] = str(args.sticky_seconds)
+    os.environ['JOB_QUEUE_PATH'] = os.path.join(scratch, 'jobs.db')
+    os.environ['JINJA_BYTECODE_CACHE_PATH'] = os.path.join(scratch, 'jinja_bytecode')
+    os.environ.setdefault('SECRET_KEY', 'replicas')
+    benchmarks = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:0] = [os.path.dirname(benchmarks), benchmarks]
+
+    from sqlalchemy import event
+    import synthetic
+    from synthetic import app, db
+    from models import Customer, Service, ServiceProfessional, ServiceRequest
+
+    synthetic.seed_dataset(customers=50, professionals=20, requests=500)
+
+    def replicate():
+        with sqlite3.connect(primary_path) as source, sqlite3.connect(replica_path) as target:
+            source.backup(target)
+        source.close()
+        target.close()
+
+    replicate()
+
+    statements = Counter()
+    with app.app_context():
+        for bind, engine in db.engines.items():
+            name = bind or 'primary'
+            event.listen(engine, 'before_cursor_execute',
+                         lambda *a, name=name: statements.update([name]))
+        customer_id, customer_user_id = db.session.query(Customer.id, Customer.user_id).order_by(Customer.id).first()
+        service_id = db.session.query(Service.id).order_by(Service.id).first()[0]
+        professional_user_id = db.session.query(ServiceProfessional.user_id).order_by(ServiceProfessional.id).first()[0]
+
+    def client_as(role, user_id=1):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['role'] = role
+            session['user_id'] = user_id
+        return client
+
+    def run(client, method, path, **kwargs):
+        statements.clear()
+        response = client.open(path, method=method, **kwargs)
+        return response, dict(statements)
+
+    writer = client_as('customer', customer_user_id)
+    reader = client_as('customer', customer_user_id)
+    admin = client_as('admin')
+    professional = client_as('professional', professional_user_id)
+    checks = []
+
+    def check(name, passed, detail):
+        checks.append((name, passed, detail))
+
+    for client, path in ((admin, '/admin_dashboard?tab=requests'), (writer, '/customer_dashboard'),
+                         (professional, '/professional_dashboard')):
+        response, counts = run(client, 'GET', path)
+        check(f'GET {path} builds its tables from the primary', counts.get('primary') and not counts.get('replica0'),
+              f'{response.status_code} {counts}')
+        response, counts = run(client, 'GET', path)
+        check(f'GET {path} again runs no SQL', not counts, f'{response.status_code} {counts}')
+
+    response, counts = run(reader, 'GET', '/api/service_requests')
+    check('GET /api/service_requests reads the replica', counts.get('replica0') and not counts.get('primary'),
+          f'{response.status_code} {counts}')
+
+    response, counts = run(writer, 'POST', '/api/service_request',
+                           json={'service_id': service_id, 'customer_id': customer_id, 'details': 'Replica check'})
+    new_id = response.get_json()['id']
+    check('POST /api/service_request writes the primary', counts.get('primary') and not counts.get('replica0'),
+          f'{response.status_code} {counts}')
+
+    response, counts = run(writer, 'GET', '/api/service_requests')
+    seen = any(item['id'] == new_id for item in response.get_json()['requests'])
+    check("Writer's next read goes to the primary and sees the write",
+          seen and counts.get('primary') and not counts.get('replica0'), f'seen={seen} {counts}')
+
+    response, counts = run(reader, 'GET', '/api/service_requests')
+    seen = any(item['id'] == new_id for item in response.get_json()['requests'])
+    check('Other visitors read the lagging replica', not seen and counts.get('replica0') and not counts.get('primary'),
+          f'seen={seen} {counts}')
+
+    time.sleep(args.sticky_seconds + 0.1)
+    replicate()
+    response, counts = run(writer, 'GET', '/api/service_requests')
+    seen = any(item['id'] == new_id for item in response.get_json()['requests'])
+    check('After the sticky window the writer reads the caught-up replica',
+          seen and counts.get('replica0') and not counts.get('primary'), f'seen={seen} {counts}')
+
+    with app.app_context():
+        statements.clear()
+        db.session.query(ServiceRequest).count()
+        check('Reads outside a request use the primary', statements.get('primary') and not statements.get('replica0'),
+              str(dict(statements)))
+
+    failures = 0
+    for name, passed, detail in checks:
+        print(f"{'ok  ' if passed else 'FAIL'} {name:<66} {detail}")
+        failures += not passed
+    if failures:
+        print(f"\n{failures} check(s) failed")
+        sys.exit(1)
+    print("\nAll routing checks passed")
+
+
+if __name__ == '__main__':
+    main()
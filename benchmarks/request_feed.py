@@ -0,0 +1,189 @@
+"""
+Open request feed benchmark.
+
+Seeds the synthetic dataset into a scratch SQLite database and starts two
+server processes on it (as two workers would run). --subscribers
+professionals log in and follow GET /requests/feed on the first server while
+a writer creates requests in their service and area through
+/api/service_request, alternating between the two servers, and then accepts
+each one. Reports how long the 'new' and 'taken' events took to reach the
+subscribers when the write went through the same worker and through the
+other worker (bounded by FEED_POLL_SECONDS), and what one refresh of the
+requests page costs, which is what each professional paid per poll before.
+
+Usage:
+    python benchmarks/request_feed.py [--preset small|medium|large] [--subscribers 20] [--writes 40]
+                                      [--json results.json]
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import signal
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+
+def subscribe(host, port, cookie, path, events, stop, ready):
+    # Follow one SSE stream; record (kind, request id) -> arrival time
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    connection.request('GET', path, headers={'Cookie': cookie, 'Accept': 'text/event-stream'})
+    response = connection.getresponse()
+    ready.release()
+    kind = None
+    while not stop.is_set():
+        line = response.readline()
+        if not line:
+            break
+        line = line.decode().rstrip('\n')
+        if line.startswith('event: '):
+            kind = line[7:]
+        elif line.startswith('data: ') and kind in ('new', 'taken'):
+            events[(kind, json.loads(line[6:])['request_id'])].append(time.perf_counter())
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--preset', choices=['small', 'medium', 'large'], default='small')
+    parser.add_argument('--subscribers', type=int, default=20)
+    parser.add_argument('--writes', type=int, default=40)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    # Configure the app before it is imported
+    scratch = tempfile.mkdtemp()
+    database_uri = 'sqlite:///' + os.path.join(scratch, 'request_feed.db')
+    os.environ['SQLALCHEMY_DATABASE_URI'] = database_uri
+    os.environ['JOB_QUEUE_PATH'] = os.path.join(scratch, 'jobs.db')
+    os.environ['JINJA_BYTECODE_CACHE_PATH'] = os.path.join(scratch, 'jinja_bytecode')
+    os.environ.setdefault('SECRET_KEY', 'request-feed')
+    os.environ.setdefault('FEED_MAX_SECONDS', '600')
+    benchmarks = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:0] = [os.path.dirname(benchmarks), benchmarks]
+
+    import synthetic
+    from synthetic import app, db
+    from load_test import Client, serve
+    from models import User, Customer, ServiceProfessional
+    from feed import area_of
+
+    print(f"Seeding the '{args.preset}' dataset ...")
+    synthetic.seed_dataset(seed=args.seed, **synthetic.PRESETS[args.preset])
+
+    rng = random.Random(args.seed)
+    with app.app_context():
+        customers_by_area = defaultdict(list)
+        for id, pin_code in db.session.query(Customer.id, Customer.pin_code):
+            customers_by_area[area_of(pin_code)].append(id)
+        professionals = [
+            (email, service_id, area_of(pin_code))
+            for email, service_id, pin_code in db.session.query(User.email, ServiceProfessional.service_id,
+                                                                ServiceProfessional.pin_code)
+            .join(User, User.id == ServiceProfessional.user_id)
+            if customers_by_area.get(area_of(pin_code))
+        ]
+    subscribers = rng.sample(professionals, min(args.subscribers, len(professionals)))
+
+    servers = []
+    context = multiprocessing.get_context('fork')
+    for _ in range(2):
+        port_queue = context.Queue()
+        server = context.Process(target=serve, args=(database_uri, port_queue))
+        server.start()
+        servers.append((server, port_queue.get(timeout=60)))
+    host = '127.0.0.1'
+    events = defaultdict(list)
+    stop = threading.Event()
+
+    try:
+        ready = threading.Semaphore(0)
+        threads = []
+        for email, service_id, area in subscribers:
+            client = Client(host, servers[0][1])
+            client.login('professional', email, synthetic.PASSWORD)
+            thread = threading.Thread(target=subscribe, daemon=True, args=(
+                host, servers[0][1], client.cookies['professional'], '/requests/feed', events, stop, ready))
+            thread.start()
+            threads.append(thread)
+        for _ in threads:
+            ready.acquire()
+        time.sleep(0.5)
+
+        # Cost of the page professionals used to refresh
+        poller = Client(host, servers[0][1])
+        poller.login('professional', subscribers[0][0], synthetic.PASSWORD)
+        page_ms = []
+        for _ in range(20):
+            started = time.perf_counter()
+            poller.request('GET', '/requests', cookie=poller.cookies['professional'])
+            page_ms.append((time.perf_counter() - started) * 1000)
+
+        # Open a request for a random subscriber's service and area, then take it, alternating workers
+        writers = [http.client.HTTPConnection(host, port, timeout=30) for _, port in servers]
+        cookie = poller.cookies['professional']
+        sent = {}  # (kind, request id) -> (sent at, key, through the subscribers' worker)
+        for n in range(args.writes):
+            email, service_id, area = rng.choice(subscribers)
+            same_worker = n % 2 == 0
+            writer = writers[0 if same_worker else 1]
+            started = time.perf_counter()
+            writer.request('POST', '/api/service_request', headers={'Content-Type': 'application/json'}, body=json.dumps(
+                {'service_id': service_id, 'customer_id': rng.choice(customers_by_area[area]), 'details': 'Feed check'}))
+            request_id = json.loads(writer.getresponse().read())['id']
+            sent[('new', request_id)] = (started, (service_id, area), same_worker)
+            time.sleep(0.1)
+            started = time.perf_counter()
+            writer.request('POST', f'/accept_request/{request_id}', headers={'Cookie': cookie})
+            writer.getresponse().read()
+            sent[('taken', request_id)] = (started, (service_id, area), same_worker)
+            time.sleep(0.1)
+        time.sleep(float(os.environ.get('FEED_POLL_SECONDS', 1.0)) + 1)
+    finally:
+        stop.set()
+        for server, _ in servers:
+            try:
+                os.killpg(server.pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+            server.join()
+
+    listeners = defaultdict(int)
+    for email, service_id, area in subscribers:
+        listeners[(service_id, area)] += 1
+    latencies = defaultdict(list)
+    missing = 0
+    for (kind, request_id), (started, key, same_worker) in sent.items():
+        arrivals = events.get((kind, request_id), [])
+        missing += listeners[key] - len(arrivals)
+        latencies[(kind, 'same worker' if same_worker else 'other worker')] += \
+            [(arrival - started) * 1000 for arrival in arrivals]
+
+    print(f"\n{len(subscribers)} subscribers, {args.writes} requests opened and taken")
+    print(f"{'event':<8}{'written through':<17}{'deliveries':>11}{'p50 ms':>9}{'max ms':>9}")
+    results = {}
+    for (kind, where), values in sorted(latencies.items()):
+        results[f'{kind} ({where})'] = {'deliveries': len(values), 'p50_ms': round(statistics.median(values), 2),
+                                        'max_ms': round(max(values), 2)}
+        print(f"{kind:<8}{where:<17}{len(values):>11}{statistics.median(values):>9.1f}{max(values):>9.1f}")
+    print(f"Missed deliveries: {missing}")
+    print(f"One refresh of the requests page (the old polling cost): {statistics.median(page_ms):.1f} ms median")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'preset': args.preset, 'subscribers': len(subscribers), 'writes': args.writes,
+                       'events': results, 'missed': missing, 'page_ms': round(statistics.median(page_ms), 2)},
+                      f, indent=2)
+    if missing:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Worker startup benchmark.
+
+Starts fresh Python processes the way a new server worker starts: import the
+app, then serve a first request (GET /login through the test client). Each
+process reports how long the import and the first response took, how many SQL
+statements ran before the first request and whether the import created the
+database file. Reports the median over --runs processes.
+
+Point --root at another checkout (e.g. a `git worktree` of an older revision)
+to compare; trees without wsgi.py are started with `from app import app`.
+
+Usage:
+    python benchmarks/startup.py [--runs 10] [--root PATH] [--path /login] [--json results.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child process; prints one JSON line
+CHILD = r'''
+import json, os, sys, time
+started = time.perf_counter()
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+statements = []
+event.listen(Engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+sys.path.insert(0, os.getcwd())
+if os.path.exists('wsgi.py'):
+    from wsgi import app
+else:
+    from app import app
+imported = time.perf_counter()
+database_created = os.path.exists(os.environ['STARTUP_DB_PATH'])
+statements_at_import = len(statements)
+response = app.test_client().get(os.environ['STARTUP_PATH'])
+responded = time.perf_counter()
+print(json.dumps({'import_ms': (imported - started) * 1000, 'first_response_ms': (responded - imported) * 1000,
+                  'status': response.status_code, 'statements_at_import': statements_at_import,
+                  'database_created': database_created}))
+'''
+
+
+def run_once(root, path):
+    scratch = tempfile.mkdtemp()
+    db_path = os.path.join(scratch, 'startup.db')
+    env = dict(os.environ, SQLALCHEMY_DATABASE_URI='sqlite:///' + db_path, STARTUP_DB_PATH=db_path,
+               JOB_QUEUE_PATH=os.path.join(scratch, 'jobs.db'), STARTUP_PATH=path,
+               JINJA_BYTECODE_CACHE_PATH=os.path.join(scratch, 'jinja_bytecode'),
+               SECRET_KEY=os.environ.get('SECRET_KEY', 'startup'), PYTHONDONTWRITEBYTECODE='')
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', CHILD], cwd=root, env=env, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+    if output.returncode != 0:
+        raise SystemExit(f"Worker failed to start:\n{output.stderr}")
+    result = json.loads(output.stdout.strip().splitlines()[-1])
+    result['process_ms'] = wall_ms
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--root', default=ROOT, help='checkout to start the app from')
+    parser.add_argument('--path', default='/login', help='first request')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    run_once(args.root, args.path)  # Warm the OS file cache and compile bytecode
+    runs = [run_once(args.root, args.path) for _ in range(args.runs)]
+    summary = {name: statistics.median(run[name] for run in runs)
+               for name in ('import_ms', 'first_response_ms', 'process_ms')}
+    summary.update(statements_at_import=max(run['statements_at_import'] for run in runs),
+                   database_created=any(run['database_created'] for run in runs),
+                   status=runs[-1]['status'], runs=args.runs, root=os.path.abspath(args.root))
+
+    print(f"{args.root} ({args.runs} runs, medians)")
+    print(f"  import            {summary['import_ms']:8.1f} ms")
+    print(f"  first response    {summary['first_response_ms']:8.1f} ms  ({args.path} -> {summary['status']})")
+    print(f"  whole process     {summary['process_ms']:8.1f} ms")
+    print(f"  SQL at import     {summary['statements_at_import']:8d}")
+    print(f"  database created  {'yes' if summary['database_created'] else 'no':>8}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
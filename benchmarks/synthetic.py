@@ -0,0 +1,167 @@
+"""
+Synthetic dataset for the load test.
+
+Seeds customers, professionals, services, service requests and reviews with
+Core bulk INSERTs (explicit ids, chunked executemany), then rebuilds the data
+the ORM hooks would normally maintain: search index, rating summaries,
+professional ratings and daily rollups. The same seed always produces the
+same rows. Import this after the environment points the app at the target
+database.
+"""
+import random
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import insert, func, text
+from app import create_app, db
+from models import User, Customer, ServiceProfessional, Service, ServiceRequest, Review, create_admin
+from passwords import hash_password
+import search
+import ratings
+import rollups
+
+app = create_app()
+
+PRESETS = {
+    'small': {'customers': 1000, 'professionals': 200, 'requests': 10000},
+    'medium': {'customers': 10000, 'professionals': 2000, 'requests': 100000},
+    'large': {'customers': 80000, 'professionals': 20000, 'requests': 1000000},
+}
+
+PASSWORD = 'password'  # Every synthetic user's password
+SERVICE_NAMES = ['Cleaning', 'Plumbing', 'Electrical', 'Painting', 'Carpentry', 'Pest Control',
+                 'Appliance Repair', 'Gardening', 'Moving', 'AC Service', 'Salon at Home', 'Laundry']
+STATUSES = [('requested', 30), ('accepted', 20), ('completed', 20), ('closed', 30)]
+REVIEW_RATIO = 0.6  # Share of closed requests with a review
+DAYS = 365  # Requests are spread over this many days before now
+CHUNK_SIZE = 20000
+
+
+def pin_code(rng):
+    # Pins share prefixes so candidate matching has realistic buckets
+    return f'{rng.randint(110, 130)}{rng.randint(0, 999):03d}'
+
+
+def bulk_insert(model, rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(insert(model), rows[start:start + CHUNK_SIZE])
+
+
+def next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def seed_dataset(customers, professionals, requests, seed=42):
+    # Seed the dataset and return {step: seconds}
+    rng = random.Random(seed)
+    timings = {}
+    now = datetime.utcnow()
+    password_hash = hash_password(PASSWORD)
+
+    with app.app_context():
+        db.create_all()
+        search.init_search_index()
+        create_admin()  # The load test logs in as admin@example.com / admin
+        connection = db.session.connection()
+        if db.engine.dialect.name == 'sqlite':
+            connection.execute(text('PRAGMA synchronous=OFF'))
+
+        started = time.perf_counter()
+        service_id = next_id(Service)
+        services = [{'id': service_id + i, 'name': name, 'price': float(rng.randint(2, 40) * 50),
+                     'description': f'{name} by verified professionals', 'created_at': now}
+                    for i, name in enumerate(SERVICE_NAMES)]
+        bulk_insert(Service, services)
+        service_ids = [service['id'] for service in services]
+
+        user_id = next_id(User)
+        customer_id = next_id(Customer)
+        professional_id = next_id(ServiceProfessional)
+        users = []
+        customer_rows = []
+        professional_rows = []
+        for i in range(customers):
+            users.append({'id': user_id, 'username': f'customer{i}', 'password_hash': password_hash,
+                          'email': f'customer{i}@example.com', 'phone_number': f'9{i:09d}', 'role': 'customer',
+                          'is_active': True, 'created_at': now})
+            customer_rows.append({'id': customer_id + i, 'user_id': user_id,
+                                  'address': f'{i} Main Street', 'pin_code': pin_code(rng)})
+            user_id += 1
+        for i in range(professionals):
+            service = services[i % len(services)]
+            users.append({'id': user_id, 'username': f'professional{i}', 'password_hash': password_hash,
+                          'email': f'professional{i}@example.com', 'phone_number': f'8{i:09d}', 'role': 'professional',
+                          'is_active': True, 'created_at': now})
+            professional_rows.append({'id': professional_id + i, 'user_id': user_id, 'service_type': service['name'],
+                                      'service_id': service['id'], 'experience': float(rng.randint(0, 20)),
+                                      'rating': 0.0, 'address': f'{i} Market Road', 'pin_code': pin_code(rng),
+                                      'description': f'{service["name"]} professional', 'is_approved': rng.random() < 0.9,
+                                      'created_at': now})
+            user_id += 1
+        bulk_insert(User, users)
+        bulk_insert(Customer, customer_rows)
+        bulk_insert(ServiceProfessional, professional_rows)
+        timings['users'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        statuses = [status for status, weight in STATUSES]
+        weights = [weight for status, weight in STATUSES]
+        request_id = next_id(ServiceRequest)
+        review_id = next_id(Review)
+        request_rows = []
+        review_rows = []
+        for i in range(requests):
+            status = rng.choices(statuses, weights)[0]
+            requested_at = now - timedelta(seconds=rng.randint(0, DAYS * 86400))
+            professional = professional_rows[rng.randrange(professionals)] if professionals else None
+            assigned = professional is not None and (status != 'requested' or rng.random() < 0.5)
+            completed_at = None
+            if status in ('completed', 'closed'):
+                completed_at = min(now, requested_at + timedelta(hours=rng.randint(1, 96)))
+            request_rows.append({
+                'id': request_id + i,
+                'service_id': professional['service_id'] if assigned else rng.choice(service_ids),
+                'customer_id': customer_id + rng.randrange(customers),
+                'professional_id': professional['id'] if assigned else None,
+                'date_of_request': requested_at,
+                'date_of_completion': completed_at,
+                'status': status,
+                'description': f'Job {i}'
+            })
+            if status == 'closed' and assigned and rng.random() < REVIEW_RATIO:
+                review_rows.append({'id': review_id, 'service_request_id': request_id + i,
+                                    'customer_id': request_rows[-1]['customer_id'],
+                                    'rating': rng.choices([1, 2, 3, 4, 5], [5, 5, 15, 35, 40])[0],
+                                    'remarks': 'Synthetic review'})
+                review_id += 1
+            if len(request_rows) >= CHUNK_SIZE:
+                bulk_insert(ServiceRequest, request_rows)
+                bulk_insert(Review, review_rows)
+                request_rows = []
+                review_rows = []
+        bulk_insert(ServiceRequest, request_rows)
+        bulk_insert(Review, review_rows)
+        db.session.commit()
+        timings['requests'] = time.perf_counter() - started
+
+        # Bulk inserts skip the ORM hooks, so rebuild what they maintain
+        for step, rebuild in (('search_index', search.rebuild_index), ('ratings', ratings.recompute_ratings),
+                              ('rollups', rollups.rebuild_rollups)):
+            started = time.perf_counter()
+            if step != 'search_index' or search.fts_available():
+                rebuild()
+            timings[step] = time.perf_counter() - started
+    return timings
+
+
+def sample_ids():
+    # Ids and logins the load test draws from
+    with app.app_context():
+        return {
+            'customer_emails': [email for (email,) in db.session.query(User.email).filter_by(role='customer').limit(100)],
+            'professional_emails': [email for (email,) in db.session.query(User.email).filter_by(role='professional').limit(100)],
+            'professionals': [id for (id,) in db.session.query(ServiceProfessional.id).limit(1000)],
+            'services': [id for (id,) in db.session.query(Service.id)],
+            'customers': [id for (id,) in db.session.query(Customer.id).limit(1000)],
+            'requests': [id for (id,) in db.session.query(ServiceRequest.id)
+                         .order_by(ServiceRequest.id.desc()).limit(1000)],
+        }
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event
+from app import app, db
+from models import Service
+from replicas import primary_reads
+
+# ----------------------------------------------
+# Service catalog cache
+# ----------------------------------------------
+# The catalog (every Service plus its pre-serialized /api/services body and
+# ETag) is cached as one entry in a pluggable backend:
+#   'memory' - in-process LRU, for a single worker
+#   'sqlite' - a small SQLite file shared by every worker on the host
+# Any committed change to a Service bumps a version counter kept next to the
+# entry, and the next read rebuilds it with a single query. The entry holds
+# the version it was built at, read before building, so a reader racing a
+# commit stores an entry that is already outdated rather than one that hides
+# the change. Entries are also rebuilt after CATALOG_CACHE_SECONDS: with the
+# 'memory' backend a commit only bumps its own worker's counter, and writes
+# the session does not see (raw SQL, other tools) bump none.
+
+CATALOG_KEY = 'catalog'
+VERSION_KEY = 'catalog:version'
+
+
+class LRUBackend:
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+class SQLiteBackend:
+    def __init__(self, path):
+        self.path = path
+        self.ready = False  # The file is created on first use, not when a worker imports this module
+        self.lock = threading.Lock()
+
+    def create_schema(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with sqlite3.connect(self.path, timeout=10) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        connection.close()
+
+    def connect(self):
+        # A short-lived connection per call keeps the backend safe across threads and processes
+        if not self.ready:
+            with self.lock:
+                if not self.ready:
+                    self.create_schema()
+                    self.ready = True
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, key):
+        with self.connect() as connection:
+            row = connection.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value):
+        with self.connect() as connection:
+            connection.execute("INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    def delete(self, key):
+        with self.connect() as connection:
+            connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+
+def create_backend():
+    backend = app.config.get('CATALOG_CACHE_BACKEND', 'memory')
+    if backend == 'sqlite':
+        path = app.config.get('CATALOG_CACHE_PATH') or os.path.join(app.instance_path, 'catalog_cache.db')
+        return SQLiteBackend(path)
+    return LRUBackend()
+
+
+cache = create_backend()
+
+
+def build_catalog():
+    # One query for the whole catalog, serialized once for every reader.
+    # Read from the primary: the catalog is cached until the next change, so it must not lag behind it
+    with primary_reads(db.session()):
+        rows = db.session.query(Service.id, Service.name, Service.description, Service.price).order_by(Service.id).all()
+    services = [{'id': id, 'name': name, 'description': description, 'price': price}
+                for id, name, description, price in rows]
+    body = json.dumps({'services': services})
+    return {
+        'services': services,
+        'service_ids': {service['name']: service['id'] for service in reversed(services)},
+        'body': body,
+        'etag': hashlib.sha1(body.encode()).hexdigest()
+    }
+
+
+def catalog_version():
+    return cache.get(VERSION_KEY) or 0
+
+
+def get_catalog():
+    # Read before building: a change committed meanwhile leaves the entry already outdated, never stale
+    current = catalog_version()
+    entry = cache.get(CATALOG_KEY)
+    if entry is not None and entry['version'] == current and entry['expires'] > time.time():
+        return entry['catalog']
+    catalog = build_catalog()
+    cache.set(CATALOG_KEY, {'version': current, 'expires': time.time() + app.config.get('CATALOG_CACHE_SECONDS', 300),
+                            'catalog': catalog})
+    return catalog
+
+
+def get_services():
+    return get_catalog()['services']
+
+
+def get_service_id(name):
+    # First service with this name, as Service.query.filter_by(name=name).first() would return
+    return get_catalog()['service_ids'].get(name)
+
+
+def invalidate_catalog():
+    # The counter only goes up; concurrent bumps may lose an increment, but it still changes
+    cache.set(VERSION_KEY, catalog_version() + 1)
+    cache.delete(CATALOG_KEY)
+
+
+# ----------------------------------------------
+# Invalidation on committed Service changes
+# ----------------------------------------------
+
+def note_catalog_changes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Service):
+            session.info['catalog_changed'] = True
+            return
+
+
+def invalidate_on_commit(session):
+    if session.info.pop('catalog_changed', False):
+        invalidate_catalog()
+
+
+def discard_catalog_changes(session, previous_transaction):
+    session.info.pop('catalog_changed', None)
+
+
+event.listen(db.session, 'after_flush', note_catalog_changes)
+event.listen(db.session, 'after_commit', invalidate_on_commit)
+event.listen(db.session, 'after_soft_rollback', discard_catalog_changes)
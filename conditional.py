@@ -0,0 +1,48 @@
+import hashlib
+from flask import request, make_response, Response
+from sqlalchemy import and_
+from werkzeug.http import is_resource_modified
+from models import RatingSummary
+from ratings import HISTOGRAM_COLUMNS
+
+# ----------------------------------------------
+# Conditional GET for detail pages and API resources
+# ----------------------------------------------
+# A detail page first reads only the versions of the rows it shows (their
+# updated_at, ServiceRequest.version, the counts of a rating summary) with
+# one primary key lookup. Hashed with the URL they are the page's ETag. A
+# client revalidating with an If-None-Match that still matches gets 304 Not
+# Modified without the page being queried or rendered; otherwise it is built
+# as before and sent with the new ETag. The versions are read before the
+# page, so a write in between leaves the ETag outdated, never the page.
+#
+# There is no Last-Modified: an HTTP date only has whole seconds, so it would
+# miss a second write within the same second, and it could not cover the
+# rating summaries or the request version, which have no timestamp.
+# If-Modified-Since is therefore ignored and answered with the full page.
+#
+# updated_at is set by the ORM on every insert and update of the row, bulk
+# and Core UPDATEs included. Pages are `Cache-Control: private, no-cache`:
+# browsers and apps keep them, but check back on every use, which costs the
+# version lookup.
+
+
+def rating_versions(query, subject, subject_id):
+    # Adds the rating summary a page shows to its version query
+    return query.outerjoin(
+        RatingSummary, and_(RatingSummary.subject == subject, RatingSummary.subject_id == subject_id)
+    ).add_columns(RatingSummary.review_count, RatingSummary.rating_total,
+                  *[getattr(RatingSummary, name) for name in HISTOGRAM_COLUMNS])
+
+
+def conditional_response(versions, build):
+    # build()'s response, or 304 if the client's copy was built from the same versions
+    etag = hashlib.sha1(repr((request.full_path, tuple(versions))).encode()).hexdigest()
+    if not is_resource_modified(request.environ, etag=etag):
+        response = Response(status=304)
+    else:
+        response = make_response(build())
+    response.set_etag(etag, weak=True)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
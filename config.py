@@ -7,3 +7,49 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY')
     SQLALCHEMY_DATABASE_URI = os.getenv('SQLALCHEMY_DATABASE_URI')
     SQLALCHEMY_TRACK_MODIFICATIONS = os.getenv('SQLALCHEMY_TRACK_MODIFICATIONS', False)  # Default to False if not set
+    SQLALCHEMY_REPLICA_URIS = [uri.strip() for uri in os.getenv('SQLALCHEMY_REPLICA_URIS', '').split(',') if uri.strip()]  # Read replicas of the primary, comma separated; see replicas.py
+    REPLICA_STICKY_SECONDS = float(os.getenv('REPLICA_STICKY_SECONDS', 5))  # After writing, a visitor reads from the primary this long
+    MATCHING_REFRESH_SECONDS = int(os.getenv('MATCHING_REFRESH_SECONDS', 300))  # How often each worker reloads the candidate index
+    CATALOG_CACHE_BACKEND = os.getenv('CATALOG_CACHE_BACKEND', 'memory')  # 'memory' (per worker) or 'sqlite' (shared file)
+    CATALOG_CACHE_PATH = os.getenv('CATALOG_CACHE_PATH')  # Defaults to instance/catalog_cache.db
+    CATALOG_CACHE_SECONDS = int(os.getenv('CATALOG_CACHE_SECONDS', 300))  # Longest the catalog is reused, even with no change seen
+    FRAGMENT_CACHE_BACKEND = os.getenv('FRAGMENT_CACHE_BACKEND', 'memory')  # Dashboard tables: 'memory', 'sqlite' (shared file) or 'none'
+    FRAGMENT_CACHE_PATH = os.getenv('FRAGMENT_CACHE_PATH')  # Defaults to instance/fragment_cache.db
+    FRAGMENT_CACHE_SECONDS = int(os.getenv('FRAGMENT_CACHE_SECONDS', 300))  # Longest a fragment is reused, even with no write seen
+    FRAGMENT_CACHE_MAX_ENTRIES = int(os.getenv('FRAGMENT_CACHE_MAX_ENTRIES', 2048))  # Fragments kept per worker by the 'memory' backend
+    JINJA_BYTECODE_CACHE = os.getenv('JINJA_BYTECODE_CACHE', 'true').lower() == 'true'  # Keep compiled templates on disk
+    JINJA_BYTECODE_CACHE_PATH = os.getenv('JINJA_BYTECODE_CACHE_PATH')  # Defaults to instance/jinja_bytecode
+    API_BATCH_MAX_ITEMS = int(os.getenv('API_BATCH_MAX_ITEMS', 1000))  # Largest JSON array accepted by the batch endpoints
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')  # Full Werkzeug method string, e.g. 'pbkdf2:sha256:600000'
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 2))  # 0 hashes inline in the request thread
+    PASSWORD_HASH_TIMEOUT = int(os.getenv('PASSWORD_HASH_TIMEOUT', 30))  # Seconds to wait for the pool
+    RESUME_STORAGE_PATH = os.getenv('RESUME_STORAGE_PATH')  # Defaults to instance/resumes
+    RESUME_MAX_BYTES = int(os.getenv('RESUME_MAX_BYTES', 5 * 1024 * 1024))  # Largest resume accepted
+    RESUME_MIME_TYPES = os.getenv('RESUME_MIME_TYPES', 'application/pdf,application/msword,application/vnd.openxmlformats-officedocument.wordprocessingml.document').split(',')
+    USE_X_SENDFILE = os.getenv('USE_X_SENDFILE', 'false').lower() == 'true'  # Let the front-end server send files
+    NOTIFICATION_BACKEND = os.getenv('NOTIFICATION_BACKEND', 'log')  # 'log' (app log only) or 'smtp'; see notifications.py
+    SMTP_HOST = os.getenv('SMTP_HOST', 'localhost')
+    SMTP_PORT = int(os.getenv('SMTP_PORT', 25))
+    SMTP_USERNAME = os.getenv('SMTP_USERNAME')  # No login when unset
+    SMTP_PASSWORD = os.getenv('SMTP_PASSWORD')
+    SMTP_USE_TLS = os.getenv('SMTP_USE_TLS', 'false').lower() == 'true'  # STARTTLS before logging in
+    MAIL_FROM = os.getenv('MAIL_FROM', 'no-reply@localhost')  # Sender of notification emails
+    JOB_QUEUE_PATH = os.getenv('JOB_QUEUE_PATH')  # SQLite file of the background job queue, defaults to instance/jobs.db
+    JOB_WORKER_CONCURRENCY = int(os.getenv('JOB_WORKER_CONCURRENCY', 4))  # Threads per `flask jobs-worker`
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 5))  # Runs before a job is marked failed
+    JOB_RETRY_BASE_SECONDS = float(os.getenv('JOB_RETRY_BASE_SECONDS', 5))  # First retry delay, doubled after each failure
+    JOB_RETRY_MAX_SECONDS = float(os.getenv('JOB_RETRY_MAX_SECONDS', 3600))
+    JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', 300))  # A running job older than this is assumed lost and retried
+    JOB_POLL_SECONDS = float(os.getenv('JOB_POLL_SECONDS', 1.0))  # Idle worker poll interval
+    JOB_RETENTION_SECONDS = int(os.getenv('JOB_RETENTION_SECONDS', 7 * 24 * 3600))  # How long finished jobs are kept
+    FEED_POLL_SECONDS = float(os.getenv('FEED_POLL_SECONDS', 1.0))  # How soon a worker's feed streams see other workers' events
+    FEED_BUFFER_EVENTS = int(os.getenv('FEED_BUFFER_EVENTS', 10000))  # Recent feed events kept in memory per worker
+    FEED_HEARTBEAT_SECONDS = float(os.getenv('FEED_HEARTBEAT_SECONDS', 15))  # Keepalive interval of an idle feed stream
+    FEED_MAX_SECONDS = float(os.getenv('FEED_MAX_SECONDS', 300))  # A feed stream is closed (and the browser reconnects) after this long
+    FEED_RETRY_MS = int(os.getenv('FEED_RETRY_MS', 3000))  # Reconnect delay the browser is told to use
+    FEED_RETENTION_SECONDS = int(os.getenv('FEED_RETENTION_SECONDS', 24 * 3600))  # Events older than this are removed by `flask feed-prune`
+    ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 180))  # Closed requests completed longer ago than this move to the archive tables
+    ARCHIVE_BATCH_ROWS = int(os.getenv('ARCHIVE_BATCH_ROWS', 500))  # Requests moved (with their reviews) per transaction
+    ARCHIVE_PASS_BATCHES = int(os.getenv('ARCHIVE_PASS_BATCHES', 20))  # Batches per archive job before it queues its own continuation
+    IMPORT_CHUNK_ROWS = int(os.getenv('IMPORT_CHUNK_ROWS', 1000))  # CSV rows checked, inserted and committed together
+    IMPORT_MAX_BYTES = int(os.getenv('IMPORT_MAX_BYTES', 100 * 1024 * 1024))  # Largest CSV accepted by /api/import
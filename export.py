@@ -0,0 +1,107 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from app import db
+from models import User, Customer, ServiceProfessional, Service
+from archive import history_statements
+
+# ----------------------------------------------
+# Service request history export
+# ----------------------------------------------
+# Rows are read with yield_per (a server-side cursor where the driver has one)
+# and encoded in chunks by a generator, so an export runs in constant memory
+# and the first bytes go out before the query has finished. The hot requests
+# come first, then the archived ones, each read in primary key order: sorting
+# their union would have to read both tables before sending the first row.
+
+EXPORT_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+EXPORT_COLUMNS = ['id', 'service', 'customer', 'professional', 'status', 'date_of_request',
+                  'date_of_completion', 'rating']
+YIELD_PER = 1000
+ROWS_PER_CHUNK = 500
+
+
+def parse_date(value):
+    # Dates come in as YYYY-MM-DD; raises ValueError when malformed
+    return datetime.strptime(value, '%Y-%m-%d') if value else None
+
+
+def export_statements(date_from=None, date_to=None, status=None):
+    customer_user = aliased(User)
+    professional_user = aliased(User)
+
+    def build(requests, reviews):
+        # Rating of the latest review, if the request has one
+        rating = select(reviews.rating).where(
+            reviews.service_request_id == requests.id
+        ).order_by(reviews.id.desc()).limit(1).scalar_subquery()
+
+        statement = select(
+            requests.id.label('id'),
+            Service.name,
+            customer_user.username,
+            professional_user.username,
+            requests.status,
+            requests.date_of_request,
+            requests.date_of_completion,
+            rating
+        ).select_from(requests).join(Service, Service.id == requests.service_id) \
+         .outerjoin(Customer, Customer.id == requests.customer_id) \
+         .outerjoin(customer_user, customer_user.id == Customer.user_id) \
+         .outerjoin(ServiceProfessional, ServiceProfessional.id == requests.professional_id) \
+         .outerjoin(professional_user, professional_user.id == ServiceProfessional.user_id)
+
+        if date_from:
+            statement = statement.where(requests.date_of_request >= date_from)
+        if date_to:
+            # The end date is inclusive
+            statement = statement.where(requests.date_of_request < date_to + timedelta(days=1))
+        if status:
+            statement = statement.where(requests.status == status)
+        return statement.order_by(requests.id)
+
+    # Archived requests too, after the hot ones
+    return history_statements(build)
+
+
+def stream_rows(statements):
+    for statement in statements:
+        result = db.session.execute(statement.execution_options(yield_per=YIELD_PER))
+        try:
+            for partition in result.partitions():
+                yield from partition
+        finally:
+            result.close()
+
+
+def format_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def generate_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    count = 0
+    for row in rows:
+        writer.writerow([format_value(value) for value in row])
+        count += 1
+        if count % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def generate_ndjson(rows):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(EXPORT_COLUMNS, (format_value(value) for value in row)))))
+        if len(lines) == ROWS_PER_CHUNK:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
@@ -0,0 +1,294 @@
+import threading
+import time
+import orjson
+from datetime import datetime, timedelta
+from flask import Response, request, session, stream_with_context
+from sqlalchemy import event, inspect, insert, select, delete, func
+from app import app, db
+from models import Customer, ServiceRequest, ServiceProfessional, RequestEvent
+from matching import PREFIX_LENGTH, normalize_pin
+from ratings import previous_value
+
+# ----------------------------------------------
+# Live feed of open requests for professionals
+# ----------------------------------------------
+# A request is open while no professional has taken it (professional_id is
+# NULL, as on the requests page). Each transaction that opens or takes
+# requests also writes RequestEvent rows ('new' / 'taken') keyed by service
+# and the area (first PREFIX_LENGTH pin digits, as in matching.py) of the
+# customer. The event id is the feed's cursor.
+#
+# GET /requests/feed streams the events of the professional's service and
+# area as server-sent events. Every worker keeps one Broadcaster: the streams
+# it serves share a buffer of recent events, refreshed with a single indexed
+# query right after a commit in this worker wrote events, and at least every
+# FEED_POLL_SECONDS to pick up other workers' commits. A stream resumes after
+# ?since=<cursor> or the browser's Last-Event-ID; cursors older than the
+# buffer are caught up from the table, and cursors older than the retained
+# events get a 'reset' event (reload the page).
+#
+# Each open stream holds a server thread until FEED_MAX_SECONDS, after which
+# the browser reconnects; run workers with threads (e.g. gunicorn's gthread)
+# rather than one request per process. `flask feed-prune` drops events older
+# than FEED_RETENTION_SECONDS.
+
+REFRESH_BATCH = 1000
+
+
+def area_of(pin_code):
+    return normalize_pin(pin_code)[:PREFIX_LENGTH]
+
+
+def event_statement():
+    # Event columns plus what a professional needs to show a new request
+    return select(
+        RequestEvent.id, RequestEvent.kind, RequestEvent.request_id, RequestEvent.service_id,
+        RequestEvent.pin_prefix, ServiceRequest.description, ServiceRequest.date_of_request, Customer.pin_code
+    ).outerjoin(ServiceRequest, ServiceRequest.id == RequestEvent.request_id) \
+     .outerjoin(Customer, Customer.id == ServiceRequest.customer_id)
+
+
+def event_payload(row):
+    payload = {'request_id': row.request_id, 'service_id': row.service_id}
+    if row.kind == 'new':
+        payload.update(description=row.description, date_of_request=row.date_of_request, pin_code=row.pin_code)
+    return payload
+
+
+class Broadcaster:
+    def __init__(self, max_events, poll_seconds):
+        self.max_events = max_events
+        self.poll_seconds = poll_seconds
+        self.lock = threading.Lock()            # One refresh at a time
+        self.condition = threading.Condition()  # Guards the buffer; notified when it grows
+        self.order = []                         # Buffered (id, key), oldest first
+        self.by_key = {}                        # (service_id, area) -> [(id, kind, payload)], oldest first
+        self.covered_from = None                # The buffer holds every event after this id
+        self.last_id = None                     # Newest event id seen
+        self.stale = True
+        self.refreshed_at = 0.0
+
+    def poke(self):
+        # A commit in this worker wrote events; the next waiting stream refreshes
+        with self.condition:
+            self.stale = True
+            self.condition.notify_all()
+
+    def refresh(self):
+        with self.lock:
+            if not self.stale and time.monotonic() - self.refreshed_at < self.poll_seconds:
+                return  # Another stream just did
+            self.stale = False
+            with db.engine.connect() as connection:
+                if self.last_id is None:
+                    last_id = connection.execute(select(func.max(RequestEvent.id))).scalar() or 0
+                    with self.condition:
+                        self.last_id = self.covered_from = last_id
+                while True:
+                    rows = connection.execute(event_statement().where(RequestEvent.id > self.last_id)
+                                              .order_by(RequestEvent.id).limit(REFRESH_BATCH)).all()
+                    if rows:
+                        self.append(rows)
+                    if len(rows) < REFRESH_BATCH:
+                        break
+            self.refreshed_at = time.monotonic()
+
+    def append(self, rows):
+        with self.condition:
+            for row in rows:
+                key = (row.service_id, row.pin_prefix)
+                self.order.append((row.id, key))
+                self.by_key.setdefault(key, []).append((row.id, row.kind, event_payload(row)))
+            if len(self.order) > self.max_events:
+                # Drop the oldest; they are the oldest of their keys too
+                dropped, self.order = self.order[:-self.max_events], self.order[-self.max_events:]
+                for id, key in dropped:
+                    events = self.by_key[key]
+                    events.pop(0)
+                    if not events:
+                        del self.by_key[key]
+                self.covered_from = dropped[-1][0]
+            self.last_id = rows[-1].id
+            self.condition.notify_all()
+
+    def read(self, cursor, key):
+        # (events after cursor for key, cursor to continue from); events is None when the buffer does not reach back
+        with self.condition:
+            if cursor is None:
+                return [], self.last_id
+            if cursor < self.covered_from or cursor > self.last_id:
+                return None, cursor
+            events = []
+            for item in reversed(self.by_key.get(key, [])):
+                if item[0] <= cursor:
+                    break
+                events.append(item)
+            events.reverse()
+            return events, self.last_id
+
+    def wait(self, cursor, timeout):
+        # Until events after cursor may be buffered, or timeout seconds; True if there may be some
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.stale or time.monotonic() - self.refreshed_at >= self.poll_seconds:
+                self.refresh()
+            with self.condition:
+                if self.last_id is not None and cursor is not None and self.last_id > cursor:
+                    return True
+                now = time.monotonic()
+                if now >= deadline:
+                    return False
+                if not self.stale:
+                    self.condition.wait(min(deadline, self.refreshed_at + self.poll_seconds) - now)
+
+
+broadcaster = Broadcaster(app.config.get('FEED_BUFFER_EVENTS', 10000), app.config.get('FEED_POLL_SECONDS', 1.0))
+
+
+def catch_up(cursor, key):
+    # Events after an old cursor, read from the table; None if some may have been pruned
+    if cursor > broadcaster.last_id:
+        return None  # Not from this database, e.g. issued before it was reset
+    with db.engine.connect() as connection:
+        oldest = connection.execute(select(func.min(RequestEvent.id))).scalar()
+        if oldest is not None and cursor < oldest - 1:
+            return None
+        rows = connection.execute(event_statement().where(
+            RequestEvent.service_id == key[0], RequestEvent.pin_prefix == key[1],
+            RequestEvent.id > cursor, RequestEvent.id <= broadcaster.last_id
+        ).order_by(RequestEvent.id)).all()
+    return [(row.id, row.kind, event_payload(row)) for row in rows]
+
+
+def current_cursor():
+    # Cursor of "now": a page listing the open requests passes it on to its stream
+    broadcaster.wait(None, 0)
+    return broadcaster.last_id
+
+
+def open_requests(service_id, area, limit=None):
+    # Open requests of one service and area, newest first
+    query = db.session.query(
+        ServiceRequest.id, ServiceRequest.description, ServiceRequest.date_of_request, Customer.pin_code
+    ).join(Customer, Customer.id == ServiceRequest.customer_id).filter(
+        ServiceRequest.professional_id.is_(None),
+        ServiceRequest.service_id == service_id,
+        Customer.pin_code.startswith(area, autoescape=True)
+    ).order_by(ServiceRequest.date_of_request.desc(), ServiceRequest.id.desc())
+    return query.limit(limit).all() if limit else query.all()
+
+
+def sse(kind, payload, id=None):
+    lines = f'id: {id}\n' if id is not None else ''
+    return f'{lines}event: {kind}\ndata: {orjson.dumps(payload).decode()}\n\n'
+
+
+def stream_events(cursor, key):
+    heartbeat = app.config.get('FEED_HEARTBEAT_SECONDS', 15)
+    deadline = time.monotonic() + app.config.get('FEED_MAX_SECONDS', 300)
+    yield f"retry: {app.config.get('FEED_RETRY_MS', 3000)}\n\n"
+    broadcaster.wait(cursor, 0)
+    while True:
+        events, through = broadcaster.read(cursor, key)
+        if events is None:
+            events, through = catch_up(cursor, key), broadcaster.last_id
+        if events is None:
+            # Too old to resume: start over from now
+            yield sse('reset', {}, id=through)
+        else:
+            for id, kind, payload in events:
+                yield sse(kind, payload, id=id)
+        cursor = through
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        if not broadcaster.wait(cursor, min(heartbeat, remaining)):
+            # An id-only message moves the browser's Last-Event-ID past other areas' events
+            yield f'id: {cursor}\n: keepalive\n\n'
+
+
+@app.route('/requests/feed')
+def requests_feed():
+    if session.get('role') != 'professional':
+        return {'message': 'Unauthorized access'}, 403
+    professional = db.session.query(ServiceProfessional.service_id, ServiceProfessional.pin_code) \
+        .filter(ServiceProfessional.user_id == session.get('user_id')).first()
+    if professional is None:
+        return {'message': 'Professional not found'}, 404
+    since = request.args.get('since') or request.headers.get('Last-Event-ID')
+    cursor = int(since) if since and since.isdigit() else current_cursor()
+    key = (professional.service_id, area_of(professional.pin_code))
+    db.session.remove()  # Nothing below uses the session; don't hold its connection for the stream
+    response = Response(stream_with_context(stream_events(cursor, key)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Let nginx pass events through unbuffered
+    return response
+
+
+# ----------------------------------------------
+# Event recording
+# ----------------------------------------------
+
+def record_events(session, changes):
+    # changes are (request id, kind, service id, customer id)
+    if not changes:
+        return
+    connection = session.connection()
+    customer_ids = {customer_id for *_, customer_id in changes}
+    pins = dict(connection.execute(select(Customer.id, Customer.pin_code).where(Customer.id.in_(customer_ids))).all())
+    connection.execute(insert(RequestEvent), [
+        {'request_id': request_id, 'kind': kind, 'service_id': service_id, 'pin_prefix': area_of(pins.get(customer_id)),
+         'created_at': datetime.utcnow()}
+        for request_id, kind, service_id, customer_id in changes
+    ])
+    session.info['feed_events'] = True
+
+
+def record_new_requests(session, ids):
+    # Requests written without an ORM flush, e.g. bulk inserts
+    if not ids:
+        return
+    rows = session.connection().execute(
+        select(ServiceRequest.id, ServiceRequest.service_id, ServiceRequest.customer_id)
+        .where(ServiceRequest.id.in_(ids), ServiceRequest.professional_id.is_(None))
+    )
+    record_events(session, [(id, 'new', service_id, customer_id) for id, service_id, customer_id in rows])
+
+
+def track_open_requests(session, flush_context):
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, ServiceRequest) and obj.professional_id is None:
+            changes.append((obj.id, 'new', obj.service_id, obj.customer_id))
+    for obj in session.dirty:
+        if isinstance(obj, ServiceRequest) and inspect(obj).attrs.professional_id.history.has_changes():
+            was_open = previous_value(obj, 'professional_id') is None
+            if was_open != (obj.professional_id is None):
+                changes.append((obj.id, 'taken' if was_open else 'new', obj.service_id, obj.customer_id))
+    for obj in session.deleted:
+        if isinstance(obj, ServiceRequest) and previous_value(obj, 'professional_id') is None:
+            changes.append((obj.id, 'taken', previous_value(obj, 'service_id'), previous_value(obj, 'customer_id')))
+    record_events(session, changes)
+
+
+def wake_streams(session):
+    if session.info.pop('feed_events', False):
+        broadcaster.poke()
+
+
+def discard_feed_events(session, previous_transaction):
+    session.info.pop('feed_events', None)
+
+
+event.listen(db.session, 'after_flush', track_open_requests)
+event.listen(db.session, 'after_commit', wake_streams)
+event.listen(db.session, 'after_soft_rollback', discard_feed_events)
+
+
+@app.cli.command('feed-prune')
+def feed_prune_command():
+    """Delete request feed events older than FEED_RETENTION_SECONDS."""
+    cutoff = datetime.utcnow() - timedelta(seconds=app.config.get('FEED_RETENTION_SECONDS', 24 * 3600))
+    result = db.session.execute(delete(RequestEvent).where(RequestEvent.created_at < cutoff))
+    db.session.commit()
+    print(f"Deleted {result.rowcount} feed event(s).")
@@ -0,0 +1,152 @@
+import os
+import time
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+from sqlalchemy import event
+from app import app, db
+from catalog import LRUBackend, SQLiteBackend
+from replicas import primary_reads
+
+# ----------------------------------------------
+# Fragment cache for dashboard tables
+# ----------------------------------------------
+# Every table has a version counter in the cache backend, bumped when a
+# transaction that wrote to it commits (ORM flushes and bulk DML through the
+# session alike). A fragment, e.g. one page of the admin services table, is
+# cached with the versions of the tables it shows; a view whose versions
+# still match reuses the HTML without querying or rendering anything, and any
+# write to one of those tables makes the next view rebuild it. Entries are
+# also rebuilt after FRAGMENT_CACHE_SECONDS, as a bound for writes the
+# session does not see: statements on session.connection() (the rating and
+# rollup summaries, which no dashboard table shows), raw SQL, other tools.
+#
+# With the 'memory' backend counters and fragments are per worker, so it
+# suits a single worker; 'sqlite' shares both between the workers on a host.
+# Counters only ever go up: a counter that went back to an earlier value
+# would make fragments built before a write current again.
+
+VERSION_PREFIX = 'version:'
+FRAGMENT_PREFIX = 'fragment:'
+
+
+def create_backend():
+    backend = app.config.get('FRAGMENT_CACHE_BACKEND', 'memory')
+    if backend == 'sqlite':
+        path = app.config.get('FRAGMENT_CACHE_PATH') or os.path.join(app.instance_path, 'fragment_cache.db')
+        return SQLiteBackend(path)
+    if backend == 'none':
+        return None
+    return LRUBackend(app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', 2048))
+
+
+cache = create_backend()
+# In memory the counters get a store of their own, so evicting fragments never evicts a counter
+versions = LRUBackend(max_entries=10000) if isinstance(cache, LRUBackend) else cache
+
+
+def table_versions(tables):
+    return [versions.get(VERSION_PREFIX + table) or 0 for table in tables]
+
+
+def bump_versions(tables):
+    # Concurrent bumps may lose an increment; that is fine, the counter only has to change
+    for table in tables:
+        versions.set(VERSION_PREFIX + table, (versions.get(VERSION_PREFIX + table) or 0) + 1)
+
+
+def clear_fragments():
+    # Outdates every fragment (with the 'memory' backend, only this worker's)
+    if cache is not None:
+        bump_versions(sorted(db.metadata.tables))
+
+
+def cached(name, tables, params, build):
+    # build()'s result (JSON serializable), reused while `tables` are unchanged.
+    # params are everything else the result depends on: page cursor, filters, user id.
+    if cache is None:
+        return build()
+    key = FRAGMENT_PREFIX + name + ':' + ':'.join(str(param) for param in params)
+    # Read before building: a write committed meanwhile leaves the entry already outdated, never stale
+    current = table_versions(tables)
+    entry = cache.get(key)
+    if entry is not None and entry['versions'] == current and entry['expires'] > time.time():
+        return entry['value']
+    # Built from the primary: the result is kept until the next write, so it must not lag behind it
+    with primary_reads(db.session()):
+        value = build()
+    cache.set(key, {'versions': current, 'expires': time.time() + app.config.get('FRAGMENT_CACHE_SECONDS', 300),
+                    'value': value})
+    return value
+
+
+def cached_fragment(name, tables, params, render):
+    # Like cached(), for a render() that returns HTML
+    return Markup(cached(name, tables, params, lambda: str(render())))
+
+
+# ----------------------------------------------
+# Version bumps on commit
+# ----------------------------------------------
+
+def note_written_tables(session, flush_context):
+    written = session.info.setdefault('written_tables', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(type(obj), '__tablename__', None)
+        if table:
+            written.add(table)
+
+
+def note_bulk_writes(orm_execute_state):
+    # INSERT/UPDATE/DELETE statements run through the session, e.g. batch inserts
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None:
+            orm_execute_state.session.info.setdefault('written_tables', set()).add(table.name)
+
+
+def bump_on_commit(session):
+    written = session.info.pop('written_tables', None)
+    if written and cache is not None:
+        bump_versions(sorted(written))
+
+
+def discard_written_tables(session, previous_transaction):
+    session.info.pop('written_tables', None)
+
+
+event.listen(db.session, 'after_flush', note_written_tables)
+event.listen(db.session, 'do_orm_execute', note_bulk_writes)
+event.listen(db.session, 'after_commit', bump_on_commit)
+event.listen(db.session, 'after_soft_rollback', discard_written_tables)
+
+
+# ----------------------------------------------
+# Compiled template cache
+# ----------------------------------------------
+# Jinja compiles every template to Python on its first render in each
+# worker. With JINJA_BYTECODE_CACHE on, the compiled code is kept on disk
+# (keyed by the template source's checksum, so edited templates recompile)
+# and new workers load it instead of compiling again.
+
+class TemplateBytecodeCache(FileSystemBytecodeCache):
+    def dump_bytecode(self, bucket):
+        # The directory is created on first use, not when a worker imports this module
+        os.makedirs(self.directory, exist_ok=True)
+        super().dump_bytecode(bucket)
+
+
+def init_bytecode_cache():
+    # Must run before the first render creates app.jinja_env
+    if app.config.get('JINJA_BYTECODE_CACHE', True) and 'jinja_env' not in app.__dict__:
+        path = app.config.get('JINJA_BYTECODE_CACHE_PATH') or os.path.join(app.instance_path, 'jinja_bytecode')
+        app.jinja_options = dict(app.jinja_options, bytecode_cache=TemplateBytecodeCache(path))
+
+
+init_bytecode_cache()
+
+
+@app.cli.command('fragment-cache-clear')
+def fragment_cache_clear_command():
+    """Forget every cached dashboard fragment."""
+    clear_fragments()
+    print("Fragment cache cleared.")
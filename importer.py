@@ -0,0 +1,238 @@
+import csv
+import io
+import click
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from app import app, db
+from models import User, Customer, ServiceProfessional
+from catalog import get_catalog
+from passwords import hash_password, hash_passwords
+from search import index_rows
+from jobs import enqueue
+from notifications import notify_registration
+
+# ----------------------------------------------
+# Bulk import of customers and professionals (CSV)
+# ----------------------------------------------
+# The CSV is read row by row and handled in chunks of IMPORT_CHUNK_ROWS: each
+# row is validated on its own, service_type is resolved against a map of the
+# catalog loaded once, usernames/emails/phone numbers are checked against the
+# database with one IN query per column per chunk (and against earlier rows of
+# the file with in-memory sets), and the valid rows are written with one
+# INSERT per table and committed before the next chunk is read. Rows that
+# fail are skipped and reported with their line number; they never roll back
+# the rest of the file.
+#
+# Rows without a password column get the default password, hashed once per
+# import. Rows with their own password are hashed by the password pool, which
+# is by far the slowest part of an import.
+
+COMMON_COLUMNS = {'username': 80, 'email': 120, 'phone_number': 15, 'address': 255, 'pin_code': 10}  # column -> max length
+IMPORT_KINDS = {
+    'customer': {'required': ['username', 'email', 'phone_number'], 'columns': dict(COMMON_COLUMNS)},
+    'professional': {'required': ['username', 'email', 'phone_number', 'service_type', 'experience'],
+                     'columns': dict(COMMON_COLUMNS, service_type=120, experience=None, description=255)},
+}
+UNIQUE_COLUMNS = ['username', 'email', 'phone_number']
+
+
+def read_csv(stream):
+    # Binary upload streams are decoded as UTF-8 (with or without a BOM)
+    if not isinstance(stream, io.TextIOBase):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    return csv.DictReader(stream)
+
+
+def clean_row(row):
+    # Header names are case-insensitive; empty cells become None
+    cleaned = {}
+    for key, value in row.items():
+        if key is None:
+            continue  # Cells beyond the header
+        value = value.strip() if isinstance(value, str) else None
+        cleaned[key.strip().lower()] = value or None
+    return cleaned
+
+
+def validate_row(kind, row, services):
+    # Returns a list of errors; fills in service_id and the parsed experience on success
+    spec = IMPORT_KINDS[kind]
+    errors = [f'{column} is required' for column in spec['required'] if not row.get(column)]
+    for column, max_length in spec['columns'].items():
+        if max_length and row.get(column) and len(row[column]) > max_length:
+            errors.append(f'{column} must be at most {max_length} characters')
+    if kind == 'professional':
+        if row.get('service_type'):
+            service = services.get(row['service_type'].lower())
+            if service is None:
+                errors.append(f"Unknown service_type '{row['service_type']}'")
+            else:
+                row['service_id'], row['service_type'] = service
+        if row.get('experience'):
+            try:
+                row['experience'] = float(row['experience'])
+                if row['experience'] < 0:
+                    raise ValueError
+            except ValueError:
+                errors.append('experience must be a number of years')
+    return errors
+
+
+def taken_values(chunk):
+    # Usernames, emails and phone numbers of the chunk that are already registered
+    taken = {}
+    for column in UNIQUE_COLUMNS:
+        values = {row[column] for line, row in chunk}
+        attribute = getattr(User, column)
+        taken[column] = {value for (value,) in db.session.query(attribute).filter(attribute.in_(values))}
+    return taken
+
+
+def insert_rows(model, rows):
+    # One multi-row INSERT; ids come back in the order of rows
+    if not rows:
+        return []
+    result = db.session.execute(insert(model).returning(model.id, sort_by_parameter_order=True), rows)
+    return list(result.scalars())
+
+
+def user_row(kind, row, password_hash):
+    return {'username': row['username'], 'email': row['email'], 'phone_number': row['phone_number'],
+            'password_hash': password_hash, 'role': kind, 'is_active': True}
+
+
+def profile_row(kind, row, user_id):
+    if kind == 'customer':
+        return {'user_id': user_id, 'address': row.get('address'), 'pin_code': row.get('pin_code')}
+    return {'user_id': user_id, 'service_type': row['service_type'], 'service_id': row['service_id'],
+            'experience': row['experience'], 'address': row.get('address'), 'pin_code': row.get('pin_code'),
+            'description': row.get('description'), 'rating': 0.0, 'is_approved': False}
+
+
+def write_chunk(kind, rows, password_hashes, notify):
+    # Insert users and their profiles in the current transaction; returns the new user ids
+    user_ids = insert_rows(User, [user_row(kind, row, password_hash)
+                                  for row, password_hash in zip(rows, password_hashes)])
+    model = Customer if kind == 'customer' else ServiceProfessional
+    profile_ids = insert_rows(model, [profile_row(kind, row, user_id) for row, user_id in zip(rows, user_ids)])
+    if model is ServiceProfessional:
+        # Bulk inserts skip the flush hooks, so index the new rows explicitly
+        index_rows(ServiceProfessional, profile_ids)
+    if notify:
+        for user_id in user_ids:
+            enqueue(notify_registration, user_id=user_id)
+    return user_ids
+
+
+def import_chunk(kind, chunk, seen, default_hash, notify, report):
+    # chunk is a list of (line, row) that passed validate_row
+    taken = taken_values(chunk)
+    accepted = []
+    for line, row in chunk:
+        errors = []
+        for column in UNIQUE_COLUMNS:
+            if row[column] in taken[column]:
+                errors.append(f'{column} is already registered')
+            elif row[column] in seen[column]:
+                errors.append(f'{column} appears earlier in the file')
+        if errors:
+            report['errors'].append({'line': line, 'username': row['username'], 'errors': errors})
+            continue
+        for column in UNIQUE_COLUMNS:
+            seen[column].add(row[column])
+        accepted.append((line, row))
+    if not accepted:
+        return
+
+    own_passwords = [row['password'] for line, row in accepted if row.get('password')]
+    own_hashes = iter(hash_passwords(own_passwords))
+    password_hashes = [next(own_hashes) if row.get('password') else default_hash for line, row in accepted]
+    rows = [row for line, row in accepted]
+    try:
+        write_chunk(kind, rows, password_hashes, notify)
+        db.session.commit()
+        report['imported'] += len(rows)
+    except IntegrityError:
+        # Someone registered one of these while the chunk was checked; retry row by row
+        db.session.rollback()
+        for (line, row), password_hash in zip(accepted, password_hashes):
+            try:
+                write_chunk(kind, [row], [password_hash], notify)
+                db.session.commit()
+                report['imported'] += 1
+            except IntegrityError:
+                db.session.rollback()
+                report['errors'].append({'line': line, 'username': row['username'],
+                                         'errors': ['username, email or phone_number is already registered']})
+
+
+def import_users(kind, stream, default_password=None, notify=False, chunk_rows=None):
+    # Import customers or professionals from a CSV stream; returns {'imported', 'failed', 'errors'}
+    if kind not in IMPORT_KINDS:
+        raise ValueError(f'Unknown import kind {kind!r}')
+    reader = read_csv(stream)
+    header = {name.strip().lower() for name in reader.fieldnames or []}
+    missing = [column for column in IMPORT_KINDS[kind]['required'] if column not in header]
+    if 'password' not in header and not default_password:
+        missing.append('password (or a default password)')
+    if missing:
+        raise ValueError(f"CSV is missing columns: {', '.join(missing)}")
+
+    chunk_rows = chunk_rows or app.config.get('IMPORT_CHUNK_ROWS', 1000)
+    # Names are matched case-insensitively and stored as spelled in the catalog
+    services = {}
+    for name, service_id in get_catalog()['service_ids'].items():
+        services.setdefault(name.lower(), (service_id, name))
+    default_hash = hash_password(default_password) if default_password else None
+    seen = {column: set() for column in UNIQUE_COLUMNS}
+    report = {'imported': 0, 'errors': []}
+    chunk = []
+    for raw_row in reader:
+        line = reader.line_num
+        row = clean_row(raw_row)
+        errors = validate_row(kind, row, services)
+        if not row.get('password') and not default_hash:
+            errors.append('password is required')
+        if errors:
+            report['errors'].append({'line': line, 'username': row.get('username'), 'errors': errors})
+            continue
+        chunk.append((line, row))
+        if len(chunk) >= chunk_rows:
+            import_chunk(kind, chunk, seen, default_hash, notify, report)
+            chunk = []
+    if chunk:
+        import_chunk(kind, chunk, seen, default_hash, notify, report)
+    report['errors'].sort(key=lambda error: error['line'])
+    report['failed'] = len(report['errors'])
+    return report
+
+
+def write_error_report(errors, stream):
+    writer = csv.writer(stream)
+    writer.writerow(['line', 'username', 'errors'])
+    for error in errors:
+        writer.writerow([error['line'], error['username'] or '', '; '.join(error['errors'])])
+
+
+@app.cli.command('import-users')
+@click.argument('kind', type=click.Choice(sorted(IMPORT_KINDS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--default-password', help='Password for rows without a password column.')
+@click.option('--errors', 'errors_path', type=click.Path(dir_okay=False), help='Write the rejected rows to this CSV.')
+@click.option('--notify', is_flag=True, help='Queue a welcome notification for every imported user.')
+def import_users_command(kind, path, default_password, errors_path, notify):
+    """Import customers or professionals from a CSV file."""
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        try:
+            report = import_users(kind, f, default_password, notify)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+    print(f"Imported {report['imported']} {kind}(s), {report['failed']} row(s) rejected.")
+    if errors_path:
+        with open(errors_path, 'w', newline='') as f:
+            write_error_report(report['errors'], f)
+    else:
+        for error in report['errors'][:20]:
+            print(f"  line {error['line']}: {'; '.join(error['errors'])}")
+        if report['failed'] > 20:
+            print(f"  ... use --errors to write all {report['failed']}")
@@ -0,0 +1,301 @@
+import json
+import os
+import random
+import signal
+import socket
+import sqlite3
+import threading
+import time
+import click
+from sqlalchemy import event
+from app import app, db
+
+# ----------------------------------------------
+# Durable background jobs
+# ----------------------------------------------
+# Slow side effects of a request (notifications, recomputations) are queued in
+# a SQLite file shared by every process on the host (JOB_QUEUE_PATH) and run by
+# `flask jobs-worker`. A job enqueued while the session has a transaction open
+# is written only when that transaction commits and dropped if it rolls back,
+# so a worker never sees work for rows that were not saved. A failing job is
+# retried with exponential backoff up to its max_attempts, a job whose worker
+# died is retried once its lease expires, and every job name can be limited to
+# a number of concurrent runs across all workers.
+
+handlers = {}  # job name -> JobHandler
+
+
+class JobHandler:
+    def __init__(self, name, function, max_attempts, concurrency):
+        self.name = name
+        self.function = function
+        self.max_attempts = max_attempts
+        self.concurrency = concurrency  # Most runs at once across all workers, None for no limit
+
+
+def job(name=None, max_attempts=None, concurrency=None):
+    # Register a function as a job; enqueue it with enqueue(function, **payload)
+    def decorator(function):
+        job_name = name or function.__name__
+        handlers[job_name] = JobHandler(job_name, function,
+                                        max_attempts or app.config.get('JOB_MAX_ATTEMPTS', 5), concurrency)
+        function.job_name = job_name
+        return function
+    return decorator
+
+
+class JobQueue:
+    def __init__(self, path):
+        self.path = path
+        self.ready = False  # The schema is created on first use, not when a worker imports this module
+        self.lock = threading.Lock()
+
+    def connect(self):
+        # A short-lived connection per call keeps the queue safe across threads and processes
+        if not self.ready:
+            with self.lock:
+                if not self.ready:
+                    self.create_schema()
+                    self.ready = True
+        return sqlite3.connect(self.path, timeout=10)
+
+    def create_schema(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with sqlite3.connect(self.path, timeout=10) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'queued',  -- queued/running/done/failed
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    run_at REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    locked_by TEXT,
+                    last_error TEXT
+                )""")
+            connection.execute("CREATE INDEX IF NOT EXISTS ix_jobs_status_run_at ON jobs (status, run_at)")
+        connection.close()
+
+    def push(self, entries):
+        # entries are (name, payload JSON, max_attempts)
+        now = time.time()
+        with self.connect() as connection:
+            connection.executemany(
+                "INSERT INTO jobs (name, payload, max_attempts, run_at, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(name, payload, max_attempts, now, now) for name, payload, max_attempts in entries]
+            )
+
+    def claim(self, worker_id, limits, lease_seconds):
+        # Atomically take the next due job whose name is under its concurrency limit
+        connection = self.connect()
+        connection.isolation_level = None
+        try:
+            connection.execute("BEGIN IMMEDIATE")  # One claimer at a time across processes
+            now = time.time()
+            # Jobs of workers that died are retried, or failed when out of attempts
+            connection.execute("""
+                UPDATE jobs SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+                                locked_by = NULL, last_error = 'lease expired'
+                WHERE status = 'running' AND started_at < ?""", (now - lease_seconds,))
+            running = dict(connection.execute("SELECT name, COUNT(*) FROM jobs WHERE status = 'running' GROUP BY name"))
+            saturated = [name for name, limit in limits.items() if limit and running.get(name, 0) >= limit]
+            sql = "SELECT id, name, payload, attempts, max_attempts FROM jobs WHERE status = 'queued' AND run_at <= ?"
+            if saturated:
+                sql += f" AND name NOT IN ({', '.join('?' * len(saturated))})"
+            row = connection.execute(sql + " ORDER BY run_at, id LIMIT 1", [now] + saturated).fetchone()
+            if row:
+                connection.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?, locked_by = ? WHERE id = ?",
+                    (now, worker_id, row[0])
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+        if row is None:
+            return None
+        id, name, payload, attempts, max_attempts = row
+        return {'id': id, 'name': name, 'payload': json.loads(payload),
+                'attempts': attempts + 1, 'max_attempts': max_attempts}
+
+    def complete(self, job_id):
+        with self.connect() as connection:
+            connection.execute("UPDATE jobs SET status = 'done', finished_at = ?, locked_by = NULL WHERE id = ?",
+                               (time.time(), job_id))
+
+    def retry(self, job_id, error, delay):
+        with self.connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = 'queued', run_at = ?, last_error = ?, locked_by = NULL WHERE id = ?",
+                (time.time() + delay, error, job_id)
+            )
+
+    def fail(self, job_id, error):
+        with self.connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = 'failed', finished_at = ?, last_error = ?, locked_by = NULL WHERE id = ?",
+                (time.time(), error, job_id)
+            )
+
+    def requeue_failed(self):
+        with self.connect() as connection:
+            return connection.execute(
+                "UPDATE jobs SET status = 'queued', attempts = 0, run_at = ?, finished_at = NULL WHERE status = 'failed'",
+                (time.time(),)
+            ).rowcount
+
+    def prune(self, retention_seconds):
+        # Forget finished jobs older than the retention period
+        with self.connect() as connection:
+            connection.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                               (time.time() - retention_seconds,))
+
+    def stats(self):
+        now = time.time()
+        with self.connect() as connection:
+            counts = {(name, status): count for name, status, count in connection.execute(
+                "SELECT name, status, COUNT(*) FROM jobs GROUP BY name, status")}
+            oldest = connection.execute(
+                "SELECT MIN(run_at) FROM jobs WHERE status = 'queued' AND run_at <= ?", (now,)).fetchone()[0]
+            runs = {name: (seconds or 0.0, count, retries or 0) for name, seconds, count, retries in connection.execute("""
+                SELECT name, SUM(finished_at - started_at), COUNT(*), SUM(attempts - 1)
+                FROM jobs WHERE status = 'done' GROUP BY name""")}
+        return {'counts': counts, 'lag_seconds': now - oldest if oldest else 0.0, 'runs': runs}
+
+
+def create_queue():
+    return JobQueue(app.config.get('JOB_QUEUE_PATH') or os.path.join(app.instance_path, 'jobs.db'))
+
+
+job_queue = create_queue()
+
+
+# ----------------------------------------------
+# Enqueue after commit
+# ----------------------------------------------
+
+def enqueue(function, **payload):
+    # Queue a job registered with @job; payload must be JSON serializable
+    name = getattr(function, 'job_name', function)
+    if name not in handlers:
+        raise ValueError(f'Unknown job {name!r}')
+    entry = (name, json.dumps(payload), handlers[name].max_attempts)
+    session = db.session()
+    if session.in_transaction():
+        session.info.setdefault('pending_jobs', []).append(entry)
+    else:
+        job_queue.push([entry])
+
+
+def push_pending_jobs(session):
+    pending = session.info.pop('pending_jobs', None)
+    if pending:
+        try:
+            job_queue.push(pending)
+        except sqlite3.Error as e:
+            # The transaction is already committed; losing a side effect beats failing the request
+            app.logger.error(f"Could not queue {len(pending)} job(s): {e}")
+
+
+def discard_pending_jobs(session, previous_transaction):
+    session.info.pop('pending_jobs', None)
+
+
+event.listen(db.session, 'after_commit', push_pending_jobs)
+event.listen(db.session, 'after_soft_rollback', discard_pending_jobs)
+
+
+# ----------------------------------------------
+# Worker
+# ----------------------------------------------
+
+def retry_delay(attempts):
+    # Exponential backoff with jitter, so retries of a shared failure spread out
+    base = app.config.get('JOB_RETRY_BASE_SECONDS', 5)
+    delay = min(base * 2 ** (attempts - 1), app.config.get('JOB_RETRY_MAX_SECONDS', 3600))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def execute(claimed):
+    handler = handlers.get(claimed['name'])
+    try:
+        if handler is None:
+            raise LookupError(f"No handler for job {claimed['name']!r}")
+        with app.app_context():
+            handler.function(**claimed['payload'])
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+        if claimed['attempts'] >= claimed['max_attempts']:
+            app.logger.error(f"Job {claimed['id']} ({claimed['name']}) failed for good: {error}")
+            job_queue.fail(claimed['id'], error)
+        else:
+            app.logger.warning(f"Job {claimed['id']} ({claimed['name']}) failed, will retry: {error}")
+            job_queue.retry(claimed['id'], error, retry_delay(claimed['attempts']))
+        return False
+    job_queue.complete(claimed['id'])
+    return True
+
+
+def run_worker(concurrency, burst=False):
+    # Run jobs on `concurrency` threads until SIGINT/SIGTERM (or, with burst, until the queue is empty)
+    stop = threading.Event()
+    limits = {name: handler.concurrency for name, handler in handlers.items()}
+    lease_seconds = app.config.get('JOB_LEASE_SECONDS', 300)
+    poll_seconds = app.config.get('JOB_POLL_SECONDS', 1.0)
+    worker_id = f'{socket.gethostname()}:{os.getpid()}'
+    processed = {'done': 0, 'failed': 0}
+
+    def loop(n):
+        while not stop.is_set():
+            claimed = job_queue.claim(f'{worker_id}:{n}', limits, lease_seconds)
+            if claimed is None:
+                if burst:
+                    return
+                stop.wait(poll_seconds)
+                continue
+            processed['done' if execute(claimed) else 'failed'] += 1
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: stop.set())  # Finish the running jobs, then exit
+
+    job_queue.prune(app.config.get('JOB_RETENTION_SECONDS', 7 * 24 * 3600))
+    threads = [threading.Thread(target=loop, args=(n,), daemon=True) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        for thread in threads:
+            thread.join(0.5)
+    return processed
+
+
+@app.cli.command('jobs-worker')
+@click.option('--concurrency', type=int, default=None, help='Jobs run at once by this worker.')
+@click.option('--burst', is_flag=True, help='Exit once the queue is empty.')
+def jobs_worker_command(concurrency, burst):
+    """Run queued background jobs."""
+    concurrency = concurrency or app.config.get('JOB_WORKER_CONCURRENCY', 4)
+    print(f"Worker started with {concurrency} thread(s) on {job_queue.path}")
+    processed = run_worker(concurrency, burst)
+    print(f"Worker stopped: {processed['done']} done, {processed['failed']} failed or retried.")
+
+
+@app.cli.command('jobs-stats')
+def jobs_stats_command():
+    """Show background job counts by name and status."""
+    stats = job_queue.stats()
+    for (name, status), count in sorted(stats['counts'].items()):
+        print(f"{name:<40} {status:<8} {count}")
+    print(f"Queue lag: {stats['lag_seconds']:.1f}s")
+
+
+@app.cli.command('jobs-retry-failed')
+def jobs_retry_failed_command():
+    """Queue every failed job again."""
+    print(f"Requeued {job_queue.requeue_failed()} job(s).")
@@ -0,0 +1,193 @@
+import heapq
+import threading
+import time
+from sqlalchemy import event, inspect
+from app import app, db
+from models import User, ServiceProfessional
+
+# ----------------------------------------------
+# Candidate professional matching
+# ----------------------------------------------
+# An in-memory index of every professional, with the approved and active ones
+# bucketed by service_id and the first PREFIX_LENGTH digits of their pin code.
+# It is built from one query on first use, updated incrementally when a
+# transaction that touched a professional (or a professional's user) commits,
+# and rebuilt every MATCHING_REFRESH_SECONDS to pick up other workers' writes.
+
+PREFIX_LENGTH = 3
+DEFAULT_LIMIT = 10
+
+# Attributes that affect whether and how a professional is matched
+TRACKED_ATTRIBUTES = ('service_id', 'pin_code', 'rating', 'experience', 'is_approved', 'user_id')
+
+
+class Candidate:
+    __slots__ = ('id', 'user_id', 'service_id', 'pin_code', 'rating', 'experience', 'is_approved', 'is_active')
+
+    def __init__(self, id, user_id, service_id, pin_code, rating, experience, is_approved, is_active):
+        self.id = id
+        self.user_id = user_id
+        self.service_id = service_id
+        self.pin_code = normalize_pin(pin_code)
+        self.rating = rating or 0.0
+        self.experience = float(experience or 0)  # Compared with other floats when ranking
+        self.is_approved = bool(is_approved)
+        self.is_active = is_active is not False
+
+    @property
+    def eligible(self):
+        return self.is_approved and self.is_active
+
+
+def normalize_pin(pin_code):
+    return ''.join((pin_code or '').split())
+
+
+def common_prefix_length(a, b):
+    length = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        length += 1
+    return length
+
+
+class MatchingIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loaded_at = None
+        self.records = {}       # professional id -> Candidate
+        self.by_user = {}       # user id -> professional id
+        self.buckets = {}       # service_id -> {pin prefix -> {professional id -> Candidate}}
+
+    def load(self, records):
+        with self.lock:
+            self.records = {}
+            self.by_user = {}
+            self.buckets = {}
+            for record in records:
+                self._put(record)
+            self.loaded_at = time.monotonic()
+
+    def _put(self, record):
+        self._discard(record.id)
+        self.records[record.id] = record
+        self.by_user[record.user_id] = record.id
+        if record.eligible:
+            prefix = record.pin_code[:PREFIX_LENGTH]
+            self.buckets.setdefault(record.service_id, {}).setdefault(prefix, {})[record.id] = record
+
+    def _discard(self, professional_id):
+        old = self.records.pop(professional_id, None)
+        if old is None:
+            return
+        self.by_user.pop(old.user_id, None)
+        bucket = self.buckets.get(old.service_id, {}).get(old.pin_code[:PREFIX_LENGTH])
+        if bucket is not None:
+            bucket.pop(professional_id, None)
+
+    def apply(self, professionals, removed, user_activity, ratings):
+        # Apply the changes of one committed transaction
+        with self.lock:
+            if self.loaded_at is None:
+                return
+            for professional_id in removed:
+                self._discard(professional_id)
+            for values in professionals:
+                previous = self.records.get(values['id'])
+                is_active = previous.is_active if previous else True
+                self._put(Candidate(is_active=is_active, **values))
+            for user_id, is_active in user_activity.items():
+                professional_id = self.by_user.get(user_id)
+                if professional_id is not None:
+                    record = self.records[professional_id]
+                    record.is_active = is_active
+                    self._put(record)
+            for professional_id, rating in ratings.items():
+                record = self.records.get(professional_id)
+                if record is not None:
+                    record.rating = rating or 0.0
+
+    def lookup(self, service_id, pin_code, limit=DEFAULT_LIMIT):
+        pin = normalize_pin(pin_code)
+        with self.lock:
+            buckets = self.buckets.get(service_id, {})
+            # Widen the area one digit at a time until there are enough candidates
+            candidates = []
+            for length in range(min(PREFIX_LENGTH, len(pin)), -1, -1):
+                prefix = pin[:length]
+                if length == PREFIX_LENGTH:
+                    candidates = list(buckets.get(prefix, {}).values())
+                else:
+                    candidates = [record for key, bucket in buckets.items() if key.startswith(prefix)
+                                  for record in bucket.values()]
+                if len(candidates) >= limit:
+                    break
+            # Closest pin first, then best rated, then most experienced
+            return heapq.nlargest(limit, candidates, key=lambda record: (
+                common_prefix_length(pin, record.pin_code), record.rating, record.experience, -record.id
+            ))
+
+
+matching_index = MatchingIndex()
+
+
+def load_matching_index():
+    rows = db.session.query(
+        ServiceProfessional.id, ServiceProfessional.user_id, ServiceProfessional.service_id,
+        ServiceProfessional.pin_code, ServiceProfessional.rating, ServiceProfessional.experience,
+        ServiceProfessional.is_approved, User.is_active
+    ).join(User, User.id == ServiceProfessional.user_id).all()
+    matching_index.load(Candidate(*row) for row in rows)
+
+
+def find_candidates(service_id, pin_code, limit=DEFAULT_LIMIT):
+    # Return the best approved, active professionals for a service near a pin code
+    refresh_seconds = app.config.get('MATCHING_REFRESH_SECONDS', 300)
+    if matching_index.loaded_at is None or time.monotonic() - matching_index.loaded_at > refresh_seconds:
+        load_matching_index()
+    return matching_index.lookup(service_id, pin_code, limit)
+
+
+# ----------------------------------------------
+# Incremental updates from session events
+# ----------------------------------------------
+
+def pending_changes(session):
+    return session.info.setdefault('matching_changes', {'professionals': {}, 'removed': set(), 'users': {}, 'ratings': {}})
+
+
+def note_rating_changes(session, ratings):
+    # Ratings written with SQL UPDATEs (see ratings.py) bypass the flush, so they are reported here
+    pending_changes(session)['ratings'].update(ratings)
+
+
+def collect_matching_changes(session, flush_context):
+    pending = pending_changes(session)
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, ServiceProfessional):
+            attrs = inspect(obj).attrs
+            if obj in session.new or any(attrs[name].history.has_changes() for name in TRACKED_ATTRIBUTES):
+                pending['professionals'][obj.id] = {name: getattr(obj, name) for name in TRACKED_ATTRIBUTES}
+        elif isinstance(obj, User) and inspect(obj).attrs.is_active.history.has_changes():
+            pending['users'][obj.id] = obj.is_active is not False
+    for obj in session.deleted:
+        if isinstance(obj, ServiceProfessional):
+            pending['removed'].add(obj.id)
+            pending['professionals'].pop(obj.id, None)
+
+
+def apply_matching_changes(session):
+    pending = session.info.pop('matching_changes', None)
+    if pending:
+        professionals = [dict(values, id=professional_id) for professional_id, values in pending['professionals'].items()]
+        matching_index.apply(professionals, pending['removed'], pending['users'], pending['ratings'])
+
+
+def discard_matching_changes(session, previous_transaction):
+    session.info.pop('matching_changes', None)
+
+
+event.listen(db.session, 'after_flush', collect_matching_changes)
+event.listen(db.session, 'after_commit', apply_matching_changes)
+event.listen(db.session, 'after_soft_rollback', discard_matching_changes)
@@ -0,0 +1,182 @@
+import threading
+import time
+from flask import g, request, has_app_context, Response
+from sqlalchemy import event
+from app import app, db
+from jobs import job_queue
+
+# ----------------------------------------------
+# Request metrics (Prometheus text format at /metrics)
+# ----------------------------------------------
+# Labels use the matched endpoint name, never the raw URL, so
+# /view_request/1 and /view_request/2 share one series and memory stays bounded.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+KNOWN_METHODS = {'GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'HEAD', 'OPTIONS'}
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = {}       # (endpoint, method) -> Histogram of seconds
+        self.db_time = {}       # (endpoint, method) -> Histogram of seconds spent in SQL
+        self.sql_count = {}     # (endpoint, method) -> Histogram of statements per request
+        self.size = {}          # (endpoint, method) -> Histogram of response bytes
+        self.responses = {}     # (endpoint, method, status) -> count
+        self.statements = {}    # bind ('primary', 'replica0', ...) -> count
+
+    def record(self, endpoint, method, status, duration, sql_statements, sql_seconds, size):
+        key = (endpoint, method)
+        with self.lock:
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(duration)
+            self.db_time.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(sql_seconds)
+            self.sql_count.setdefault(key, Histogram(SQL_COUNT_BUCKETS)).observe(sql_statements)
+            if size is not None:
+                self.size.setdefault(key, Histogram(SIZE_BUCKETS)).observe(size)
+            status_key = (endpoint, method, str(status))
+            self.responses[status_key] = self.responses.get(status_key, 0) + 1
+
+    def count_statement(self, bind):
+        with self.lock:
+            self.statements[bind] = self.statements.get(bind, 0) + 1
+
+    def render(self):
+        # Build the Prometheus text exposition
+        lines = []
+        with self.lock:
+            render_histogram(lines, 'http_request_duration_seconds', 'Request latency in seconds', self.latency)
+            render_histogram(lines, 'http_request_db_seconds', 'Time spent executing SQL per request', self.db_time)
+            render_histogram(lines, 'http_request_sql_statements', 'SQL statements executed per request', self.sql_count)
+            render_histogram(lines, 'http_response_size_bytes', 'Response body size in bytes', self.size)
+
+            lines.append('# HELP http_responses_total Responses by endpoint, method and status code')
+            lines.append('# TYPE http_responses_total counter')
+            for (endpoint, method, status), count in sorted(self.responses.items()):
+                lines.append(f'http_responses_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+
+            lines.append('# HELP sql_statements_total SQL statements executed by database bind')
+            lines.append('# TYPE sql_statements_total counter')
+            for bind, count in sorted(self.statements.items()):
+                lines.append(f'sql_statements_total{{bind="{bind}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_histogram(lines, name, help_text, series):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} histogram')
+    for (endpoint, method), histogram in sorted(series.items()):
+        labels = f'endpoint="{endpoint}",method="{method}"'
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            lines.append(f'{name}_bucket{{{labels},le="{format_value(bound)}"}} {count}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+        lines.append(f'{name}_sum{{{labels}}} {format_value(histogram.total)}')
+        lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+
+request_metrics = RequestMetrics()
+
+
+# ----------------------------------------------
+# SQL timing via SQLAlchemy engine events
+# ----------------------------------------------
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+    request_metrics.count_statement(bind_names.get(conn.engine, 'primary'))
+    # Only attribute the statement to a request if one is being measured
+    if has_app_context() and 'metrics_start' in g:
+        g.sql_statements += 1
+        g.sql_seconds += elapsed
+
+
+with app.app_context():
+    # The primary and any read replicas
+    bind_names = {engine: bind or 'primary' for bind, engine in db.engines.items()}
+    for engine in bind_names:
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+
+
+# ----------------------------------------------
+# Request hooks
+# ----------------------------------------------
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_start = time.perf_counter()
+    g.sql_statements = 0
+    g.sql_seconds = 0.0
+
+
+@app.after_request
+def record_request_metrics(response):
+    if 'metrics_start' not in g:
+        return response
+
+    duration = time.perf_counter() - g.metrics_start
+    endpoint = request.endpoint or 'unmatched'
+    method = request.method if request.method in KNOWN_METHODS else 'OTHER'
+    # Streamed responses have no known length up front
+    size = None if response.is_streamed else response.calculate_content_length()
+
+    request_metrics.record(endpoint, method, response.status_code, duration,
+                           g.sql_statements, g.sql_seconds, size)
+    return response
+
+
+# ----------------------------------------------
+# Background job metrics (read from the job queue)
+# ----------------------------------------------
+# Workers run in their own processes, so their figures come from the shared
+# queue file: jobs by name and status, how late the oldest due job is, and
+# the run time and retries of the finished jobs still retained.
+
+def render_job_metrics():
+    stats = job_queue.stats()
+    lines = ['# HELP background_jobs Jobs in the queue by name and status',
+             '# TYPE background_jobs gauge']
+    for (name, status), count in sorted(stats['counts'].items()):
+        lines.append(f'background_jobs{{name="{name}",status="{status}"}} {count}')
+    lines.append('# HELP background_job_queue_lag_seconds Age of the oldest due job still waiting')
+    lines.append('# TYPE background_job_queue_lag_seconds gauge')
+    lines.append(f"background_job_queue_lag_seconds {format_value(float(stats['lag_seconds']))}")
+    lines.append('# HELP background_job_run_seconds Run time of the retained finished jobs')
+    lines.append('# TYPE background_job_run_seconds summary')
+    for name, (seconds, count, retries) in sorted(stats['runs'].items()):
+        lines.append(f'background_job_run_seconds_sum{{name="{name}"}} {format_value(float(seconds))}')
+        lines.append(f'background_job_run_seconds_count{{name="{name}"}} {count}')
+    lines.append('# HELP background_job_retries Extra attempts the retained finished jobs needed')
+    lines.append('# TYPE background_job_retries gauge')
+    for name, (seconds, count, retries) in sorted(stats['runs'].items()):
+        lines.append(f'background_job_retries{{name="{name}"}} {retries}')
+    return '\n'.join(lines) + '\n'
+
+
+@app.route('/metrics')
+def metrics():
+    return Response(request_metrics.render() + render_job_metrics(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,45 @@
+"""Add indexes for the hot query shapes
+
+Revision ID: 3f1c9a2b7d40
+Revises: 
+Create Date: 2026-10-18 10:12:43.518207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a2b7d40'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# (name, table, columns, partial index condition)
+INDEXES = [
+    ('ix_user_role', 'user', ['role'], None),
+    ('ix_customer_user_id', 'customer', ['user_id'], None),
+    ('ix_service_professional_user_id', 'service_professional', ['user_id'], None),
+    ('ix_service_professional_service_id', 'service_professional', ['service_id'], None),
+    ('ix_service_request_professional', 'service_request', ['professional_id', 'status', 'date_of_request'], None),
+    ('ix_service_request_customer', 'service_request', ['customer_id', 'date_of_request'], None),
+    ('ix_service_request_status', 'service_request', ['status', 'date_of_request'], None),
+    ('ix_service_request_date', 'service_request', ['date_of_request'], None),
+    ('ix_service_request_service', 'service_request', ['service_id'], None),
+    ('ix_service_request_unassigned', 'service_request', ['date_of_request'], 'professional_id IS NULL'),
+    ('ix_review_service_request_id', 'review', ['service_request_id'], None),
+]
+
+
+def upgrade():
+    # Databases created by db.create_all() already have these indexes
+    for name, table, columns, where in INDEXES:
+        kwargs = {}
+        if where:
+            kwargs = {'sqlite_where': sa.text(where), 'postgresql_where': sa.text(where)}
+        op.create_index(name, table, columns, unique=False, if_not_exists=True, **kwargs)
+
+
+def downgrade():
+    for name, table, columns, where in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
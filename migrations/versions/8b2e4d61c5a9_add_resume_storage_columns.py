@@ -0,0 +1,37 @@
+"""Add content-addressed resume columns
+
+Revision ID: 8b2e4d61c5a9
+Revises: 3f1c9a2b7d40
+Create Date: 2026-10-18 11:02:17.904531
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e4d61c5a9'
+down_revision = '3f1c9a2b7d40'
+branch_labels = None
+depends_on = None
+
+COLUMNS = [
+    sa.Column('resume_sha256', sa.String(length=64), nullable=True),
+    sa.Column('resume_size', sa.Integer(), nullable=True),
+    sa.Column('resume_mime', sa.String(length=100), nullable=True),
+]
+
+
+def upgrade():
+    # Databases created by db.create_all() already have these columns
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('service_professional')}
+    with op.batch_alter_table('service_professional') as batch_op:
+        for column in COLUMNS:
+            if column.name not in existing:
+                batch_op.add_column(column.copy())
+
+
+def downgrade():
+    with op.batch_alter_table('service_professional') as batch_op:
+        for column in reversed(COLUMNS):
+            batch_op.drop_column(column.name)
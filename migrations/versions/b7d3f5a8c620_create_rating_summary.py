@@ -0,0 +1,60 @@
+"""Create the rating summaries
+
+Revision ID: b7d3f5a8c620
+Revises: a4c9e2d7b518
+Create Date: 2026-10-19 10:41:26.093817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d3f5a8c620'
+down_revision = 'a4c9e2d7b518'
+branch_labels = None
+depends_on = None
+
+HISTOGRAM_COLUMNS = ['rating_{}'.format(n) for n in range(1, 6)]
+
+
+def backfill_sql(subject, key):
+    # ratings.recompute_ratings() for one subject; the archive tables come later, so every review is hot
+    histogram = ', '.join('sum(CASE WHEN v.rating = {} THEN 1 ELSE 0 END)'.format(n) for n in range(1, 6))
+    return (
+        f"INSERT INTO rating_summary (subject, subject_id, review_count, rating_total, {', '.join(HISTOGRAM_COLUMNS)}) "
+        f"SELECT '{subject}', r.{key}, count(*), sum(v.rating), {histogram} "
+        f"FROM review v JOIN service_request r ON r.id = v.service_request_id "
+        f"WHERE r.{key} IS NOT NULL AND v.rating BETWEEN 1 AND 5 GROUP BY r.{key}"
+    )
+
+
+def upgrade():
+    # Databases created by db.create_all() already have the table, kept current by ratings.py
+    if sa.inspect(op.get_bind()).has_table('rating_summary'):
+        return
+    op.create_table(
+        'rating_summary',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('subject', sa.String(length=20), nullable=False),
+        sa.Column('subject_id', sa.Integer(), nullable=False),
+        sa.Column('review_count', sa.Integer(), nullable=False),
+        sa.Column('rating_total', sa.Integer(), nullable=False),
+        *[sa.Column(name, sa.Integer(), nullable=False) for name in HISTOGRAM_COLUMNS],
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('subject', 'subject_id'),
+    )
+    # Reviews are only counted as they change, so start from the ones already there
+    op.execute(backfill_sql('professional', 'professional_id'))
+    op.execute(backfill_sql('service', 'service_id'))
+    # And the professionals' ratings from their summaries, as recompute-ratings does
+    op.execute(
+        "UPDATE service_professional SET rating = coalesce(("
+        "SELECT CAST(s.rating_total AS FLOAT) / s.review_count FROM rating_summary s "
+        "WHERE s.subject = 'professional' AND s.subject_id = service_professional.id AND s.review_count > 0"
+        "), 0.0)"
+    )
+
+
+def downgrade():
+    op.drop_table('rating_summary')
@@ -0,0 +1,41 @@
+"""Create the request event log
+
+Revision ID: c1e6a9d2f347
+Revises: b7d3f5a8c620
+Create Date: 2026-10-19 11:15:52.640219
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c1e6a9d2f347'
+down_revision = 'b7d3f5a8c620'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by db.create_all() already have the table. The feed only
+    # streams events from now on, so nothing is backfilled.
+    if sa.inspect(op.get_bind()).has_table('request_event'):
+        return
+    op.create_table(
+        'request_event',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('request_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=10), nullable=False),
+        sa.Column('service_id', sa.Integer(), nullable=False),
+        sa.Column('pin_prefix', sa.String(length=10), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_request_event_created_at', 'request_event', ['created_at'], unique=False)
+    op.create_index('ix_request_event_feed', 'request_event', ['service_id', 'pin_prefix', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_request_event_feed', table_name='request_event')
+    op.drop_index('ix_request_event_created_at', table_name='request_event')
+    op.drop_table('request_event')
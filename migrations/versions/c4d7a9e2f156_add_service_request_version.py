@@ -0,0 +1,29 @@
+"""Add the service request version column
+
+Revision ID: c4d7a9e2f156
+Revises: 8b2e4d61c5a9
+Create Date: 2026-10-18 15:24:51.208337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d7a9e2f156'
+down_revision = '8b2e4d61c5a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by db.create_all() already have the column; existing rows start at version 1
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('service_request')}
+    if 'version' not in existing:
+        with op.batch_alter_table('service_request') as batch_op:
+            batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    with op.batch_alter_table('service_request') as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,64 @@
+"""Create the closed request archive
+
+Revision ID: d5f2b8e4a761
+Revises: c1e6a9d2f347
+Create Date: 2026-10-19 11:48:09.325476
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5f2b8e4a761'
+down_revision = 'c1e6a9d2f347'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by db.create_all() already have the tables. They start
+    # empty; the `archive` command moves closed requests into them.
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('service_request_archive'):
+        op.create_table(
+            'service_request_archive',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('service_id', sa.Integer(), nullable=False),
+            sa.Column('customer_id', sa.Integer(), nullable=False),
+            sa.Column('professional_id', sa.Integer(), nullable=True),
+            sa.Column('date_of_request', sa.DateTime(), nullable=True),
+            sa.Column('date_of_completion', sa.DateTime(), nullable=True),
+            sa.Column('status', sa.SmallInteger(), nullable=False),
+            sa.Column('description', sa.String(length=255), nullable=True),
+            sa.Column('version', sa.Integer(), nullable=False),
+            sa.Column('archived_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_service_request_archive_customer', 'service_request_archive',
+                        ['customer_id', 'date_of_request'], unique=False)
+        op.create_index('ix_service_request_archive_professional', 'service_request_archive',
+                        ['professional_id', 'date_of_completion'], unique=False)
+        op.create_index('ix_service_request_archive_date', 'service_request_archive',
+                        ['date_of_request'], unique=False)
+    if not inspector.has_table('review_archive'):
+        op.create_table(
+            'review_archive',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('service_request_id', sa.Integer(), nullable=False),
+            sa.Column('customer_id', sa.Integer(), nullable=False),
+            sa.Column('rating', sa.Integer(), nullable=False),
+            sa.Column('remarks', sa.String(length=255), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_review_archive_service_request_id', 'review_archive',
+                        ['service_request_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_review_archive_service_request_id', table_name='review_archive')
+    op.drop_table('review_archive')
+    op.drop_index('ix_service_request_archive_date', table_name='service_request_archive')
+    op.drop_index('ix_service_request_archive_professional', table_name='service_request_archive')
+    op.drop_index('ix_service_request_archive_customer', table_name='service_request_archive')
+    op.drop_table('service_request_archive')
@@ -0,0 +1,118 @@
+"""Store request statuses as small integer codes
+
+Revision ID: d9e3b5a1c872
+Revises: c4d7a9e2f156
+Create Date: 2026-10-18 16:40:12.771905
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9e3b5a1c872'
+down_revision = 'c4d7a9e2f156'
+branch_labels = None
+depends_on = None
+
+# statuses.py at this revision; free text is matched lower-cased and trimmed, NULL meant 'requested'
+STATUS_CODES = {'requested': 1, 'accepted': 2, 'completed': 3, 'closed': 4}
+STATUS_ALIASES = {'pending': 'requested'}
+
+ROLLUP_COLUMNS = ['day', 'service_id', 'status', 'request_count', 'completed_count', 'completion_seconds', 'revenue']
+
+
+def code_sql(column):
+    names = {**STATUS_CODES, **{alias: STATUS_CODES[name] for alias, name in STATUS_ALIASES.items()}}
+    whens = ' '.join(f"WHEN '{name}' THEN {code}" for name, code in names.items())
+    return f"CASE lower(trim(coalesce({column}, 'requested'))) {whens} END"
+
+
+def name_sql(column):
+    whens = ' '.join(f"WHEN {code} THEN '{name}'" for name, code in STATUS_CODES.items())
+    return f"CASE {column} {whens} END"
+
+
+def status_indexes():
+    # (name, columns, partial index condition) of the indexes on service_request.status
+    return [('ix_service_request_professional', ['professional_id', 'status', 'date_of_request'], None)] + [
+        (f'ix_service_request_{name}', ['date_of_request'], f'status = {code}') for name, code in STATUS_CODES.items()
+    ]
+
+
+def has_text_status(inspector, table):
+    # False for a missing table, or one db.create_all() made with codes already
+    if not inspector.has_table(table):
+        return False
+    status_column = {column['name']: column for column in inspector.get_columns(table)}['status']
+    return not isinstance(status_column['type'], sa.Integer)
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    # The rollup table only exists where db.create_all() made it; a later migration creates it otherwise
+    tables = [table for table in ('service_request', 'daily_request_rollup') if has_text_status(inspector, table)]
+
+    # Refuse to guess what unknown statuses meant
+    known = set(STATUS_CODES) | set(STATUS_ALIASES)
+    for table in tables:
+        unknown = [value for (value,) in bind.execute(sa.text(f'SELECT DISTINCT status FROM {table}'))
+                   if isinstance(value, str) and value.strip().lower() not in known]
+        if unknown:
+            raise RuntimeError(f'Unknown statuses in {table}: {unknown}; add them to STATUS_ALIASES')
+
+    if 'service_request' in tables:
+        upgrade_requests(inspector)
+    if 'daily_request_rollup' in tables:
+        upgrade_rollups(bind)
+
+
+def upgrade_requests(inspector):
+    # Requests: rewrite every row with one UPDATE, then change the column type
+    existing = {index['name'] for index in inspector.get_indexes('service_request')}
+    for name in ('ix_service_request_professional', 'ix_service_request_status'):
+        if name in existing:
+            op.drop_index(name, table_name='service_request')
+    op.execute(f"UPDATE service_request SET status = {code_sql('status')}")
+    with op.batch_alter_table('service_request') as batch_op:
+        batch_op.alter_column('status', existing_type=sa.String(length=50), type_=sa.SmallInteger(),
+                              nullable=False, server_default='1', postgresql_using='status::smallint')
+    for name, columns, where in status_indexes():
+        condition = {'sqlite_where': sa.text(where), 'postgresql_where': sa.text(where)} if where else {}
+        op.create_index(name, 'service_request', columns, **condition)
+
+
+def upgrade_rollups(bind):
+    # Rollups: statuses that differed only in spelling now share a row, so merge them
+    rows = bind.execute(sa.text(
+        f"SELECT day, service_id, {code_sql('status')}, SUM(request_count), SUM(completed_count), "
+        f"SUM(completion_seconds), SUM(revenue) FROM daily_request_rollup "
+        f"GROUP BY day, service_id, {code_sql('status')}"
+    )).all()
+    op.execute('DELETE FROM daily_request_rollup')
+    with op.batch_alter_table('daily_request_rollup') as batch_op:
+        batch_op.alter_column('status', existing_type=sa.String(length=50), type_=sa.SmallInteger(),
+                              nullable=False, postgresql_using='status::smallint')
+    if rows:
+        rollups = sa.table('daily_request_rollup', *[sa.column(name) for name in ROLLUP_COLUMNS])
+        op.bulk_insert(rollups, [dict(zip(ROLLUP_COLUMNS, row)) for row in rows])
+
+
+def downgrade():
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    inspector = sa.inspect(op.get_bind())
+    for name, columns, where in status_indexes():
+        op.drop_index(name, table_name='service_request')
+    for table in ('service_request', 'daily_request_rollup'):
+        if not inspector.has_table(table):
+            continue
+        if sqlite:
+            # SQLite keeps the names as text until the table is copied below
+            op.execute(f"UPDATE {table} SET status = {name_sql('status')}")
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('status', existing_type=sa.SmallInteger(), type_=sa.String(length=50),
+                                  nullable=True, server_default=None, postgresql_using=name_sql('status'))
+    op.create_index('ix_service_request_professional', 'service_request',
+                    ['professional_id', 'status', 'date_of_request'])
+    op.create_index('ix_service_request_status', 'service_request', ['status', 'date_of_request'])
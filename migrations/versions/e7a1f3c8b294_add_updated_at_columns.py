@@ -0,0 +1,40 @@
+"""Add updated_at to services, professionals and service requests
+
+Revision ID: e7a1f3c8b294
+Revises: d9e3b5a1c872
+Create Date: 2026-10-18 19:05:37.402118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a1f3c8b294'
+down_revision = 'd9e3b5a1c872'
+branch_labels = None
+depends_on = None
+
+# Table -> what existing rows start from; the ORM keeps the column current from then on
+BACKFILL = {
+    'service': 'created_at',
+    'service_professional': 'created_at',
+    'service_request': 'coalesce(date_of_completion, date_of_request)',
+}
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for table, start in BACKFILL.items():
+        # Databases created by db.create_all() already have the column
+        if 'updated_at' in {column['name'] for column in inspector.get_columns(table)}:
+            continue
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(f"UPDATE {table} SET updated_at = {start}")
+
+
+def downgrade():
+    for table in BACKFILL:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('updated_at')
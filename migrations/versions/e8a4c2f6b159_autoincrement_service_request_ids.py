@@ -0,0 +1,66 @@
+"""Never hand out a service request id twice
+
+Revision ID: e8a4c2f6b159
+Revises: d5f2b8e4a761
+Create Date: 2026-10-20 09:26:14.508237
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8a4c2f6b159'
+down_revision = 'd5f2b8e4a761'
+branch_labels = None
+depends_on = None
+
+# statuses.py at this revision
+STATUS_CODES = {'requested': 1, 'accepted': 2, 'completed': 3, 'closed': 4}
+
+
+def partial_indexes():
+    # (name, partial index condition) of the service_request indexes the table copy below would not keep
+    return [('ix_service_request_unassigned', 'professional_id IS NULL')] + [
+        (f'ix_service_request_{name}', f'status = {code}') for name, code in STATUS_CODES.items()
+    ]
+
+
+def has_autoincrement(bind):
+    sql = bind.execute(sa.text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'service_request'")).scalar()
+    return 'AUTOINCREMENT' in sql.upper()
+
+
+def rebuild(autoincrement):
+    # SQLite only takes AUTOINCREMENT when the table is created, so copy it into a new one
+    existing = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('service_request')}
+    for name, _ in partial_indexes():
+        if name in existing:
+            op.drop_index(name, table_name='service_request')
+    with op.batch_alter_table('service_request', recreate='always',
+                              table_kwargs={'sqlite_autoincrement': autoincrement}):
+        pass
+    for name, where in partial_indexes():
+        op.create_index(name, 'service_request', ['date_of_request'], sqlite_where=sa.text(where))
+
+
+def upgrade():
+    # Without AUTOINCREMENT SQLite hands out max(id) + 1, so after the newest request was archived
+    # or deleted its id went to the next one, clashing with the archive. Sequences never do that.
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite' or has_autoincrement(bind):
+        return
+    rebuild(True)
+    # Start past every id already used, archived ones included
+    archived = 'SELECT max(id) FROM service_request_archive' if sa.inspect(bind).has_table('service_request_archive') \
+        else 'SELECT 0'
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'service_request'")
+    op.execute(f"INSERT INTO sqlite_sequence (name, seq) SELECT 'service_request', "
+               f"max(coalesce((SELECT max(id) FROM service_request), 0), coalesce(({archived}), 0))")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite' or not has_autoincrement(bind):
+        return
+    rebuild(False)
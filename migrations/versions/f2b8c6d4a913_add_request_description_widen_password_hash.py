@@ -0,0 +1,40 @@
+"""Add the service request description and widen user password hashes
+
+Revision ID: f2b8c6d4a913
+Revises: e7a1f3c8b294
+Create Date: 2026-10-19 09:12:05.318664
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b8c6d4a913'
+down_revision = 'e7a1f3c8b294'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    # Databases created by db.create_all() already have both
+    requests = {column['name'] for column in inspector.get_columns('service_request')}
+    if 'description' not in requests:
+        with op.batch_alter_table('service_request') as batch_op:
+            batch_op.add_column(sa.Column('description', sa.String(length=255), nullable=True))
+
+    # scrypt hashes are ~160 characters; Postgres rejects them in VARCHAR(120)
+    password_hash = {column['name']: column for column in inspector.get_columns('user')}['password_hash']
+    if (getattr(password_hash['type'], 'length', None) or 255) < 255:
+        with op.batch_alter_table('user') as batch_op:
+            batch_op.alter_column('password_hash', existing_type=sa.String(length=120), type_=sa.String(length=255),
+                                  existing_nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.alter_column('password_hash', existing_type=sa.String(length=255), type_=sa.String(length=120),
+                              existing_nullable=False)
+    with op.batch_alter_table('service_request') as batch_op:
+        batch_op.drop_column('description')
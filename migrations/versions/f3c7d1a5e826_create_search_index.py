@@ -0,0 +1,67 @@
+"""Create the full-text search index
+
+Revision ID: f3c7d1a5e826
+Revises: e8a4c2f6b159
+Create Date: 2026-10-20 11:02:48.917364
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c7d1a5e826'
+down_revision = 'e8a4c2f6b159'
+branch_labels = None
+depends_on = None
+
+# search.py at this revision: a document per service, professional and request, rowid id * 4 + kind
+KIND_SLOTS = 4
+STATUS_NAMES = {1: 'requested', 2: 'accepted', 3: 'completed', 4: 'closed'}
+STATUS_SQL = 'CASE sr.status ' + ' '.join(f"WHEN {code} THEN '{name}'" for code, name in STATUS_NAMES.items()) + " ELSE '' END"
+DOCUMENT_SQL = [
+    """
+    SELECT s.id * {slots} + 0, 0, s.id,
+           s.name || ' ' || coalesce(s.description, '')
+    FROM service s""",
+    """
+    SELECT sp.id * {slots} + 1, 1, sp.id,
+           sp.id || ' ' || u.username || ' ' || sp.service_type || ' ' || sp.experience || ' ' ||
+           coalesce(sp.address, '') || ' ' || coalesce(sp.pin_code, '') || ' ' ||
+           coalesce(sp.description, '') || ' ' || coalesce(s.name, '')
+    FROM service_professional sp
+    JOIN "user" u ON u.id = sp.user_id
+    LEFT JOIN service s ON s.id = sp.service_id""",
+    """
+    SELECT sr.id * {slots} + 2, 2, sr.id,
+           sr.id || ' ' || {status} || ' ' || coalesce(s.name, '') || ' ' ||
+           coalesce(cu.username, '') || ' ' || coalesce(cu.phone_number, '') || ' ' ||
+           coalesce(c.address, '') || ' ' || coalesce(c.pin_code, '') || ' ' || coalesce(pu.username, '')
+    FROM service_request sr
+    LEFT JOIN service s ON s.id = sr.service_id
+    LEFT JOIN customer c ON c.id = sr.customer_id
+    LEFT JOIN "user" cu ON cu.id = c.user_id
+    LEFT JOIN service_professional sp ON sp.id = sr.professional_id
+    LEFT JOIN "user" pu ON pu.id = sp.user_id""",
+]
+
+
+def upgrade():
+    # Only SQLite has FTS5; elsewhere, or where SQLite was built without it, search uses ILIKE filters.
+    # `flask init-db` may already have created the table.
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite' or sa.inspect(bind).has_table('search_index'):
+        return
+    if not bind.execute(sa.text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar():
+        return
+    op.execute("CREATE VIRTUAL TABLE search_index USING fts5("
+               "kind UNINDEXED, ref_id UNINDEXED, body, tokenize = 'unicode61')")
+    # Rows are only indexed as they change, so start from the ones already there
+    for document_sql in DOCUMENT_SQL:
+        op.execute(f"INSERT INTO search_index (rowid, kind, ref_id, body) "
+                   f"{document_sql.format(slots=KIND_SLOTS, status=STATUS_SQL)}")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute('DROP TABLE IF EXISTS search_index')
@@ -1,5 +1,7 @@
+import click
 from app import app , db
-from werkzeug.security import generate_password_hash
+from passwords import hash_password
+from statuses import STATUS_CODES, StatusCode
 import datetime
 
 
@@ -8,10 +10,10 @@ import datetime
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
-    password_hash = db.Column(db.String(120), nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)  # scrypt hashes are ~160 characters
     email = db.Column(db.String(120), unique=True, nullable=False)
     phone_number = db.Column(db.String(15), unique=True, nullable=True)  # New phone number field
-    role = db.Column(db.String(50), nullable=False)  # 'Admin', 'Customer', 'Service Professional'
+    role = db.Column(db.String(50), nullable=False, index=True)  # 'Admin', 'Customer', 'Service Professional'
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
     
@@ -29,7 +31,7 @@ class Admin(db.Model):
 # Customer Model
 class Customer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     address = db.Column(db.String(255), nullable=True)
     pin_code = db.Column(db.String(10), nullable=True)
     user_ref = db.relationship('User', back_populates='customer_ref',  overlaps="customer_ref,user")
@@ -43,16 +45,20 @@ class Customer(db.Model):
 # Service Professional Model
 class ServiceProfessional(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     service_type = db.Column(db.String(120), nullable=False)
     experience = db.Column(db.Float, nullable=False)
     rating = db.Column(db.Float, default=0.0)
-    resume_filename = db.Column(db.String(255), nullable=True)  # For storing resume file name
+    resume_filename = db.Column(db.String(255), nullable=True)  # Original file name of the resume
+    resume_sha256 = db.Column(db.String(64), nullable=True)  # Content hash; the file lives at RESUME_STORAGE_PATH/<sha256[:2]>/<sha256>
+    resume_size = db.Column(db.Integer, nullable=True)  # Bytes
+    resume_mime = db.Column(db.String(100), nullable=True)
     address = db.Column(db.String(255), nullable=True)  # Address of the service professional
     pin_code = db.Column(db.String(10), nullable=True)  # Pin code (postal code)
     description = db.Column(db.String(255), nullable=True)
     is_approved = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)  # See conditional.py
     user_ref = db.relationship('User', back_populates='service_professional_ref')
 
     # Virtual column to get the name from the associated user
@@ -62,7 +68,7 @@ class ServiceProfessional(db.Model):
 
 
     # Relationships
-    service_id = db.Column(db.Integer, db.ForeignKey('service.id'), nullable=False)
+    service_id = db.Column(db.Integer, db.ForeignKey('service.id'), nullable=False, index=True)
     service_ref = db.relationship('Service', back_populates='service_professionals')
     service_requests = db.relationship('ServiceRequest', back_populates='service_professional_ref')
 
@@ -73,6 +79,7 @@ class Service(db.Model):
     price = db.Column(db.Float, nullable=False)
     description = db.Column(db.String(255), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)  # See conditional.py
     service_professionals = db.relationship('ServiceProfessional', back_populates='service_ref')
     service_requests = db.relationship('ServiceRequest', back_populates='service_ref')
     
@@ -85,7 +92,31 @@ class ServiceRequest(db.Model):
     professional_id = db.Column(db.Integer, db.ForeignKey('service_professional.id'))
     date_of_request = db.Column(db.DateTime, default=datetime.datetime.utcnow)
     date_of_completion = db.Column(db.DateTime, nullable=True)
-    status = db.Column(db.String(50), default='requested')      # requested/accepted/closed
+    status = db.Column(StatusCode, nullable=False, default='requested', server_default='1')  # See statuses.py
+    description = db.Column(db.String(255), nullable=True)      # Customer's description of the job
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # Bumped by every update, see transitions.py
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)  # See conditional.py
+
+    # Indexes for the hot filters; SQLite appends the rowid (id) to every index,
+    # so (..., date_of_request) also serves ORDER BY date_of_request, id
+    __table_args__ = (
+        db.Index('ix_service_request_professional', 'professional_id', 'status', 'date_of_request'),
+        db.Index('ix_service_request_customer', 'customer_id', 'date_of_request'),
+        db.Index('ix_service_request_date', 'date_of_request'),
+        db.Index('ix_service_request_service', 'service_id'),
+        # Open requests not yet taken by a professional
+        db.Index('ix_service_request_unassigned', 'date_of_request',
+                 sqlite_where=db.text('professional_id IS NULL'),
+                 postgresql_where=db.text('professional_id IS NULL')),
+        # Newest requests of one status, one small index per status
+        *[db.Index(f'ix_service_request_{name}', 'date_of_request',
+                   sqlite_where=db.text(f'status = {code}'), postgresql_where=db.text(f'status = {code}'))
+          for name, code in STATUS_CODES.items()],
+        # Ids are never handed out again, so archived requests keep theirs to themselves (see archive.py)
+        {'sqlite_autoincrement': True},
+    )
+    # ORM flushes check and bump the version too, so they never overwrite a concurrent transition
+    __mapper_args__ = {'version_id_col': version}
     
 
     # Relationships
@@ -96,11 +127,11 @@ class ServiceRequest(db.Model):
     # Properties to fetch customer details
     @property
     def customer_name(self):
-        return self.customer_ref.user.username if self.customer_ref else None
+        return self.customer_ref.user_ref.username if self.customer_ref else None
 
     @property
     def customer_contact(self):
-        return self.customer_ref.user.phone_number if self.customer_ref else None
+        return self.customer_ref.user_ref.phone_number if self.customer_ref else None
 
     @property
     def customer_address(self):
@@ -113,7 +144,7 @@ class ServiceRequest(db.Model):
 # Review Model
 class Review(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    service_request_id = db.Column(db.Integer, db.ForeignKey('service_request.id'), nullable=False)
+    service_request_id = db.Column(db.Integer, db.ForeignKey('service_request.id'), nullable=False, index=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False)
     rating = db.Column(db.Integer, nullable=False)  # Rating out of 5
     remarks = db.Column(db.String(255), nullable=True)  # Customer's remarks, after service completion
@@ -157,14 +188,96 @@ class Review(db.Model):
 
 
 
+# Rating Summary Model (running review aggregates, maintained by ratings.py)
+class RatingSummary(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(20), nullable=False)  # 'professional' or 'service'
+    subject_id = db.Column(db.Integer, nullable=False)
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_total = db.Column(db.Integer, nullable=False, default=0)
+    # Histogram of ratings 1-5
+    rating_1 = db.Column(db.Integer, nullable=False, default=0)
+    rating_2 = db.Column(db.Integer, nullable=False, default=0)
+    rating_3 = db.Column(db.Integer, nullable=False, default=0)
+    rating_4 = db.Column(db.Integer, nullable=False, default=0)
+    rating_5 = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (db.UniqueConstraint('subject', 'subject_id'),)
+
+    @property
+    def average(self):
+        return round(self.rating_total / self.review_count, 2) if self.review_count else 0.0
+
+    @property
+    def histogram(self):
+        return [self.rating_1, self.rating_2, self.rating_3, self.rating_4, self.rating_5]
+
+
+# Daily Request Rollup Model (per day/service/status totals, maintained by rollups.py)
+class DailyRequestRollup(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)  # Day the requests were made
+    service_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(StatusCode, nullable=False)
+    request_count = db.Column(db.Integer, nullable=False, default=0)
+    completed_count = db.Column(db.Integer, nullable=False, default=0)  # Requests with a date_of_completion
+    completion_seconds = db.Column(db.Float, nullable=False, default=0.0)  # Total request-to-completion time
+    revenue = db.Column(db.Float, nullable=False, default=0.0)  # Total service price of the requests
+
+    __table_args__ = (db.UniqueConstraint('day', 'service_id', 'status'),)
+
+
+# Request Event Model (requests becoming open or taken, read by the professionals' live feed in feed.py)
+class RequestEvent(db.Model):
+    id = db.Column(db.Integer, primary_key=True)  # Also the feed's resume cursor
+    request_id = db.Column(db.Integer, nullable=False)  # No foreign key: events outlive deleted requests
+    kind = db.Column(db.String(10), nullable=False)  # 'new' or 'taken'
+    service_id = db.Column(db.Integer, nullable=False)
+    pin_prefix = db.Column(db.String(10), nullable=False)  # Area of the customer's pin code
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, index=True)
+
+    # A professional's feed reads one service and area, in id order
+    __table_args__ = (db.Index('ix_request_event_feed', 'service_id', 'pin_prefix', 'id'),)
+
+
+# Archived Service Request Model (closed requests moved out of ServiceRequest by archive.py)
+class ServiceRequestArchive(db.Model):
+    id = db.Column(db.Integer, primary_key=True)  # The id the request had
+    service_id = db.Column(db.Integer, nullable=False)
+    customer_id = db.Column(db.Integer, nullable=False)
+    professional_id = db.Column(db.Integer, nullable=True)
+    date_of_request = db.Column(db.DateTime, nullable=True)
+    date_of_completion = db.Column(db.DateTime, nullable=True)
+    status = db.Column(StatusCode, nullable=False)
+    description = db.Column(db.String(255), nullable=True)
+    version = db.Column(db.Integer, nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+    # The history reads of the dashboards and the export
+    __table_args__ = (
+        db.Index('ix_service_request_archive_customer', 'customer_id', 'date_of_request'),
+        db.Index('ix_service_request_archive_professional', 'professional_id', 'date_of_completion'),
+        db.Index('ix_service_request_archive_date', 'date_of_request'),
+    )
+
+
+# Archived Review Model (reviews of archived requests)
+class ReviewArchive(db.Model):
+    id = db.Column(db.Integer, primary_key=True)  # Not the review's old id, which SQLite may hand out again
+    service_request_id = db.Column(db.Integer, nullable=False, index=True)
+    customer_id = db.Column(db.Integer, nullable=False)
+    rating = db.Column(db.Integer, nullable=False)
+    remarks = db.Column(db.String(255), nullable=True)
+
+
 # Admin Initialization
-def create_admin():
+def create_admin(username='admin', email='admin@example.com', password='admin'):
     # Check if there's already an admin user
     admin_user = User.query.filter_by(role='admin').first()
     if not admin_user:
         # Create a new User object for the admin
-        hashed_password = generate_password_hash('admin')
-        admin_user = User(username='admin', password_hash=hashed_password, email='admin@example.com', role='admin')
+        hashed_password = hash_password(password)
+        admin_user = User(username=username, password_hash=hashed_password, email=email, role='admin')
         db.session.add(admin_user)
         db.session.commit()  # Commit to get the admin_user ID
 
@@ -178,9 +291,20 @@ def create_admin():
         print("Admin already exists.")
 
 
-try:
-    with app.app_context():
-        db.create_all()
-        create_admin()
-except Exception as e:
-    print(f"Error creating database or admin user: {e}")
+# Schema and admin setup are explicit steps, so starting a worker never touches the database
+@app.cli.command('init-db')
+def init_db_command():
+    """Create missing tables and the search index."""
+    import search  # search imports this module
+    db.create_all()
+    search.init_search_index()
+    print("Database initialized.")
+
+
+@app.cli.command('create-admin')
+@click.option('--username', default='admin')
+@click.option('--email', default='admin@example.com')
+@click.option('--password', default='admin', help='Change it after the first login.')
+def create_admin_command(username, email, password):
+    """Create the admin account if there is none."""
+    create_admin(username, email, password)
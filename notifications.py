@@ -0,0 +1,119 @@
+import smtplib
+from email.message import EmailMessage
+from sqlalchemy.orm import joinedload
+from app import app, db
+from models import User, Customer, ServiceProfessional, ServiceRequest, Review
+from jobs import job
+
+# ----------------------------------------------
+# Notifications (background jobs)
+# ----------------------------------------------
+# Routes queue these with enqueue(...) so they run in `flask jobs-worker`
+# after the request's transaction commits. deliver() hands each message to
+# the transport picked by NOTIFICATION_BACKEND:
+#   'log'  - writes it to the app log (the default, for development)
+#   'smtp' - emails it through SMTP_HOST, from MAIL_FROM
+# A transport error fails the job, which the worker retries with backoff;
+# recipients of that job reached before the error may get the message twice.
+
+
+class LogBackend:
+    def send(self, to, subject, body):
+        app.logger.info(f"Notification to {to}: {subject} - {body}")
+
+
+class SMTPBackend:
+    def __init__(self, host, port, username, password, use_tls, sender):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.sender = sender
+
+    def send(self, to, subject, body):
+        message = EmailMessage()
+        message['From'] = self.sender
+        message['To'] = to
+        message['Subject'] = subject
+        message.set_content(body)
+        # A connection per message: jobs are spread over worker threads, which must not share one
+        with smtplib.SMTP(self.host, self.port, timeout=30) as smtp:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            smtp.send_message(message)
+
+
+def create_backend():
+    if app.config.get('NOTIFICATION_BACKEND', 'log') == 'smtp':
+        return SMTPBackend(app.config['SMTP_HOST'], app.config.get('SMTP_PORT', 25),
+                           app.config.get('SMTP_USERNAME'), app.config.get('SMTP_PASSWORD'),
+                           app.config.get('SMTP_USE_TLS', False), app.config['MAIL_FROM'])
+    return LogBackend()
+
+
+transport = create_backend()
+
+
+def deliver(user, subject, body):
+    if user is None or not user.is_active:
+        return
+    transport.send(user.email, subject, body)
+
+
+def load_request(request_id):
+    return ServiceRequest.query.options(
+        joinedload(ServiceRequest.service_ref),
+        joinedload(ServiceRequest.customer_ref).joinedload(Customer.user_ref),
+        joinedload(ServiceRequest.service_professional_ref).joinedload(ServiceProfessional.user_ref)
+    ).get(request_id)
+
+
+@job('notify_request_accepted')
+def notify_request_accepted(request_id):
+    service_request = load_request(request_id)
+    if service_request is None:
+        return
+    professional = service_request.service_professional_ref
+    deliver(service_request.customer_ref.user_ref if service_request.customer_ref else None,
+            f'Request #{request_id} accepted',
+            f"{professional.name if professional else 'A professional'} will handle your "
+            f"{service_request.service_ref.name} request.")
+
+
+@job('notify_request_closed')
+def notify_request_closed(request_id):
+    service_request = load_request(request_id)
+    if service_request is None:
+        return
+    deliver(service_request.customer_ref.user_ref if service_request.customer_ref else None,
+            f'Request #{request_id} closed',
+            f'Your {service_request.service_ref.name} request is closed. Tell us how it went with a review.')
+    if service_request.service_professional_ref:
+        deliver(service_request.service_professional_ref.user_ref, f'Request #{request_id} closed',
+                'The request has been closed.')
+
+
+@job('notify_review_submitted')
+def notify_review_submitted(review_id):
+    review = db.session.get(Review, review_id)
+    if review is None or review.service_request_ref is None:
+        return
+    professional = review.service_request_ref.service_professional_ref
+    if professional:
+        deliver(professional.user_ref, f'New {review.rating}-star review',
+                f'Request #{review.service_request_id}: {review.remarks or "no remarks"}')
+
+
+@job('notify_registration')
+def notify_registration(user_id):
+    user = db.session.get(User, user_id)
+    if user is None:
+        return
+    deliver(user, 'Welcome', f'Your {user.role} account is ready.')
+    if user.role == 'professional':
+        # Professionals need an admin's approval before they are matched
+        for admin in User.query.filter_by(role='admin', is_active=True):
+            deliver(admin, 'Professional awaiting approval', f'{user.username} registered and needs approval.')
@@ -0,0 +1,124 @@
+from datetime import datetime
+from sqlalchemy import tuple_
+
+# Page size limits for list views
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+NULL_TOKEN = ''  # Cursor part of a NULL value; an empty datetime or int is never valid otherwise
+
+
+def get_per_page(value, default=DEFAULT_PER_PAGE):
+    # Parse a per_page query argument, falling back to the default when invalid
+    try:
+        per_page = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(per_page, MAX_PER_PAGE))
+
+
+def encode_cursor(values):
+    # Turn the ordering values of the last row into an opaque string for the URL
+    return '_'.join(NULL_TOKEN if v is None else v.isoformat() if isinstance(v, datetime) else str(v)
+                    for v in values)
+
+
+def decode_cursor(cursor, columns):
+    # Parse a cursor back into typed values; an invalid cursor means "first page"
+    if not cursor:
+        return None
+    parts = cursor.split('_')
+    if len(parts) != len(columns):
+        return None
+    values = []
+    try:
+        for part, column in zip(parts, columns):
+            if part == NULL_TOKEN:
+                values.append(None)
+            elif column.type.python_type is datetime:
+                values.append(datetime.fromisoformat(part))
+            else:
+                values.append(column.type.python_type(part))
+    except (ValueError, NotImplementedError):
+        return None
+    return values
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor, per_page):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.per_page = per_page
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def keyset_paginate(query, columns, cursor=None, per_page=DEFAULT_PER_PAGE, descending=False):
+    # Fetch one page ordered by the given columns, starting right after the cursor row.
+    # The last column must be unique (normally the primary key) so the order is total.
+    # The first column may hold NULLs (e.g. a date): those rows come after all others in
+    # either direction, ordered by the remaining columns. The other columns must not.
+    lead, rest = columns[0], columns[1:]
+    nullable = getattr(lead.expression, 'nullable', False)
+    order_by = [column.desc() for column in columns] if descending else list(columns)
+    if nullable:
+        order_by[0] = order_by[0].nulls_last()
+
+    def beyond(columns, values):
+        key = tuple_(*columns)
+        return key < tuple_(*values) if descending else key > tuple_(*values)
+
+    def fetch(query, limit):
+        return query.order_by(*order_by).limit(limit).all()
+
+    # Fetch one extra row to know whether there is a next page without a COUNT
+    after = decode_cursor(cursor, columns)
+    if after is None:
+        rows = fetch(query, per_page + 1)
+    elif after[0] is None:
+        # Already among the NULLs, which a comparison with the lead column would never match
+        rows = fetch(query.filter(lead.is_(None), *([beyond(rest, after[1:])] if rest else [])), per_page + 1)
+    else:
+        rows = fetch(query.filter(beyond(columns, after)), per_page + 1)
+        if nullable and len(rows) <= per_page:
+            # The values ran out within this page; the NULLs follow
+            rows += fetch(query.filter(lead.is_(None)), per_page + 1 - len(rows))
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in columns])
+
+    return KeysetPage(rows, next_cursor, per_page)
+
+
+def get_page(value):
+    # Parse a 1-based page number, falling back to the first page when invalid
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return 1
+
+
+class OffsetPage:
+    def __init__(self, items, page, per_page, has_next):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.has_next = has_next
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def offset_paginate(query, page=1, per_page=DEFAULT_PER_PAGE):
+    # Page through an already-ordered query, e.g. ranked search results that have no stable key
+    rows = query.limit(per_page + 1).offset((page - 1) * per_page).all()
+    return OffsetPage(rows[:per_page], page, per_page, len(rows) > per_page)
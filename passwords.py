@@ -0,0 +1,75 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+from app import app
+
+# ----------------------------------------------
+# Password hashing pool
+# ----------------------------------------------
+# Hashing and verification run in a bounded pool of worker processes, so a
+# burst of logins uses at most PASSWORD_HASH_WORKERS cores and never holds the
+# GIL of the web worker that serves every other route. With
+# PASSWORD_HASH_WORKERS = 0 hashing runs inline, as before.
+# A stored hash made with other parameters than PASSWORD_HASH_METHOD is
+# replaced with a fresh hash the next time its owner logs in.
+
+# Werkzeug 3's default; the method string must include every parameter
+# because it is compared with the prefix of stored hashes
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+
+pool = None
+pool_pid = None
+pool_lock = threading.Lock()
+
+
+def get_pool():
+    global pool, pool_pid
+    size = app.config.get('PASSWORD_HASH_WORKERS', 0)
+    if not size:
+        return None
+    with pool_lock:
+        # A forked web worker must not reuse its parent's pool
+        if pool is None or pool_pid != os.getpid():
+            pool = ProcessPoolExecutor(max_workers=size)
+            pool_pid = os.getpid()
+    return pool
+
+
+def run(function, *args):
+    executor = get_pool()
+    if executor is None:
+        return function(*args)
+    return executor.submit(function, *args).result(timeout=app.config.get('PASSWORD_HASH_TIMEOUT', 30))
+
+
+def hash_password(password):
+    return run(generate_password_hash, password, app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD))
+
+
+def hash_passwords(passwords):
+    # Hash many passwords, spread over the whole pool; hashes come back in order
+    method = app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+    executor = get_pool()
+    if executor is None or len(passwords) < 2:
+        return [generate_password_hash(password, method) for password in passwords]
+    size = app.config.get('PASSWORD_HASH_WORKERS', 0)
+    timeout = app.config.get('PASSWORD_HASH_TIMEOUT', 30) * (len(passwords) // size + 1)
+    return list(executor.map(generate_password_hash, passwords, [method] * len(passwords),
+                             timeout=timeout, chunksize=max(1, len(passwords) // (size * 4))))
+
+
+def needs_rehash(password_hash):
+    # Werkzeug hashes look like "method:params$salt$hash"
+    return password_hash.split('$', 1)[0] != app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+
+
+def verify_password(user, password):
+    # Check a user's password; upgrades user.password_hash (uncommitted) when the cost parameters changed
+    if not user.password_hash or not password:
+        return False
+    if not run(check_password_hash, user.password_hash, password):
+        return False
+    if needs_rehash(user.password_hash):
+        user.password_hash = hash_password(password)
+    return True
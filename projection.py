@@ -0,0 +1,37 @@
+import orjson
+from flask import Response
+
+# ----------------------------------------------
+# Field selection and JSON encoding for API listings
+# ----------------------------------------------
+# A listing declares the fields it can return, each a labelled column
+# expression plus the joins it needs. ?fields=a,b picks some of them; the
+# query then selects only those columns (and joins only what they need) and
+# the rows are encoded straight from the result tuples with orjson, without
+# loading ORM objects.
+
+
+def parse_fields(value, available, default):
+    # Requested field names, in request order; raises ValueError naming any unknown field
+    if not value:
+        return list(default)
+    fields = []
+    for name in value.split(','):
+        name = name.strip()
+        if name and name not in fields:
+            fields.append(name)
+    unknown = [name for name in fields if name not in available]
+    if unknown or not fields:
+        raise ValueError(f"Unknown field(s) {', '.join(unknown) or '(none)'}; "
+                         f"choose from {', '.join(available)}")
+    return fields
+
+
+def rows_as_dicts(rows, fields):
+    # The requested fields come first in each row; trailing columns (e.g. a pagination key) are dropped
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def json_response(payload, status=200):
+    # orjson writes datetimes as ISO 8601 and returns bytes, skipping Flask-RESTful's encoder
+    return Response(orjson.dumps(payload), status=status, mimetype='application/json')
@@ -0,0 +1,155 @@
+from collections import defaultdict
+from sqlalchemy import event, inspect, select, update, insert, delete, func, case, cast, literal, Float
+from app import app, db
+from models import Review, ServiceRequest, ServiceProfessional, RatingSummary
+from matching import note_rating_changes
+from archive import history
+
+# ----------------------------------------------
+# Incrementally maintained review aggregates
+# ----------------------------------------------
+# Every review insert, update and delete adjusts the RatingSummary rows of its
+# professional and its service (count, total and 1-5 histogram) with atomic
+# "column = column + delta" UPDATEs in the same transaction, and refreshes
+# ServiceProfessional.rating from the summary. Nothing aggregates reviews at
+# read time; `flask recompute-ratings` rebuilds everything in one pass.
+
+HISTOGRAM_COLUMNS = ['rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5']
+
+
+def valid_rating(rating):
+    try:
+        rating = int(rating)
+    except (TypeError, ValueError):
+        return None
+    return rating if 1 <= rating <= 5 else None
+
+
+def professional_average():
+    # Average rating of the professional in the enclosing UPDATE, 0.0 without reviews
+    return func.coalesce(
+        select(case(
+            (RatingSummary.review_count > 0, cast(RatingSummary.rating_total, Float) / RatingSummary.review_count),
+            else_=0.0
+        )).where(
+            RatingSummary.subject == 'professional',
+            RatingSummary.subject_id == ServiceProfessional.id
+        ).scalar_subquery(),
+        0.0
+    )
+
+
+def record_reviews(session, added=(), removed=()):
+    # added/removed are (service_request_id, rating) pairs
+    added = [(request_id, valid_rating(rating)) for request_id, rating in added]
+    removed = [(request_id, valid_rating(rating)) for request_id, rating in removed]
+    request_ids = {request_id for request_id, rating in added + removed if request_id and rating}
+    if not request_ids:
+        return
+
+    connection = session.connection()
+    owners = {row.id: row for row in connection.execute(
+        select(ServiceRequest.id, ServiceRequest.professional_id, ServiceRequest.service_id)
+        .where(ServiceRequest.id.in_(request_ids))
+    )}
+
+    # (subject, subject_id) -> [count, total, rating_1 .. rating_5]
+    deltas = defaultdict(lambda: [0] * 7)
+    for sign, reviews in ((1, added), (-1, removed)):
+        for request_id, rating in reviews:
+            owner = owners.get(request_id)
+            if owner is None or rating is None:
+                continue
+            subjects = [('service', owner.service_id)]
+            if owner.professional_id:
+                subjects.append(('professional', owner.professional_id))
+            for subject in subjects:
+                delta = deltas[subject]
+                delta[0] += sign
+                delta[1] += sign * rating
+                delta[1 + rating] += sign
+
+    for (subject, subject_id), delta in deltas.items():
+        if not any(delta):
+            continue
+        values = {'review_count': RatingSummary.review_count + delta[0],
+                  'rating_total': RatingSummary.rating_total + delta[1]}
+        for column, change in zip(HISTOGRAM_COLUMNS, delta[2:]):
+            if change:
+                values[column] = getattr(RatingSummary, column) + change
+        result = connection.execute(update(RatingSummary).where(
+            RatingSummary.subject == subject, RatingSummary.subject_id == subject_id
+        ).values(values))
+        if result.rowcount == 0:
+            connection.execute(insert(RatingSummary).values(
+                subject=subject, subject_id=subject_id, review_count=delta[0], rating_total=delta[1],
+                **dict(zip(HISTOGRAM_COLUMNS, delta[2:]))
+            ))
+
+    professional_ids = [subject_id for subject, subject_id in deltas if subject == 'professional']
+    if professional_ids:
+        connection.execute(update(ServiceProfessional).where(
+            ServiceProfessional.id.in_(professional_ids)
+        ).values(rating=professional_average()))
+        ratings = dict(connection.execute(
+            select(ServiceProfessional.id, ServiceProfessional.rating)
+            .where(ServiceProfessional.id.in_(professional_ids))
+        ).all())
+        note_rating_changes(session, ratings)
+
+
+def previous_value(obj, name):
+    # Value of an attribute before the pending change, if any
+    history = inspect(obj).attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    return history.unchanged[0] if history.unchanged else getattr(obj, name)
+
+
+def track_review_changes(session, flush_context):
+    added = []
+    removed = []
+    for obj in session.new:
+        if isinstance(obj, Review):
+            added.append((obj.service_request_id, obj.rating))
+    for obj in session.dirty:
+        if isinstance(obj, Review):
+            attrs = inspect(obj).attrs
+            if attrs.rating.history.has_changes() or attrs.service_request_id.history.has_changes():
+                removed.append((previous_value(obj, 'service_request_id'), previous_value(obj, 'rating')))
+                added.append((obj.service_request_id, obj.rating))
+    for obj in session.deleted:
+        if isinstance(obj, Review):
+            removed.append((previous_value(obj, 'service_request_id'), previous_value(obj, 'rating')))
+    if added or removed:
+        record_reviews(session, added, removed)
+
+
+event.listen(db.session, 'after_flush', track_review_changes)
+
+
+def recompute_ratings():
+    # Rebuild every summary and professional rating with one GROUP BY per subject
+    connection = db.session.connection()
+    connection.execute(delete(RatingSummary))
+    # Reviews of archived requests still count
+    reviews = history(lambda requests, reviews: select(
+        reviews.rating, requests.professional_id, requests.service_id
+    ).select_from(reviews).join(requests, requests.id == reviews.service_request_id)).subquery()
+    for subject, key in (('professional', reviews.c.professional_id), ('service', reviews.c.service_id)):
+        histogram = [func.sum(case((reviews.c.rating == n, 1), else_=0)) for n in range(1, 6)]
+        aggregates = select(
+            literal(subject), key, func.count(), func.sum(reviews.c.rating), *histogram
+        ).where(key.isnot(None), reviews.c.rating.between(1, 5)).group_by(key)
+        connection.execute(insert(RatingSummary).from_select(
+            ['subject', 'subject_id', 'review_count', 'rating_total'] + HISTOGRAM_COLUMNS, aggregates
+        ))
+    connection.execute(update(ServiceProfessional).values(rating=professional_average()))
+    db.session.commit()
+
+
+@app.cli.command('recompute-ratings')
+def recompute_ratings_command():
+    """Rebuild review aggregates and professional ratings from all reviews, archived ones included."""
+    recompute_ratings()
+    print("Ratings recomputed.")
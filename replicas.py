@@ -0,0 +1,81 @@
+import random
+import time
+from contextlib import contextmanager
+from flask import current_app, has_request_context, request, session as http_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql import Select
+
+# ----------------------------------------------
+# Read replica routing
+# ----------------------------------------------
+# Each URI in SQLALCHEMY_REPLICA_URIS becomes a bind named replica0,
+# replica1, ... SELECTs issued while serving a GET/HEAD/OPTIONS request are
+# sent to one replica, picked per request. Everything else goes to the
+# primary (SQLALCHEMY_DATABASE_URI): flushes, INSERT/UPDATE/DELETE,
+# SELECT ... FOR UPDATE, raw connections, work outside a request (CLI, job
+# worker) and every statement of a session after it wrote.
+#
+# A request whose session commits a write also stamps the browser session,
+# so that visitor's requests read from the primary for REPLICA_STICKY_SECONDS
+# and see their own writes however far the replicas lag. Data that outlives
+# the request (e.g. a cache filled right after an invalidating write) is read
+# inside primary_reads().
+#
+# This module is imported by app.py before `db` exists, so it only relies on
+# Flask's context locals, never on `app` or `db`.
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+STICKY_KEY = 'read_primary_until'
+
+
+def replica_binds(config):
+    return {f'replica{i}': uri for i, uri in enumerate(config.get('SQLALCHEMY_REPLICA_URIS') or [])}
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            replica = self.replica_for(clause)
+            if replica is not None:
+                return replica
+            if self._flushing or getattr(clause, 'is_dml', False):
+                self.info['wrote'] = True  # From now on this session reads its own writes from the primary
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def replica_for(self, clause):
+        # The replica engine `clause` can be read from, or None for the primary
+        if not isinstance(clause, Select) or clause._for_update_arg is not None:
+            return None
+        if self._flushing or self.info.get('wrote') or self.info.get('primary_reads') or not has_request_context():
+            return None
+        if 'replica' not in self.info:
+            names = list(replica_binds(current_app.config))
+            self.info['replica'] = random.choice(names) if names else None
+        if self.info['replica'] is None or request.method not in READ_METHODS:
+            return None
+        # Checked last: reading the browser session adds "Vary: Cookie" to the response
+        if http_session.get(STICKY_KEY, 0) > time.time():
+            return None
+        return self._db.engines[self.info['replica']]
+
+
+@contextmanager
+def primary_reads(session):
+    # Read from the primary inside this block; `session` is a Session, e.g. db.session()
+    session.info['primary_reads'] = session.info.get('primary_reads', 0) + 1
+    try:
+        yield
+    finally:
+        session.info['primary_reads'] -= 1
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def stick_to_primary(session):
+    if session.info.pop('wrote', False) and has_request_context() and current_app.config.get('SQLALCHEMY_REPLICA_URIS'):
+        http_session[STICKY_KEY] = time.time() + current_app.config.get('REPLICA_STICKY_SECONDS', 5)
+
+
+@event.listens_for(RoutingSession, 'after_soft_rollback')
+def forget_write(session, previous_transaction):
+    session.info.pop('wrote', None)
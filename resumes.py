@@ -0,0 +1,147 @@
+import hashlib
+import os
+import tempfile
+import time
+from flask import request, send_file, send_from_directory, abort
+from werkzeug.utils import secure_filename
+from app import app, db
+from models import ServiceProfessional
+
+# ----------------------------------------------
+# Content-addressed resume storage
+# ----------------------------------------------
+# Uploads are copied in CHUNK_SIZE pieces to a temporary file while being
+# hashed, then renamed to RESUME_STORAGE_PATH/<sha256[:2]>/<sha256>, so equal
+# files are stored once and uploads with the same name never overwrite each
+# other. The request body is capped at RESUME_MAX_BYTES before the form is
+# parsed. Files are served by send_file with the hash as ETag, Range support
+# and, with USE_X_SENDFILE, by the front-end server.
+
+CHUNK_SIZE = 64 * 1024
+FORM_OVERHEAD = 64 * 1024  # Room for the other form fields and multipart headers
+GC_GRACE_SECONDS = 3600  # Files younger than this may belong to an upload that has not committed yet
+
+# Leading bytes of the accepted document types
+SIGNATURES = [
+    (b'%PDF-', 'application/pdf'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/msword'),
+    (b'PK\x03\x04', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+]
+
+
+def storage_root():
+    return app.config.get('RESUME_STORAGE_PATH') or os.path.join(app.instance_path, 'resumes')
+
+
+def resume_path(sha256):
+    return os.path.join(storage_root(), sha256[:2], sha256)
+
+
+def sniff_mime(head):
+    for signature, mime in SIGNATURES:
+        if head.startswith(signature):
+            return mime
+    return None
+
+
+def limit_resume_upload():
+    # Call before touching request.form/files, which read the whole body. Checked against
+    # Content-Length up front: Request.max_content_length cannot be set before Flask 3.1
+    if request.content_length is None:
+        abort(411)
+    if request.content_length > app.config['RESUME_MAX_BYTES'] + FORM_OVERHEAD:
+        abort(413)
+
+
+def store_resume(upload):
+    # Store an uploaded FileStorage; returns its sha256, size and mime type or raises ValueError
+    max_bytes = app.config['RESUME_MAX_BYTES']
+    tmp_dir = os.path.join(storage_root(), 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    mime = None
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            while True:
+                chunk = upload.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if size == 0:
+                    mime = sniff_mime(chunk)
+                    if mime not in app.config['RESUME_MIME_TYPES']:
+                        raise ValueError('Resume must be a PDF or Word document')
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError(f'Resume must be at most {max_bytes // (1024 * 1024)} MB')
+                digest.update(chunk)
+                tmp.write(chunk)
+        if size == 0:
+            raise ValueError('Resume is empty')
+
+        sha256 = digest.hexdigest()
+        path = resume_path(sha256)
+        if os.path.exists(path):
+            os.remove(tmp_path)  # Same content is already stored
+            os.utime(path)  # Keep it out of collect_garbage's reach until the upload commits
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return {'sha256': sha256, 'size': size, 'mime': mime}
+
+
+def attach_resume(professional, upload, stored):
+    professional.resume_filename = secure_filename(upload.filename or '') or 'resume'  # Used as the download name
+    professional.resume_sha256 = stored['sha256']
+    professional.resume_size = stored['size']
+    professional.resume_mime = stored['mime']
+
+
+def send_resume(professional):
+    if professional.resume_sha256:
+        path = resume_path(professional.resume_sha256)
+        if not os.path.exists(path):
+            abort(404)
+        # The path is content-addressed, so the hash is a strong ETag
+        response = send_file(path, mimetype=professional.resume_mime, conditional=True,
+                             etag=professional.resume_sha256, download_name=professional.resume_filename)
+        response.cache_control.private = True
+        return response
+    if professional.resume_filename:
+        # Uploaded before content-addressed storage
+        return send_from_directory(os.path.join(app.root_path, app.config['UPLOAD_FOLDER']),
+                                   professional.resume_filename, conditional=True)
+    abort(404)
+
+
+def collect_garbage():
+    # Delete stored files no professional refers to; returns how many were removed
+    referenced = {sha256 for (sha256,) in db.session.query(ServiceProfessional.resume_sha256)
+                  .filter(ServiceProfessional.resume_sha256.isnot(None)).distinct()}
+    removed = 0
+    cutoff = time.time() - GC_GRACE_SECONDS
+    root = storage_root()
+    if not os.path.isdir(root):
+        return removed
+    for prefix in os.listdir(root):
+        directory = os.path.join(root, prefix)
+        if prefix == 'tmp' or not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name not in referenced and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+@app.cli.command('resumes-gc')
+def resumes_gc_command():
+    """Delete stored resumes that no professional refers to."""
+    print(f"Removed {collect_garbage()} unreferenced resume(s).")
@@ -0,0 +1,215 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import event, inspect, select, update, insert, delete, func, case, cast, literal, Date
+from app import app, db
+from models import Service, ServiceRequest, DailyRequestRollup
+from ratings import previous_value
+from catalog import get_services
+from archive import history
+
+# ----------------------------------------------
+# Daily request rollups for the admin summary
+# ----------------------------------------------
+# One DailyRequestRollup row per (day requested, service, status) holds the
+# request count, completed count, total completion time and total service
+# price of the requests in it. Each ServiceRequest insert, status/service/date
+# change and delete moves its contribution between rows with atomic UPDATEs in
+# the same transaction, so the summary reads a few hundred rows no matter how
+# long the history is. `flask rebuild-rollups` rebuilds the table with GROUP BY.
+
+TRACKED_ATTRIBUTES = ('service_id', 'status', 'date_of_request', 'date_of_completion')
+REVENUE_STATUSES = {'completed', 'closed'}  # Statuses whose price counts as revenue
+DEFAULT_SUMMARY_DAYS = 30
+
+
+def contribution(values, prices):
+    # (row key, [requests, completed, completion seconds, revenue]) of one request
+    date_of_request = values['date_of_request']
+    if date_of_request is None or values['service_id'] is None:
+        return None, None
+    date_of_completion = values['date_of_completion']
+    completed = date_of_completion is not None
+    seconds = (date_of_completion - date_of_request).total_seconds() if completed else 0.0
+    key = (date_of_request.date(), values['service_id'], values['status'])
+    return key, [1, int(completed), seconds, prices.get(values['service_id']) or 0.0]
+
+
+def apply_request_changes(session, added, removed):
+    # added/removed are dicts of TRACKED_ATTRIBUTES values
+    if not added and not removed:
+        return
+    connection = session.connection()
+    service_ids = {values['service_id'] for values in added + removed if values['service_id']}
+    prices = dict(connection.execute(
+        select(Service.id, Service.price).where(Service.id.in_(service_ids))
+    ).all()) if service_ids else {}
+
+    deltas = defaultdict(lambda: [0, 0, 0.0, 0.0])
+    for sign, requests in ((1, added), (-1, removed)):
+        for values in requests:
+            key, amounts = contribution(values, prices)
+            if key is None:
+                continue
+            delta = deltas[key]
+            for i, amount in enumerate(amounts):
+                delta[i] += sign * amount
+
+    for (day, service_id, status), delta in deltas.items():
+        if not any(delta):
+            continue
+        result = connection.execute(update(DailyRequestRollup).where(
+            DailyRequestRollup.day == day,
+            DailyRequestRollup.service_id == service_id,
+            DailyRequestRollup.status == status
+        ).values(
+            request_count=DailyRequestRollup.request_count + delta[0],
+            completed_count=DailyRequestRollup.completed_count + delta[1],
+            completion_seconds=DailyRequestRollup.completion_seconds + delta[2],
+            revenue=DailyRequestRollup.revenue + delta[3]
+        ))
+        if result.rowcount == 0:
+            connection.execute(insert(DailyRequestRollup).values(
+                day=day, service_id=service_id, status=status, request_count=delta[0],
+                completed_count=delta[1], completion_seconds=delta[2], revenue=delta[3]
+            ))
+
+
+def rollup_new_requests(session, ids):
+    # Add requests written without an ORM flush, e.g. bulk inserts
+    if not ids:
+        return
+    rows = session.connection().execute(
+        select(ServiceRequest.service_id, ServiceRequest.status, ServiceRequest.date_of_request,
+               ServiceRequest.date_of_completion).where(ServiceRequest.id.in_(ids))
+    )
+    apply_request_changes(session, [dict(row._mapping) for row in rows], [])
+
+
+def track_request_changes(session, flush_context):
+    added = []
+    removed = []
+    for obj in session.new:
+        if isinstance(obj, ServiceRequest):
+            added.append({name: getattr(obj, name) for name in TRACKED_ATTRIBUTES})
+    for obj in session.dirty:
+        if isinstance(obj, ServiceRequest):
+            attrs = inspect(obj).attrs
+            if any(attrs[name].history.has_changes() for name in TRACKED_ATTRIBUTES):
+                removed.append({name: previous_value(obj, name) for name in TRACKED_ATTRIBUTES})
+                added.append({name: getattr(obj, name) for name in TRACKED_ATTRIBUTES})
+    for obj in session.deleted:
+        if isinstance(obj, ServiceRequest):
+            removed.append({name: previous_value(obj, name) for name in TRACKED_ATTRIBUTES})
+    apply_request_changes(session, added, removed)
+
+
+event.listen(db.session, 'after_flush', track_request_changes)
+
+
+# ----------------------------------------------
+# Rebuild from history
+# ----------------------------------------------
+
+def day_of(column):
+    # DATE() stores the same YYYY-MM-DD text SQLAlchemy writes for Date columns on SQLite
+    if db.engine.dialect.name == 'sqlite':
+        return func.date(column)
+    return cast(column, Date)
+
+
+def seconds_between(start, end):
+    if db.engine.dialect.name == 'sqlite':
+        return (func.julianday(end) - func.julianday(start)) * 86400.0
+    return func.extract('epoch', end - start)
+
+
+def rebuild_rollups():
+    connection = db.session.connection()
+    connection.execute(delete(DailyRequestRollup))
+    # Archived requests are part of the history too
+    requests = history(lambda requests, reviews: select(
+        requests.id, requests.service_id, requests.status, requests.date_of_request, requests.date_of_completion
+    )).subquery()
+    day = day_of(requests.c.date_of_request)
+    completed = requests.c.date_of_completion.isnot(None)
+    aggregates = select(
+        day,
+        requests.c.service_id,
+        requests.c.status,
+        func.count(requests.c.id),
+        func.sum(case((completed, 1), else_=0)),
+        func.sum(case((completed, seconds_between(requests.c.date_of_request, requests.c.date_of_completion)),
+                      else_=literal(0.0))),
+        func.sum(func.coalesce(Service.price, 0.0))
+    ).select_from(requests).outerjoin(
+        Service, Service.id == requests.c.service_id
+    ).where(requests.c.date_of_request.isnot(None)).group_by(
+        day, requests.c.service_id, requests.c.status
+    )
+    connection.execute(insert(DailyRequestRollup).from_select(
+        ['day', 'service_id', 'status', 'request_count', 'completed_count', 'completion_seconds', 'revenue'],
+        aggregates
+    ))
+    db.session.commit()
+
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Rebuild the daily request rollups from the service requests, archived ones included."""
+    rebuild_rollups()
+    print("Rollups rebuilt.")
+
+
+# ----------------------------------------------
+# Summary
+# ----------------------------------------------
+
+def build_summary(date_from=None, date_to=None):
+    date_to = date_to or datetime.utcnow().date()  # date_of_request is stored in UTC
+    date_from = date_from or date_to - timedelta(days=DEFAULT_SUMMARY_DAYS - 1)
+    in_range = (DailyRequestRollup.day >= date_from, DailyRequestRollup.day <= date_to)
+
+    rows = db.session.query(
+        DailyRequestRollup.service_id,
+        DailyRequestRollup.status,
+        func.sum(DailyRequestRollup.request_count),
+        func.sum(DailyRequestRollup.completed_count),
+        func.sum(DailyRequestRollup.completion_seconds),
+        func.sum(DailyRequestRollup.revenue)
+    ).filter(*in_range).group_by(DailyRequestRollup.service_id, DailyRequestRollup.status).all()
+
+    daily = db.session.query(
+        DailyRequestRollup.day, func.sum(DailyRequestRollup.request_count)
+    ).filter(*in_range).group_by(DailyRequestRollup.day).order_by(DailyRequestRollup.day).all()
+
+    names = {service['id']: service['name'] for service in get_services()}
+    services = {}
+    for service_id, status, requests, completed, seconds, revenue in rows:
+        if not requests:
+            continue
+        service = services.setdefault(service_id, {
+            'service_id': service_id,
+            'service_name': names.get(service_id, f'Service #{service_id}'),
+            'requests': 0, 'by_status': {}, 'completed': 0, 'completion_seconds': 0.0, 'revenue': 0.0
+        })
+        service['requests'] += requests
+        service['by_status'][status] = service['by_status'].get(status, 0) + requests
+        service['completed'] += completed or 0
+        service['completion_seconds'] += seconds or 0.0
+        if status in REVENUE_STATUSES:
+            service['revenue'] += revenue or 0.0
+
+    for service in services.values():
+        seconds = service.pop('completion_seconds')
+        service['average_completion_hours'] = round(seconds / service['completed'] / 3600, 2) if service['completed'] else None
+        service['revenue'] = round(service['revenue'], 2)
+
+    services = sorted(services.values(), key=lambda service: service['service_name'])
+    return {
+        'from': date_from.isoformat(),
+        'to': date_to.isoformat(),
+        'services': services,
+        'daily': [{'day': str(day), 'requests': requests} for day, requests in daily],
+        'total_requests': sum(service['requests'] for service in services),
+        'total_revenue': round(sum(service['revenue'] for service in services), 2)
+    }
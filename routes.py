@@ -1,14 +1,30 @@
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, render_template, request, redirect, url_for, flash, session, Response, stream_with_context, abort
 from app import app
-from models import db, User, Service, ServiceRequest, ServiceProfessional, Customer, Review
-from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
+from models import db, User, Service, ServiceRequest, ServiceProfessional, Customer, Review, RatingSummary, DailyRequestRollup
+from passwords import hash_password, verify_password
 from functools import wraps
-from datetime import datetime
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload
+from pagination import get_page, get_per_page, keyset_paginate, offset_paginate
+from search import search_query
+from matching import find_candidates
+from catalog import get_services, get_service_id
+from fragments import cached, cached_fragment
+from replicas import primary_reads
+from feed import area_of, current_cursor, open_requests
+from transitions import transition_request
+from statuses import parse_status
+from archive import history
+from conditional import conditional_response, rating_versions
+from export import EXPORT_FORMATS, export_statements, stream_rows, generate_csv, generate_ndjson, parse_date
+from rollups import build_summary
+from resumes import limit_resume_upload, store_resume, attach_resume, send_resume
+from jobs import enqueue
+from notifications import notify_request_accepted, notify_request_closed, notify_review_submitted, notify_registration
 
 # Set your upload folder path in the configuration
-app.config['UPLOAD_FOLDER'] = os.path.join('static', 'resumes')  # Example directory for uploads
+app.config['UPLOAD_FOLDER'] = os.path.join('static', 'resumes')  # Resumes uploaded before resumes.py; new ones go to RESUME_STORAGE_PATH
 
 # ----------------------------------------------
 # Authentication Endpoints (4)
@@ -51,7 +67,7 @@ def register_customer():
             return redirect(url_for('register_customer'))  # Redirect to the registration page with a message
 
         # Hash the password
-        hashed_password = generate_password_hash(password)
+        hashed_password = hash_password(password)
 
         # Create new user
         new_user = User(username=username, password_hash=hashed_password, email=email, phone_number=phone_number, role='customer')
@@ -61,6 +77,7 @@ def register_customer():
         # Now create the customer, linking the user via the user_id foreign key
         new_customer = Customer(user_id=new_user.id, address=address, pin_code=pin_code)
         db.session.add(new_customer)
+        enqueue(notify_registration, user_id=new_user.id)  # Sent by the job worker once this commits
         db.session.commit()  # Commit the customer record
 
         flash('Customer registration successful')
@@ -72,6 +89,8 @@ def register_customer():
 @app.route('/register/professional', methods=["GET", "POST"])
 def register_professional():
     if request.method == "POST":
+        limit_resume_upload()  # Before the form is parsed
+
         # Fetch form data
         username = request.form.get('username')
         password = request.form.get('password')
@@ -84,23 +103,19 @@ def register_professional():
         pin_code = request.form.get('pin_code')
         description = request.form.get('description')
 
-        # Handling file uploads for resume
-        document = request.files.get('document')  # Get the document from the form
-        document_filename = None
-
-        # Check if a document was uploaded
-        if document:
-            # Secure the filename and save the document
-            filename = secure_filename(document.filename)
-            document_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            document.save(document_path)  # Save the document
-
-            document_filename = filename  # Store the filename to save in the database later
+        # Resume upload (the form field is named "documents")
+        document = request.files.get('documents')
 
         # Validate required fields
         if not username or not password or not confirm_password or not email or not phone_number or not service_type or not experience:
             flash('Please fill out all required fields')
             return redirect(url_for('register_professional'))
+
+        # Experience is a number of years, as in the CSV import
+        experience = parse_experience(experience)
+        if experience is None:
+            flash('Experience must be a number of years')
+            return redirect(url_for('register_professional'))
         
         # Check password match
         if password != confirm_password:
@@ -118,17 +133,26 @@ def register_professional():
             flash('Phone number is already registered!', 'danger')
             return redirect(url_for('register_professional'))  # Redirect to the registration page with a message
 
+        # Store the resume before creating any rows, so a rejected file leaves nothing behind
+        stored_resume = None
+        if document and document.filename:
+            try:
+                stored_resume = store_resume(document)
+            except ValueError as e:
+                flash(str(e))
+                return redirect(url_for('register_professional'))
+
         # Hash the password
-        hashed_password = generate_password_hash(password)
+        hashed_password = hash_password(password)
 
         # Create new user with phone number
         new_user = User(username=username, password_hash=hashed_password, email=email, phone_number=phone_number, role='professional')
         db.session.add(new_user)
         db.session.commit()  # Commit to generate the user ID
 
-        # Check if the service_type exists in the Service model
-        service = Service.query.filter_by(name=service_type).first()
-        if not service:
+        # Check if the service_type exists in the service catalog
+        service_id = get_service_id(service_type)
+        if not service_id:
             flash(f"Service '{service_type}' not found. Please select a valid service.")
             return redirect(url_for('register_professional'))
         
@@ -140,16 +164,18 @@ def register_professional():
             address=address, 
             pin_code=pin_code,
             description=description,
-            resume_filename=document_filename,  # Save the resume file path
-            service_id=service.id  # Set the service_id to the matching service's id
+            service_id=service_id  # Set the service_id to the matching service's id
         )
+        if stored_resume:
+            attach_resume(new_professional, document, stored_resume)
         db.session.add(new_professional)
+        enqueue(notify_registration, user_id=new_user.id)  # Sent by the job worker once this commits
         db.session.commit()  # Commit the service professional record
 
         flash('Service Professional registration successful')
         return redirect(url_for('login'))
 
-    return render_template('professional/register_professional.html')
+    return render_template('professional/register_professional.html', services=get_services())
 
 
 
@@ -160,9 +186,11 @@ def login():
         password = request.form.get('password')
 
         user = User.query.filter_by(email=email).first()
-        if not user or not check_password_hash(user.password_hash, password):
+        if not user or not verify_password(user, password):
             flash('Invalid username or password')
             return redirect(url_for('login'))
+        if db.session.is_modified(user):
+            db.session.commit()  # Save a hash upgraded to the current parameters
 
         session['user_id'] = user.id
         session['role'] = user.role
@@ -194,13 +222,80 @@ def admin_dashboard():
         flash('Unauthorized access. You must be logged in as an admin to view this page.', 'danger')
         return redirect(url_for('login'))
 
-    # Fetch data related to users and services
-    users = User.query.all()
-    services = Service.query.all()
-    professionals = ServiceProfessional.query.all()
-    service_requests = ServiceRequest.query.all()
+    # Each section is paginated independently with its own keyset cursor.
+    # Tables are cached fragments (see fragments.py): a repeat view of an
+    # unchanged page neither queries nor renders it again.
+    per_page = get_per_page(request.args.get('per_page'))
+    active_tab = request.args.get('tab', 'services')
+    try:
+        request_status = parse_status(request.args['request_status']) if request.args.get('request_status') else None
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('admin_dashboard', tab='requests'))
+    services_after = request.args.get('services_after')
+    professionals_after = request.args.get('professionals_after')
+    requests_after = request.args.get('requests_after')
+    # Every section's paging links keep the state of the others, so each table depends on all of it
+    page_args = {'per_page': per_page, 'request_status': request_status, 'services_after': services_after,
+                 'professionals_after': professionals_after, 'requests_after': requests_after}
+    page_params = list(page_args.values())
+
+    def render_services_table():
+        services = keyset_paginate(Service.query, [Service.id], cursor=services_after, per_page=per_page)
+        return render_template('admin/_services_table.html', services=services, page_args=page_args)
+
+    def render_professionals_table():
+        # The table shows the user name and service name of each professional
+        professionals = keyset_paginate(
+            ServiceProfessional.query.options(
+                joinedload(ServiceProfessional.user_ref),
+                joinedload(ServiceProfessional.service_ref)
+            ),
+            [ServiceProfessional.id],
+            cursor=professionals_after, per_page=per_page
+        )
+        return render_template('admin/_professionals_table.html', professionals=professionals, page_args=page_args)
+
+    def render_requests_table():
+        # Newest requests first, optionally filtered by status
+        requests_query = ServiceRequest.query.options(
+            joinedload(ServiceRequest.service_professional_ref).joinedload(ServiceProfessional.user_ref)
+        )
+        if request_status:
+            requests_query = requests_query.filter(ServiceRequest.status == request_status)
+        service_requests = keyset_paginate(
+            requests_query, [ServiceRequest.date_of_request, ServiceRequest.id],
+            cursor=requests_after, per_page=per_page, descending=True
+        )
+        return render_template('admin/_requests_table.html', service_requests=service_requests, page_args=page_args)
+
+    # Status counts add up the daily rollups (rows per day, service and status, not per request),
+    # so they count every dated request ever made, archived ones included
+    def count_statuses():
+        return dict(
+            db.session.query(DailyRequestRollup.status, func.sum(DailyRequestRollup.request_count))
+            .group_by(DailyRequestRollup.status)
+            .all()
+        )
 
-    return render_template('admin/dashboard.html', users=users, services=services, professionals=professionals, service_requests=service_requests)
+    # The rollups are written with each request, so a request write also outdates the counts
+    status_counts = cached('admin_status_counts', ['service_request', 'daily_request_rollup'], [], count_statuses)
+
+    return render_template('admin/dashboard.html',
+                           services_table=cached_fragment(
+                               'admin_services', ['service'], page_params, render_services_table),
+                           professionals_table=cached_fragment(
+                               'admin_professionals', ['service_professional', 'user', 'service'],
+                               page_params, render_professionals_table),
+                           requests_table=cached_fragment(
+                               'admin_requests', ['service_request', 'service_professional', 'user'],
+                               page_params, render_requests_table),
+                           status_counts=status_counts,
+                           total_requests=sum(status_counts.values()),
+                           request_status=request_status,
+                           active_tab=active_tab,
+                           page_args=page_args,
+                           per_page=per_page)
 
 
 @app.route('/admin/approve_professional/<int:professional_id>', methods=["POST"])
@@ -265,11 +360,21 @@ def unblock_user(user_id):
 
 @app.route('/view_professional/<int:professional_id>')
 def view_professional(professional_id):
-    # Fetch the professional from the database using the professional_id
-    professional = ServiceProfessional.query.get_or_404(professional_id)
-    
-    # Pass the professional to the template to display their details
-    return render_template('admin/view_professional.html', professional=professional)
+    # Versions of what the page shows (user names never change), so a revalidation skips the rest
+    versions = rating_versions(db.session.query(ServiceProfessional.updated_at), 'professional', ServiceProfessional.id) \
+        .filter(ServiceProfessional.id == professional_id).first_or_404()
+
+    def render():
+        # Fetch the professional from the database using the professional_id
+        professional = ServiceProfessional.query.options(
+            joinedload(ServiceProfessional.user_ref)
+        ).get_or_404(professional_id)
+        ratings = RatingSummary.query.filter_by(subject='professional', subject_id=professional_id).first()
+
+        # Pass the professional to the template to display their details
+        return render_template('admin/view_professional.html', professional=professional, ratings=ratings)
+
+    return conditional_response(versions, render)
 
 
 @app.route('/service/add', methods=["GET", "POST"])
@@ -328,11 +433,19 @@ def edit_service(service_id):
 
 @app.route('/view_service/<int:service_id>')
 def view_service(service_id):
-    # Fetch the service from the database using the service_id
-    service = Service.query.get_or_404(service_id)
-    
-    # Pass the service to the template to display its details
-    return render_template('admin/view_service.html', service=service)
+    # Versions of what the page shows, so a revalidation skips the rest
+    versions = rating_versions(db.session.query(Service.updated_at), 'service', Service.id) \
+        .filter(Service.id == service_id).first_or_404()
+
+    def render():
+        # Fetch the service from the database using the service_id
+        service = Service.query.get_or_404(service_id)
+        ratings = RatingSummary.query.filter_by(subject='service', subject_id=service_id).first()
+
+        # Pass the service to the template to display its details
+        return render_template('admin/view_service.html', service=service, ratings=ratings)
+
+    return conditional_response(versions, render)
 
 
 
@@ -362,27 +475,82 @@ def delete_service(service_id):
 
 @app.route('/view_request/<int:request_id>')
 def view_request(request_id):
-    # Fetch the service request from the database using the request_id
-    request = ServiceRequest.query.get_or_404(request_id)
-    
-    # Pass the request to the template
-    return render_template('admin/view_request.html', request=request)
+    # Versions of the request and its service (user names never change), so a revalidation skips the rest
+    versions = db.session.query(ServiceRequest.version, ServiceRequest.updated_at, Service.updated_at) \
+        .join(Service, Service.id == ServiceRequest.service_id) \
+        .filter(ServiceRequest.id == request_id).first_or_404()
+
+    def render():
+        # Fetch the service request from the database using the request_id
+        request = ServiceRequest.query.options(
+            joinedload(ServiceRequest.service_ref),
+            joinedload(ServiceRequest.customer_ref).joinedload(Customer.user_ref),
+            joinedload(ServiceRequest.service_professional_ref).joinedload(ServiceProfessional.user_ref)
+        ).get_or_404(request_id)
+
+        # Pass the request to the template
+        return render_template('admin/view_request.html', request=request)
+
+    return conditional_response(versions, render)
 
 @app.route('/close_request/<int:request_id>', methods=['POST'])
 def close_request(request_id):
-    # Fetch the service request from the database
-    service_request = ServiceRequest.query.get_or_404(request_id)
-
-    # Update the status to 'closed' if it's not already
-    if service_request.status != 'closed':
-        service_request.status = 'closed'
+    # One conditional UPDATE, so two admins closing at once close it once
+    closed, conflict = transition_request(db.session, request_id, 'close', version=request.form.get('version', type=int))
+    if closed:
+        enqueue(notify_request_closed, request_id=request_id)
         db.session.commit()
         flash('Service request has been closed successfully.', 'success')
     else:
-        flash('Service request is already closed.', 'info')
+        flash(conflict, 'info')
 
     return redirect(url_for('admin_dashboard'))
 
+@app.route('/admin/summary')
+def admin_summary():
+    if 'role' not in session or session['role'] != 'admin':
+        flash('Unauthorized access')
+        return redirect(url_for('login'))
+
+    try:
+        date_from = parse_date(request.args.get('from'))
+        date_to = parse_date(request.args.get('to'))
+    except ValueError:
+        flash('Dates must be in YYYY-MM-DD format', 'danger')
+        return redirect(url_for('admin_summary'))
+
+    # Everything on this page comes from the daily rollups, not from ServiceRequest
+    summary = build_summary(date_from and date_from.date(), date_to and date_to.date())
+    return render_template('admin/summary.html', summary=summary)
+
+@app.route('/admin/export/service_requests')
+def export_service_requests():
+    if 'role' not in session or session['role'] != 'admin':
+        flash('Unauthorized access')
+        return redirect(url_for('login'))
+
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        abort(400, 'format must be csv or ndjson')
+    try:
+        date_from = parse_date(request.args.get('from'))
+        date_to = parse_date(request.args.get('to'))
+    except ValueError:
+        abort(400, 'Dates must be in YYYY-MM-DD format')
+    try:
+        status = parse_status(request.args['status']) if request.args.get('status') else None
+    except ValueError as e:
+        abort(400, str(e))
+
+    # Rows are streamed straight from the cursor to the client
+    rows = stream_rows(export_statements(date_from, date_to, status))
+    generate = generate_csv if export_format == 'csv' else generate_ndjson
+    return Response(
+        stream_with_context(generate(rows)),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename=service_requests.{export_format}'}
+    )
+
 @app.route('/admin/search', methods=['GET', 'POST'])
 def admin_search():
     search_results = []
@@ -392,22 +560,28 @@ def admin_search():
     if request.method == 'POST':
         search_text = request.form.get('search_text', '').strip()
         search_type = request.form.get('search_type')
+        page = get_page(request.form.get('page'))
 
+        # Ranked full-text search over the search index
+        query = None
         if search_type == 'services' and search_text:
-            search_results = Service.query.filter(Service.name.ilike(f'%{search_text}%')).all()
+            query = search_query(Service.query, Service, search_text)
 
         elif search_type == 'professionals' and search_text:
-            # Search on multiple fields in ServiceProfessional and User models
-            search_results = ServiceProfessional.query.join(User).filter(
-                (User.username.ilike(f'%{search_text}%')) |  # Search by username
-                (ServiceProfessional.id.ilike(f'%{search_text}%')) |  # Search by professional ID
-                (ServiceProfessional.service_type.ilike(f'%{search_text}%')) |  # Search by service type
-                (ServiceProfessional.experience.ilike(f'%{search_text}%')) |  # Search by experience
-                (ServiceProfessional.address.ilike(f'%{search_text}%'))  # Search by address
-            ).all()
+            # Matches username, professional ID, service type, experience, address and pin code
+            query = search_query(ServiceProfessional.query.options(
+                joinedload(ServiceProfessional.user_ref),
+                joinedload(ServiceProfessional.service_ref)
+            ), ServiceProfessional, search_text)
 
         elif search_type == 'service_requests' and search_text:
-            search_results = ServiceRequest.query.filter(ServiceRequest.id.ilike(f'%{search_text}%')).all()
+            # Matches request ID, status, service, customer and professional
+            query = search_query(ServiceRequest.query.options(
+                joinedload(ServiceRequest.service_professional_ref).joinedload(ServiceProfessional.user_ref)
+            ), ServiceRequest, search_text)
+
+        if query is not None:
+            search_results = offset_paginate(query, page)
 
     return render_template('admin/search.html', 
                            search_results=search_results, 
@@ -425,35 +599,71 @@ def admin_search():
 # Customer Actions Endpoints (4)
 # ----------------------------------------------
 
+def current_profile_id(model, key):
+    # Customer.id or ServiceProfessional.id of the logged-in user; the session holds the User.id.
+    # Looked up once per login and kept in the session next to the user it belongs to.
+    user_id = session.get('user_id')
+    cached = session.get(key)
+    if cached and cached[0] == user_id:
+        return cached[1]
+    with primary_reads(db.session()):  # A replica may not have a just registered user yet
+        profile_id = db.session.query(model.id).filter(model.user_id == user_id).scalar()
+    if profile_id is not None:
+        session[key] = [user_id, profile_id]
+    return profile_id
+
+
+def current_customer_id():
+    # Customer.id of the logged-in customer
+    return current_profile_id(Customer, 'customer')
+
+
 @app.route('/customer_dashboard')
 def customer_dashboard():
     if 'role' not in session or session['role'] != 'customer':
         flash('Unauthorized access. You must be logged in as a customer to view this page.', 'danger')
         return redirect(url_for('login'))
 
-    # Fetch any data specific to the customer, e.g., their service requests or booking history
-    service_requests = ServiceRequest.query.filter_by(customer_id=session['user_id']).all()
-    return render_template('customer/dashboard.html', service_requests=service_requests)
+    customer_id = current_customer_id()
+
+    # Fetch any data specific to the customer, e.g., their service requests or booking history (archived ones included)
+    def render_requests_table():
+        statement = history(lambda requests, reviews: select(
+            requests.id.label('id'), Service.name.label('service_name'), requests.description, requests.status
+        ).join(Service, Service.id == requests.service_id).where(requests.customer_id == customer_id))
+        service_requests = db.session.execute(statement.order_by(statement.selected_columns.id)).all()
+        return render_template('customer/_requests_table.html', service_requests=service_requests)
+
+    requests_table = cached_fragment('customer_requests', ['service_request', 'service_request_archive', 'service'],
+                                     [customer_id],
+                                     render_requests_table)
+    return render_template('customer/dashboard.html', requests_table=requests_table)
 
 
 @app.route('/services')
 def services():
-    services = Service.query.all()
+    services = get_services()
     return render_template('customer/services.html', services=services)
 
 @app.route('/service_request/<int:service_id>', methods=["GET", "POST"])
 def service_request(service_id):
     if request.method == "POST":
+        customer_id = current_customer_id()
+        if customer_id is None:
+            abort(403)
         description = request.form.get('description')
         service_request = ServiceRequest(
-            customer_id=session['user_id'], 
+            customer_id=customer_id, 
             service_id=service_id, 
             description=description, 
-            status='Pending'
+            status='requested'
         )
         db.session.add(service_request)
         db.session.commit()
-        flash('Service request created successfully')
+
+        # Let the customer know how many professionals nearby can take the job
+        candidates = find_candidates(service_id, service_request.customer_pincode)
+        flash(f'Service request created successfully. {len(candidates)} professional(s) available near you.')
         return redirect(url_for('services'))
 
     service = Service.query.get(service_id)
@@ -461,7 +671,9 @@ def service_request(service_id):
 
 @app.route('/my_requests')
 def my_requests():
-    requests = ServiceRequest.query.filter_by(customer_id=session['user_id']).all()
+    requests = ServiceRequest.query.options(
+        joinedload(ServiceRequest.service_ref)
+    ).filter_by(customer_id=current_customer_id()).all()
     return render_template('customer/my_requests.html', requests=requests)
 
 @app.route('/cancel_request/<int:request_id>', methods=["POST"])
@@ -476,6 +688,11 @@ def cancel_request(request_id):
 # Service Professional Actions Endpoints (4)
 # ----------------------------------------------
 
+def current_professional_id():
+    # ServiceProfessional.id of the logged-in professional
+    return current_profile_id(ServiceProfessional, 'professional')
+
+
 @app.route('/professional_dashboard')
 def professional_dashboard():
     # Ensure user is logged in as a professional
@@ -483,42 +700,58 @@ def professional_dashboard():
         flash('Unauthorized access. You must be logged in as a professional to view this page.', 'danger')
         return redirect(url_for('login'))
 
-    # Fetch the logged-in professional's ID from session
-    professional_id = session.get('user_id')
-
-    # Fetch Today's Services (Pending Requests for the logged-in professional)
-    today_requests = ServiceRequest.query.filter_by(
-        professional_id=professional_id,
-        status='requested'
-    ).order_by(ServiceRequest.date_of_request).all()
-
-    # Fetch Closed Services (Completed Requests for the logged-in professional)
-    closed_requests = ServiceRequest.query.filter_by(
-        professional_id=professional_id,
-        status='closed'
-    ).order_by(ServiceRequest.date_of_completion.desc()).all()
-
-    # Transform closed_requests into a list of dictionaries for easy rendering
-    closed_requests_list = []
-    for service, review in closed_requests:
-        closed_requests_list.append({
-            'id': service.id,
-            'customer_name': service.customer_ref.user_ref.username,
-            'customer_contact': service.customer_ref.user_ref.phone_number,
-            'customer_address': service.customer_ref.address,
-            'customer_pincode': service.customer_ref.pincode,
-            'service_request_date': service.date_of_request,
-            'rating': review.rating,
-            'remarks': review.remarks
-        })
-
-    # Render the dashboard template with fetched data
+    # The session holds the user; requests are assigned to the ServiceProfessional
+    professional_id = current_professional_id()
+
+    # Customer details are shown on every row, so load them with the requests
+    customer_details = joinedload(ServiceRequest.customer_ref).joinedload(Customer.user_ref)
+
+    # Fetch Today's Services (Accepted Requests for the logged-in professional, still to be completed)
+    def render_today_table():
+        today_requests = ServiceRequest.query.options(customer_details).filter_by(
+            professional_id=professional_id,
+            status='accepted'
+        ).order_by(ServiceRequest.date_of_request).all()
+        return render_template('professional/_today_table.html', today_services=today_requests)
+
+    # Fetch Closed Services (Completed Requests for the logged-in professional, archived ones included) with their review, if any
+    def render_closed_table():
+        statement = history(lambda requests, reviews: select(
+            requests.id,
+            User.username.label('customer_name'),
+            User.phone_number.label('customer_contact'),
+            Customer.address.label('customer_address'),
+            Customer.pin_code.label('customer_pincode'),
+            requests.date_of_request.label('service_request_date'),
+            requests.date_of_completion.label('date_of_completion'),
+            reviews.rating,
+            reviews.remarks
+        ).select_from(requests).outerjoin(Customer, Customer.id == requests.customer_id)
+         .outerjoin(User, User.id == Customer.user_id)
+         .outerjoin(reviews, reviews.service_request_id == requests.id)
+         .where(requests.professional_id == professional_id, requests.status == 'closed'))
+        closed_requests = db.session.execute(
+            statement.order_by(statement.selected_columns.date_of_completion.desc())).all()
+        return render_template('professional/_closed_table.html', closed_services=closed_requests)
+
+    # Render the dashboard around the cached tables
+    customer_tables = ['service_request', 'customer', 'user']
+    history_tables = customer_tables + ['review', 'service_request_archive', 'review_archive']
     return render_template(
         'professional/dashboard.html',
-        today_requests=today_requests,
-        closed_requests=closed_requests_list
+        today_table=cached_fragment('professional_today', customer_tables, [professional_id], render_today_table),
+        closed_table=cached_fragment('professional_closed', history_tables, [professional_id], render_closed_table)
     )
 
+def parse_experience(value):
+    # Years of experience from a form field, or None if it is not a non-negative number
+    try:
+        experience = float(value)
+    except (TypeError, ValueError):
+        return None
+    return experience if experience >= 0 else None
+
+
 @app.route('/professional_profile', methods=['GET', 'POST'])
 def professional_profile():
     # Authorization check
@@ -530,20 +763,29 @@ def professional_profile():
     professional = ServiceProfessional.query.filter_by(user_id=session['user_id']).first()
 
     if request.method == 'POST':
+        limit_resume_upload()  # Before the form is parsed
+
+        experience = parse_experience(request.form.get('experience'))
+        if experience is None:
+            flash('Experience must be a number of years', 'danger')
+            return redirect(url_for('professional_profile'))
+
         # Update profile data
         professional.service_type = request.form.get('service_type')
-        professional.experience = request.form.get('experience')
+        professional.experience = experience
         professional.address = request.form.get('address')
         professional.pin_code = request.form.get('pin_code')
         professional.description = request.form.get('description')
 
         # Handle resume file upload
         resume_file = request.files.get('resume')
-        if resume_file:
-            filename = secure_filename(resume_file.filename)
-            resume_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            resume_file.save(resume_path)
-            professional.resume_filename = filename
+        if resume_file and resume_file.filename:
+            try:
+                attach_resume(professional, resume_file, store_resume(resume_file))
+            except ValueError as e:
+                db.session.rollback()
+                flash(str(e), 'danger')
+                return redirect(url_for('professional_profile'))
 
         # Save changes
         db.session.commit()
@@ -553,6 +795,17 @@ def professional_profile():
     return render_template('professional/profile.html', professional=professional)
 
 
+@app.route('/resume/<int:professional_id>')
+def view_resume(professional_id):
+    # Admins can read every resume, professionals their own
+    professional = ServiceProfessional.query.get_or_404(professional_id)
+    role = session.get('role')
+    if role != 'admin' and not (role == 'professional' and professional.user_id == session.get('user_id')):
+        flash('Unauthorized access')
+        return redirect(url_for('login'))
+    return send_resume(professional)
+
+
 @app.route('/professional/search', methods=['GET', 'POST'])
 def professional_search():
     search_results = []
@@ -562,18 +815,18 @@ def professional_search():
     if request.method == 'POST':
         search_text = request.form.get('search_text', '').strip()
         search_type = request.form.get('search_type')
-
-        # Search by ServiceRequest id for today services
-        if search_type == 'today_services' and search_text:
-            search_results = ServiceRequest.query.filter(
-                ServiceRequest.id == search_text  # Searching by the ServiceRequest ID directly
-            ).all()
-
-        # You can add additional filters for closed services or other types of searches
-        elif search_type == 'closed_services' and search_text:
-            search_results = ServiceRequest.query.filter(
-                ServiceRequest.id == search_text  # Searching by the ServiceRequest ID directly
-            ).all()
+        page = get_page(request.form.get('page'))
+
+        # Search the logged-in professional's requests by customer name, phone, location or ID
+        statuses = {'today_services': 'accepted', 'closed_services': 'closed'}
+        if search_type in statuses and search_text:
+            query = ServiceRequest.query.options(
+                joinedload(ServiceRequest.customer_ref).joinedload(Customer.user_ref)
+            ).filter(
+                ServiceRequest.professional_id == current_professional_id(),
+                ServiceRequest.status == statuses[search_type]
+            )
+            search_results = offset_paginate(search_query(query, ServiceRequest, search_text), page)
 
     return render_template('professional/search.html', 
                            search_results=search_results, 
@@ -584,29 +837,53 @@ def professional_search():
 
 @app.route('/requests')
 def view_requests():
-    requests = ServiceRequest.query.filter_by(professional_id=None).all()
-    return render_template('professional/requests.html', requests=requests)
+    if 'role' not in session or session['role'] != 'professional':
+        flash('Unauthorized access. You must be logged in as a professional to view this page.', 'danger')
+        return redirect(url_for('login'))
+
+    professional = ServiceProfessional.query.filter_by(user_id=session['user_id']).first_or_404()
+    # Open requests of the professional's service and area; the page then follows the live feed from `cursor`
+    cursor = current_cursor()
+    requests = open_requests(professional.service_id, area_of(professional.pin_code))
+    return render_template('professional/requests.html', requests=requests, cursor=cursor,
+                           service_name=professional.service_ref.name)
 
 @app.route('/accept_request/<int:request_id>', methods=["POST"])
 def accept_request(request_id):
-    request = ServiceRequest.query.get(request_id)
-    request.professional_id = session['user_id']
-    request.status = 'Accepted'
-    db.session.commit()
-    flash('Request accepted')
+    professional_id = current_professional_id()
+    if professional_id is None:
+        abort(404)
+    # Only the first of several professionals accepting the same request gets it
+    accepted, conflict = transition_request(db.session, request_id, 'accept', professional_id=professional_id,
+                                            version=request.form.get('version', type=int))
+    if accepted:
+        enqueue(notify_request_accepted, request_id=request_id)
+        db.session.commit()
+        flash('Request accepted')
+    else:
+        flash(conflict)
     return redirect(url_for('view_requests'))
 
 @app.route('/complete_request/<int:request_id>', methods=["POST"])
 def complete_request(request_id):
-    request = ServiceRequest.query.get(request_id)
-    request.status = 'Completed'
-    db.session.commit()
-    flash('Request marked as completed')
+    professional_id = current_professional_id()
+    if professional_id is None:
+        abort(404)
+    completed, conflict = transition_request(db.session, request_id, 'complete', professional_id=professional_id,
+                                             version=request.form.get('version', type=int))
+    if completed:
+        db.session.commit()
+        flash('Request marked as completed')
+    else:
+        flash(conflict)
     return redirect(url_for('view_requests'))
 
 @app.route('/my_jobs')
 def my_jobs():
-    jobs = ServiceRequest.query.filter_by(professional_id=session['user_id']).all()
+    jobs = ServiceRequest.query.options(
+        joinedload(ServiceRequest.service_ref),
+        joinedload(ServiceRequest.customer_ref).joinedload(Customer.user_ref)
+    ).filter_by(professional_id=current_professional_id()).all()
     return render_template('professional/my_jobs.html', jobs=jobs)
 
 # ----------------------------------------------
@@ -616,16 +893,23 @@ def my_jobs():
 @app.route('/submit_review/<int:service_id>', methods=['POST'])
 def submit_review(service_id):
     # Get data from form
-    rating = request.form.get('rating')
+    service_request_id = request.form.get('service_request_id', type=int)
+    rating = request.form.get('rating', type=int)
     comment = request.form.get('comment')
 
-    if not rating or not comment:
+    if not service_request_id or not rating or not comment:
         flash("Please fill out all fields")
         return redirect(url_for('view_reviews', service_id=service_id))
 
+    customer_id = current_customer_id()
+    if customer_id is None:
+        abort(403)
+
     # Create and store the review
-    review = Review(service_id=service_id, rating=rating, comment=comment, customer_id=session['user.roll_no'])
+    review = Review(service_request_id=service_request_id, rating=rating, remarks=comment, customer_id=customer_id)
     db.session.add(review)
+    db.session.flush()  # Assigns review.id
+    enqueue(notify_review_submitted, review_id=review.id)
     db.session.commit()
 
     flash("Review submitted successfully")
@@ -633,8 +917,12 @@ def submit_review(service_id):
 
 @app.route('/reviews/<int:service_id>', methods=['GET'])
 def view_reviews(service_id):
-    # Fetch the reviews for a specific service
-    reviews = Review.query.filter_by(service_id=service_id).all()
+    # Fetch the reviews for a specific service, with everything the Review properties walk through
+    reviews = Review.query.join(Review.service_request_ref).options(
+        joinedload(Review.service_request_ref).joinedload(ServiceRequest.service_ref),
+        joinedload(Review.service_request_ref).joinedload(ServiceRequest.service_professional_ref).joinedload(ServiceProfessional.user_ref),
+        joinedload(Review.customer_ref).joinedload(Customer.user_ref)
+    ).filter(ServiceRequest.service_id == service_id).all()
     
     if not reviews:
         flash("No reviews found for this service.")
@@ -0,0 +1,233 @@
+import re
+from sqlalchemy import event, inspect, text, bindparam, or_, false, cast, String
+from sqlalchemy.sql import table, column
+from sqlalchemy.exc import OperationalError
+from app import app, db
+from models import User, Customer, Service, ServiceProfessional, ServiceRequest
+from statuses import STATUS_NAMES, status_label
+
+# ----------------------------------------------
+# Full-text search index (SQLite FTS5)
+# ----------------------------------------------
+# One FTS5 table holds a text document per service, professional and service
+# request. Each document's rowid is id * KIND_SLOTS + kind, so a row can be
+# replaced or removed by rowid without scanning the index. The index is kept
+# in sync from an after_flush hook, inside the same transaction as the change.
+# On databases without FTS5 the search falls back to ILIKE filters.
+# `flask init-db` creates the table; each process checks once, on first use,
+# whether it exists.
+
+KIND_SLOTS = 4
+KINDS = {Service: 0, ServiceProfessional: 1, ServiceRequest: 2}
+
+search_index = table('search_index', column('rowid'), column('kind'), column('ref_id'), column('rank'))
+
+# SQL that builds the document for each kind; `{filter}` selects which rows to (re)index
+DOCUMENT_SQL = {
+    Service: """
+        SELECT s.id * {slots} + {kind} AS doc_rowid, {kind} AS kind, s.id AS ref_id,
+               s.name || ' ' || coalesce(s.description, '') AS body
+        FROM service s
+        WHERE {filter}""",
+    ServiceProfessional: """
+        SELECT sp.id * {slots} + {kind} AS doc_rowid, {kind} AS kind, sp.id AS ref_id,
+               sp.id || ' ' || u.username || ' ' || sp.service_type || ' ' || sp.experience || ' ' ||
+               coalesce(sp.address, '') || ' ' || coalesce(sp.pin_code, '') || ' ' ||
+               coalesce(sp.description, '') || ' ' || coalesce(s.name, '') AS body
+        FROM service_professional sp
+        JOIN "user" u ON u.id = sp.user_id
+        LEFT JOIN service s ON s.id = sp.service_id
+        WHERE {filter}""",
+    ServiceRequest: """
+        SELECT sr.id * {slots} + {kind} AS doc_rowid, {kind} AS kind, sr.id AS ref_id,
+               sr.id || ' ' || {status} || ' ' || coalesce(s.name, '') || ' ' ||
+               coalesce(cu.username, '') || ' ' || coalesce(cu.phone_number, '') || ' ' ||
+               coalesce(c.address, '') || ' ' || coalesce(c.pin_code, '') || ' ' || coalesce(pu.username, '') AS body
+        FROM service_request sr
+        LEFT JOIN service s ON s.id = sr.service_id
+        LEFT JOIN customer c ON c.id = sr.customer_id
+        LEFT JOIN "user" cu ON cu.id = c.user_id
+        LEFT JOIN service_professional sp ON sp.id = sr.professional_id
+        LEFT JOIN "user" pu ON pu.id = sp.user_id
+        WHERE {filter}""",
+}
+
+# Status name of a request document (statuses are stored as codes)
+STATUS_SQL = 'CASE sr.status ' + ' '.join(f"WHEN {code} THEN '{name}'" for code, name in STATUS_NAMES.items()) + " ELSE '' END"
+
+# Filter that selects rows by primary key in DOCUMENT_SQL
+ID_FILTERS = {Service: 's.id IN :ids', ServiceProfessional: 'sp.id IN :ids', ServiceRequest: 'sr.id IN :ids'}
+
+# Columns searched with ILIKE when FTS5 is not available
+FALLBACK_COLUMNS = {
+    Service: [Service.name, Service.description],
+    ServiceProfessional: [User.username, ServiceProfessional.service_type, ServiceProfessional.address,
+                          ServiceProfessional.pin_code],
+    ServiceRequest: [cast(ServiceRequest.id, String), status_label(ServiceRequest.status)],
+}
+
+# Columns that are copied into the documents of related rows
+RELATED_COLUMNS = {
+    User: ('username', 'phone_number'),
+    Customer: ('address', 'pin_code'),
+    Service: ('name',),
+    ServiceProfessional: ('user_id',),
+}
+
+fts_enabled = None  # Unknown until fts_available() has looked at the database
+
+
+def tokenize(search_text):
+    return re.findall(r'\w+', search_text or '')
+
+
+def reindex(connection, model, filter_sql, ids):
+    # Replace the documents of the rows selected by filter_sql
+    if not ids:
+        return
+    document_sql = DOCUMENT_SQL[model].format(slots=KIND_SLOTS, kind=KINDS[model], filter=filter_sql, status=STATUS_SQL)
+    delete = text(f"DELETE FROM search_index WHERE rowid IN (SELECT doc_rowid FROM ({document_sql}))")
+    insert = text(f"INSERT INTO search_index (rowid, kind, ref_id, body) {document_sql}")
+
+    params = {'ids': list(ids)}
+    connection.execute(delete.bindparams(bindparam('ids', expanding=True)), params)
+    connection.execute(insert.bindparams(bindparam('ids', expanding=True)), params)
+
+
+def remove(connection, model, ids):
+    if not ids:
+        return
+    rowids = [ref_id * KIND_SLOTS + KINDS[model] for ref_id in ids]
+    connection.execute(text("DELETE FROM search_index WHERE rowid IN :rowids")
+                       .bindparams(bindparam('rowids', expanding=True)), {'rowids': rowids})
+
+
+def fts_available(connection=None):
+    global fts_enabled
+    if fts_enabled is None:
+        if db.engine.dialect.name != 'sqlite':
+            fts_enabled = False
+        else:
+            connection = connection or db.session.connection()
+            fts_enabled = connection.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'")
+            ).first() is not None
+    return fts_enabled
+
+
+def sync_search_index(session, flush_context):
+    if not fts_available(session.connection()):
+        return
+
+    changed = {model: set() for model in KINDS}
+    deleted = {model: set() for model in KINDS}
+    related = {model: set() for model in RELATED_COLUMNS}
+    for obj in session.new:
+        if type(obj) in changed:
+            changed[type(obj)].add(obj.id)
+    for obj in session.dirty:
+        model = type(obj)
+        if model in changed:
+            changed[model].add(obj.id)
+        if model in related:
+            attrs = inspect(obj).attrs
+            if any(attrs[name].history.has_changes() for name in RELATED_COLUMNS[model]):
+                related[model].add(obj.id)
+    for obj in session.deleted:
+        if type(obj) in deleted:
+            deleted[type(obj)].add(obj.id)
+
+    if not any(changed.values()) and not any(deleted.values()) and not any(related.values()):
+        return
+
+    connection = session.connection()
+    for model in KINDS:
+        remove(connection, model, deleted[model])
+
+    for model in KINDS:
+        reindex(connection, model, ID_FILTERS[model], changed[model])
+
+    # Documents that embed data from related rows
+    reindex(connection, ServiceProfessional, 'sp.user_id IN :ids', related[User])
+    reindex(connection, ServiceProfessional, 'sp.service_id IN :ids', related[Service])
+    reindex(connection, ServiceRequest, 'c.user_id IN :ids OR sp.user_id IN :ids', related[User])
+    reindex(connection, ServiceRequest, 'sr.customer_id IN :ids', related[Customer])
+    reindex(connection, ServiceRequest, 'sr.service_id IN :ids', related[Service])
+    reindex(connection, ServiceRequest, 'sr.professional_id IN :ids', related[ServiceProfessional])
+
+
+def index_rows(model, ids):
+    # Index rows written without an ORM flush, e.g. bulk inserts
+    if fts_available():
+        reindex(db.session.connection(), model, ID_FILTERS[model], ids)
+
+
+def rebuild_index():
+    # Rebuild every document in one set-based pass per kind
+    connection = db.session.connection()
+    connection.execute(text("DELETE FROM search_index"))
+    for model, kind in KINDS.items():
+        document_sql = DOCUMENT_SQL[model].format(slots=KIND_SLOTS, kind=kind, filter='1 = 1', status=STATUS_SQL)
+        connection.execute(text(f"INSERT INTO search_index (rowid, kind, ref_id, body) {document_sql}"))
+    db.session.commit()
+
+
+def search_query(query, model, search_text):
+    # Restrict `query` (over `model`) to rows matching search_text, best matches first
+    terms = tokenize(search_text)
+    if not terms:
+        return query.filter(false())
+
+    if fts_available():
+        # Every term must match, each as a prefix: "plumb" finds "plumber"
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return query.join(search_index, search_index.c.ref_id == model.id).filter(
+            search_index.c.kind == KINDS[model],
+            text('search_index MATCH :match').bindparams(match=match)
+        ).order_by(search_index.c.rank)
+
+    if model is ServiceProfessional:
+        query = query.join(ServiceProfessional.user_ref)
+    for term in terms:
+        query = query.filter(or_(*[col.ilike(f'%{term}%') for col in FALLBACK_COLUMNS[model]]))
+    return query.order_by(model.id)
+
+
+def init_search_index():
+    # Create the FTS5 table if it is missing (and fill it); run by `flask init-db`
+    global fts_enabled
+    if db.engine.dialect.name != 'sqlite':
+        fts_enabled = False
+        return
+    try:
+        with db.engine.begin() as connection:
+            exists = connection.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'")
+            ).first()
+            if not exists:
+                connection.execute(text(
+                    "CREATE VIRTUAL TABLE search_index USING fts5("
+                    "kind UNINDEXED, ref_id UNINDEXED, body, tokenize = 'unicode61')"
+                ))
+    except OperationalError as e:
+        print(f"Full-text search unavailable, falling back to LIKE search: {e}")
+        fts_enabled = False
+        return
+
+    fts_enabled = True
+    if not exists:
+        rebuild_index()
+
+
+event.listen(db.session, 'after_flush', sync_search_index)
+
+
+@app.cli.command('search-reindex')
+def search_reindex_command():
+    """Rebuild the full-text search index from the database."""
+    init_search_index()
+    if fts_enabled:
+        rebuild_index()
+        print("Search index rebuilt.")
+    else:
+        print("Full-text search is not available on this database.")
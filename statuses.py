@@ -0,0 +1,61 @@
+from sqlalchemy import SmallInteger, case
+from sqlalchemy.types import TypeDecorator
+
+# ----------------------------------------------
+# Service request statuses
+# ----------------------------------------------
+# A request's status is stored as a small integer code; Python code,
+# templates and the API see the name. StatusCode converts between the two in
+# every query, so `ServiceRequest.status == 'closed'` compares against 4.
+# Names are matched case-insensitively and 'pending' (written by older
+# routes and the API) means 'requested'.
+#
+# NEXT_STATUSES is the state machine: a status may only change to one of
+# the statuses listed for it. transitions.py builds its conditional UPDATEs
+# from it and rejects other changes made through the ORM.
+
+REQUESTED, ACCEPTED, COMPLETED, CLOSED = 1, 2, 3, 4
+
+STATUS_NAMES = {REQUESTED: 'requested', ACCEPTED: 'accepted', COMPLETED: 'completed', CLOSED: 'closed'}
+STATUS_CODES = {name: code for code, name in STATUS_NAMES.items()}
+STATUS_ALIASES = {'pending': 'requested'}
+
+NEXT_STATUSES = {
+    'requested': {'accepted', 'closed'},
+    'accepted': {'completed', 'closed'},
+    'completed': {'closed'},
+    'closed': set(),
+}
+
+
+def parse_status(value):
+    # Canonical name of a status name or code; raises ValueError for anything else
+    if isinstance(value, int) and value in STATUS_NAMES:
+        return STATUS_NAMES[value]
+    if isinstance(value, str):
+        name = value.strip().lower()
+        name = STATUS_ALIASES.get(name, name)
+        if name in STATUS_CODES:
+            return name
+    raise ValueError(f"Unknown status {value!r}; expected one of {', '.join(STATUS_CODES)}")
+
+
+def statuses_before(status):
+    # Statuses that may change to `status`
+    return [name for name, targets in NEXT_STATUSES.items() if status in targets]
+
+
+def status_label(column):
+    # SQL expression with the name of a status column, for text matching
+    return case({code: name for code, name in STATUS_NAMES.items()}, value=column, else_='')
+
+
+class StatusCode(TypeDecorator):
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else STATUS_CODES[parse_status(value)]
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else STATUS_NAMES.get(value, value)
@@ -0,0 +1,108 @@
+from datetime import datetime
+from sqlalchemy import event, inspect, select, update, or_
+from app import db
+from models import ServiceRequest
+from statuses import NEXT_STATUSES, parse_status, statuses_before
+from ratings import previous_value
+from rollups import TRACKED_ATTRIBUTES, apply_request_changes
+from search import index_rows
+from feed import record_events
+
+# ----------------------------------------------
+# Service request state transitions
+# ----------------------------------------------
+# Accepting, completing and closing a request are each one conditional
+# UPDATE: its WHERE clause holds the state the transition starts from (e.g.
+# no other professional and an open status) and the version the caller last
+# saw, and it bumps the version. Of two concurrent transitions on a request
+# exactly one matches the row; the other gets a conflict instead of silently
+# overwriting the winner. ServiceRequest maps `version` as its
+# version_id_col, so ordinary ORM updates are checked and bump it as well.
+# The statuses a transition starts from come from the state machine in
+# statuses.py, and a flush that changes a status any other way is refused.
+#
+# These UPDATEs bypass the ORM flush, so the rollups, the search index and
+# the feed are updated here, in the same transaction.
+
+ACTIONS = {'accept': 'accepted', 'complete': 'completed', 'close': 'closed'}  # Status each transition moves to
+
+CONFLICTS = {
+    'accept': 'This request has already been taken.',
+    'complete': 'This request is not an accepted job of yours.',
+    'close': 'This request is already closed.',
+}
+STALE = 'This request was changed in the meantime; reload and try again.'
+NOT_FOUND = 'Service request not found.'
+
+
+def transition_clauses(action, current, professional_id, now):
+    # (WHERE clauses of the state the transition starts from, values it sets)
+    if action not in ACTIONS:
+        raise ValueError(f'Unknown transition {action!r}')
+    status = ACTIONS[action]
+    guard = [ServiceRequest.status.in_(statuses_before(status))]
+    values = {'status': status}
+    if action == 'accept':
+        guard.append(or_(ServiceRequest.professional_id.is_(None), ServiceRequest.professional_id == professional_id))
+        values['professional_id'] = professional_id
+    elif action == 'complete':
+        guard.append(ServiceRequest.professional_id == professional_id)
+        values['date_of_completion'] = now
+    else:
+        values['date_of_completion'] = current.date_of_completion or now
+    return guard, values
+
+
+def transition_request(session, request_id, action, professional_id=None, version=None):
+    # Run one transition; (new values, None) if it applied, (None, message) if not.
+    # `version` is the one the caller's page showed; by default the one just read.
+    current = session.connection().execute(
+        select(ServiceRequest.version, ServiceRequest.professional_id, ServiceRequest.customer_id,
+               *[getattr(ServiceRequest, name) for name in TRACKED_ATTRIBUTES])
+        .where(ServiceRequest.id == request_id)
+    ).first()
+    if current is None:
+        return None, NOT_FOUND
+    if version is not None and version != current.version:
+        return None, STALE
+
+    guard, values = transition_clauses(action, current, professional_id, datetime.utcnow())
+    result = session.execute(
+        update(ServiceRequest)
+        .where(ServiceRequest.id == request_id, ServiceRequest.version == current.version, *guard)
+        .values(version=ServiceRequest.version + 1, **values)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        return None, CONFLICTS[action]
+
+    # Won: bring the derived data along, as a flush would have
+    old = dict(current._mapping)
+    new = dict(old, version=current.version + 1, **values)
+    apply_request_changes(session, [{name: new[name] for name in TRACKED_ATTRIBUTES}],
+                          [{name: old[name] for name in TRACKED_ATTRIBUTES}])
+    index_rows(ServiceRequest, [request_id])
+    if old['professional_id'] is None and new['professional_id'] is not None:
+        record_events(session, [(request_id, 'taken', old['service_id'], old['customer_id'])])
+    expire_loaded(session, request_id)
+    return new, None
+
+
+def expire_loaded(session, request_id):
+    # An instance already in the session would otherwise keep the old state and version
+    obj = session.identity_map.get(session.identity_key(ServiceRequest, request_id))
+    if obj is not None:
+        session.expire(obj)
+
+
+def check_status_changes(session, flush_context, instances):
+    # The ORM may only move a request along NEXT_STATUSES
+    for obj in session.dirty:
+        if isinstance(obj, ServiceRequest) and inspect(obj).attrs.status.history.has_changes():
+            old = previous_value(obj, 'status')
+            old, new = old and parse_status(old), parse_status(obj.status)
+            if old is not None and new != old and new not in NEXT_STATUSES[old]:
+                raise ValueError(f'Service request {obj.id} cannot go from {old} to {new}')
+
+
+event.listen(db.session, 'before_flush', check_status_changes)